@@ -0,0 +1,255 @@
+"""
+Benchmarks - File Name Sanitizing
+Sanitizes a mixed-script corpus (Serbian, Cyrillic, CJK, Arabic, emoji, control and
+reserved characters) with the original multi-pass sanitize_filename and with the
+translate-table one, checks that both give identical output, and measures names/sec.
+
+    python -m benchmarks.filenames
+    python -m benchmarks.filenames --names 20000 --fuzz 50000
+    python -m benchmarks.filenames --baseline filenames.json --tolerance 0.2
+
+Exits with status 1 when any name is sanitized differently, or when a run is slower
+than the baseline.
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+from utils.file_utils import sanitize_filename, sanitize_many
+
+
+CORPUS = (
+    "Đorđe Balašević - Ne lomite mi bagrenje",
+    "Zdravko Čolić - Ti si mi u krvi",
+    "Riblja Čorba - Lutka sa naslovne strane",
+    "ŠTA ĆE MI ŽIVOT BEZ TEBE",
+    "Ђорђе Балашевић - Ратни профитер",
+    "Кино - Группа крови",
+    "宇多田ヒカル - First Love",
+    "방탄소년단 - Dynamite",
+    "周杰倫 Jay Chou【告白氣球】",
+    "فيروز - نسم علينا الهوى",
+    "שלמה ארצי - ירח",
+    "Sezen Aksu - İstanbul Hatırası",
+    "Ελευθερία Αρβανιτάκη - Το παράπονο",
+    "Tarkan - Şımarık",
+    "Édith Piaf - Non, je ne regrette rien",
+    "Sigur Rós - Hoppípolla",
+    "Beyoncé - Halo 💖✨",
+    "🔥 Lofi Beats 🔥 to relax/study to 🎧",
+    "Party Mix 🎉🎊 2024 | DJ Set",
+    "Flag songs 🇷🇸🇺🇸🇯🇵",
+    "AC/DC - Back In Black",
+    "What? Why: <Remix> \"Live\" *Edit* | 2020",
+    "C:\\Users\\Music\\track",
+    "..hidden name..",
+    "   lots    of     spaces   ",
+    "tabs\tand\nnew\r\nlines",
+    "zero\u200bwidth\u200djoiner\ufeffbom",
+    "control\x00chars\x07here\x1b[0m",
+    "non\u00a0breaking\u2003em\u3000ideographic spaces",
+    "right-to-left \u202eoverride\u202c mark",
+    "private use \ue000\uf8ff",
+    "circled Ⓜ️ and ⓐⓑⓒ letters",
+    "dingbats ✂ ✈ ✔ ➰ ➿",
+    "math 𝐀𝐁𝐂 and emoji 🤖🧠🪄",
+    "A" * 250,
+    "Very long title " * 20,
+    ".",
+    "",
+    "🎵🎵🎵",
+    "Normal ASCII Artist - Normal ASCII Title",
+    "Artist - Song (feat. Other Artist) [Remix]",
+    "Queen - Bohemian Rhapsody",
+    "The Beatles - Hey Jude",
+)
+
+# Characters the fuzzer favours: everything the sanitizer treats specially
+INTERESTING = 'čćšžđČĆŠŽĐ<>:"/\\|?* .\t\n\r\x00\x1f\x7f\x85\u00a0\u200b\u2028\u3000\ufeffaZ9-_()[]😀🇷✂Ⓜ中한ф'
+
+
+def reference_sanitize_filename(filename):
+    """sanitize_filename exactly as it was before the translate tables, kept as the reference output"""
+    replacements = {
+        'č': 'c', 'ć': 'c', 'š': 's', 'ž': 'z', 'đ': 'dj',
+        'Č': 'C', 'Ć': 'C', 'Š': 'S', 'Ž': 'Z', 'Đ': 'Dj',
+    }
+    for serbian, latin in replacements.items():
+        filename = filename.replace(serbian, latin)
+
+    emoji_pattern = re.compile(
+        "["
+        u"\U0001F600-\U0001F64F"
+        u"\U0001F300-\U0001F5FF"
+        u"\U0001F680-\U0001F6FF"
+        u"\U0001F1E0-\U0001F1FF"
+        u"\U00002702-\U000027B0"
+        u"\U000024C2-\U0001F251"
+        u"\U0001F900-\U0001F9FF"
+        u"\U0001FA00-\U0001FA6F"
+        "]+",
+        flags=re.UNICODE
+    )
+    filename = emoji_pattern.sub('', filename)
+    filename = ''.join(
+        char for char in filename
+        if unicodedata.category(char)[0] != 'C'
+        or char in '\n\r\t'
+    )
+
+    invalid_chars = '<>:"/\\|?*'
+    for char in invalid_chars:
+        filename = filename.replace(char, '')
+
+    filename = re.sub(r'\s+', ' ', filename)
+    filename = filename.strip(' .')
+
+    max_length = 200
+    if len(filename) > max_length:
+        filename = filename[:max_length].strip()
+
+    if not filename:
+        filename = "untitled"
+
+    return filename
+
+
+def fuzz_names(count, seed=2024):
+    """Random names mixing special characters with arbitrary code points (surrogates and unassigned included)"""
+    rnd = random.Random(seed)
+    names = []
+    for _ in range(count):
+        chars = []
+        for _ in range(rnd.randint(0, 60)):
+            chars.append(rnd.choice(INTERESTING) if rnd.random() < 0.7 else chr(rnd.randrange(sys.maxunicode + 1)))
+        names.append(''.join(chars))
+    return names
+
+
+def build_names(count, distinct):
+    """count names cycling through the corpus; a `distinct` fraction is made unique by a track number"""
+    unique = int(count * distinct)
+    return [f"{index + 1:05d} {CORPUS[index % len(CORPUS)]}" if index < unique else CORPUS[index % len(CORPUS)]
+            for index in range(count)]
+
+
+def check_equivalence(names):
+    """[(name, expected, got)] for every name sanitized differently"""
+    mismatches = []
+    for name in names:
+        expected, got = reference_sanitize_filename(name), sanitize_filename.__wrapped__(name)
+        if expected != got:
+            mismatches.append((name, expected, got))
+    return mismatches
+
+
+def names_per_second(sanitize, names, repeat, before=None):
+    """Best of `repeat` timings of sanitize(names), as names/sec"""
+    best = None
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        sanitize(names)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(len(names) / best) if best else 0
+
+
+def run_benchmark(count=20000, distinct=0.3, fuzz=20000, repeat=5):
+    """Equivalence check plus names/sec of the reference, the single-pass sanitizer and the cached batch API"""
+    names = build_names(count, distinct)
+    mismatches = check_equivalence(list(CORPUS) + names + fuzz_names(fuzz))
+    uncached = sanitize_filename.__wrapped__
+
+    rates = {
+        'reference': names_per_second(lambda batch: [reference_sanitize_filename(n) for n in batch], names, repeat),
+        'single_pass': names_per_second(lambda batch: [uncached(n) for n in batch], names, repeat),
+        'batch': names_per_second(sanitize_many, names, repeat, before=sanitize_filename.cache_clear),
+    }
+    sanitize_many(names)
+    rates['batch_warm'] = names_per_second(sanitize_many, names, repeat)
+    return {
+        'names': count,
+        'distinct': distinct,
+        'python': sys.version.split()[0],
+        'checked': len(CORPUS) + count + fuzz,
+        'mismatches': [{'name': name, 'expected': expected, 'got': got} for name, expected, got in mismatches],
+        'names_per_sec': rates,
+    }
+
+
+def print_report(result, stream=sys.stdout):
+    """Readable summary"""
+    rates = result['names_per_sec']
+    print(f"File name sanitizing, {result['names']} names ({result['distinct']:.0%} distinct), "
+          f"Python {result['python']}:", file=stream)
+    for name, label in (('reference', 'original, multi-pass'), ('single_pass', 'translate table, no cache'),
+                        ('batch', 'sanitize_many, cold cache'), ('batch_warm', 'sanitize_many, warm cache')):
+        speedup = rates[name] / rates['reference'] if rates['reference'] else 0
+        print(f"  {label:<26} {rates[name]:>12,} names/s  {speedup:>6.1f}x", file=stream)
+    print(f"  equivalence: {result['checked'] - len(result['mismatches'])}/{result['checked']} identical", file=stream)
+    for mismatch in result['mismatches'][:20]:
+        print(f"    {mismatch['name']!r}: expected {mismatch['expected']!r}, got {mismatch['got']!r}", file=stream)
+
+
+def check(result, baseline=None, tolerance=0.2):
+    """Problems with this run: different output, or slower than the baseline"""
+    problems = []
+    if result['mismatches']:
+        problems.append(f"{len(result['mismatches'])} names sanitized differently from the original")
+    if baseline:
+        for name, previous in baseline.get('names_per_sec', {}).items():
+            current = result['names_per_sec'].get(name)
+            if name != 'reference' and previous and current is not None and (previous - current) / previous > tolerance:
+                problems.append(f"{name} {previous:,} -> {current:,} names/s ({(current - previous) / previous:+.0%})")
+    return problems
+
+
+def build_parser():
+    """Command line options"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.filenames",
+                                     description="Speed and equivalence benchmark of file name sanitizing")
+    parser.add_argument('--names', type=int, default=20000, help="names in the timed batch (default: 20000)")
+    parser.add_argument('--distinct', type=float, default=0.3,
+                        help="fraction of names that are unique, the rest repeat the corpus (default: 0.3)")
+    parser.add_argument('--fuzz', type=int, default=20000,
+                        help="random names added to the equivalence check (default: 20000)")
+    parser.add_argument('--repeat', type=int, default=5, help="timed passes, the best one counts (default: 5)")
+    parser.add_argument('--json', action='store_true', help="print the result as JSON")
+    parser.add_argument('--save-baseline', metavar='FILE', help="store this run as the baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="compare against a stored baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed slowdown against the baseline as a fraction (default: 0.2)")
+    return parser
+
+
+def main(argv=None):
+    """Benchmark entry point; returns the exit status"""
+    args = build_parser().parse_args(argv)
+    result = run_benchmark(max(1, args.names), min(max(args.distinct, 0.0), 1.0), max(0, args.fuzz),
+                           max(1, args.repeat))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(result, indent=2), encoding='utf-8')
+        print(f"Baseline saved to {args.save_baseline}", file=sys.stderr)
+
+    baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8')) if args.baseline else None
+    problems = check(result, baseline, args.tolerance)
+    for problem in problems:
+        print(f"Regression: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,404 @@
+"""
+Benchmarks - Download Pipeline
+Runs the full fetch -> transcode -> tag pipeline offline: a stand-in extractor serves
+playlists of generated tracks from a local HTTP server, so no run depends on YouTube.
+
+    python -m benchmarks.pipeline --tracks 24 --jobs 4 --format mp3
+    python -m benchmarks.pipeline --save-baseline bench-baseline.json
+    python -m benchmarks.pipeline --baseline bench-baseline.json --tolerance 0.15
+
+Reports tracks/min, per-stage latency percentiles and peak RSS; with --baseline it
+exits with status 1 when a run is slower (or bigger) than the stored one.
+"""
+
+import argparse
+import io
+import json
+import math
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+
+from core.cover_art import CoverCache
+from core.engine import DownloadEngine
+from core.events import Started, Completed, Error
+from core.rate_limiter import RateLimiter, get_rate_limiter, set_rate_limiter
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Source formats the media server can hand out: (file extension, acodec reported by the extractor)
+SOURCES = {
+    'wav': ('wav', 'pcm_s16le'),
+    'aac': ('m4a', 'mp4a.40.2'),
+    'mp3': ('mp3', 'mp3'),
+}
+
+# Compared against the baseline: metric -> True if higher is better
+BASELINE_METRICS = {
+    'tracks_per_min': True,
+    'peak_rss_mb': False,
+}
+
+
+def generate_wav(seconds, sample_rate=44100):
+    """Stereo 16-bit sine tone as WAV bytes"""
+    period = [int(12000 * math.sin(2 * math.pi * 440 * i / sample_rate)) for i in range(sample_rate)]
+    second = b''.join(sample.to_bytes(2, 'little', signed=True) * 2 for sample in period)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(second * max(1, int(seconds)))
+    return buffer.getvalue()
+
+
+def encode_audio(wav_data, source, ffmpeg, work_dir):
+    """Encode the WAV fixture into another source format (mp4 can't be written to a pipe)"""
+    ext = SOURCES[source][0]
+    codec = {'aac': ['-c:a', 'aac', '-b:a', '128k'], 'mp3': ['-c:a', 'libmp3lame', '-b:a', '192k']}[source]
+    output = Path(work_dir) / f"fixture.{ext}"
+    result = subprocess.run([ffmpeg, '-loglevel', 'error', '-y', '-f', 'wav', '-i', 'pipe:0', *codec, str(output)],
+                            input=wav_data, capture_output=True)
+    if result.returncode != 0:
+        raise Exception(f"Could not encode {source} fixture: {result.stderr.decode(errors='ignore').strip()}")
+    return output.read_bytes()
+
+
+def generate_cover(ffmpeg, width=1280, height=720):
+    """Solid-colour JPEG the size of a YouTube maxres thumbnail"""
+    result = subprocess.run(
+        [ffmpeg, '-loglevel', 'error', '-f', 'lavfi', '-i', f'color=c=navy:s={width}x{height}',
+         '-frames:v', '1', '-f', 'image2', '-c:v', 'mjpeg', 'pipe:1'],
+        capture_output=True
+    )
+    if result.returncode != 0:
+        raise Exception(f"Could not generate cover: {result.stderr.decode(errors='ignore').strip()}")
+    return result.stdout
+
+
+class MediaServer:
+    """
+    Local HTTP server for the fixtures: /audio/<n>.<ext> and /cover/<n>.jpg.
+    Every track gets its own URLs but the same bytes; latency is added before each response.
+    """
+
+    def __init__(self, audio, audio_ext, cover, latency=0.0):
+        self.audio = audio
+        self.audio_ext = audio_ext
+        self.cover = cover
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self):
+        """host:port the server listens on"""
+        return f"127.0.0.1:{self.httpd.server_address[1]}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                kind, _, name = self.path.lstrip('/').partition('/')
+                if kind == 'audio' and name.endswith('.' + server.audio_ext):
+                    body, content_type = server.audio, 'application/octet-stream'
+                elif kind == 'cover' and name.endswith('.jpg'):
+                    body, content_type = server.cover, 'image/jpeg'
+                else:
+                    self.send_error(404)
+                    return
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """Serve on a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="bench-media", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Shut the server down"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class BenchIE(InfoExtractor):
+    """
+    Stand-in extractor for bench://<host>/playlist/<size> and bench://<host>/track/<n>.
+    Playlists are returned as flat URL entries and tracks resolve to the media server,
+    so the engine goes through the same listing, resolving and download calls as with YouTube.
+    """
+    IE_NAME = 'bench'
+    _VALID_URL = r'bench://(?P<host>[^/]+)/(?P<kind>playlist|track)/(?P<id>\d+)(?:\?source=(?P<source>\w+))?'
+
+    def _real_extract(self, url):
+        host, kind, number, source = self._match_valid_url(url).group('host', 'kind', 'id', 'source')
+        source = source or 'wav'
+        if kind == 'playlist':
+            entries = [
+                self.url_result(f"bench://{host}/track/{n}?source={source}", 'Bench', f"bench{n:05d}",
+                                self._track_title(n))
+                for n in range(1, int(number) + 1)
+            ]
+            return self.playlist_result(entries, f"bench-{number}", f"Benchmark Playlist ({number})")
+
+        n = int(number)
+        ext, acodec = SOURCES[source]
+        return {
+            'id': f"bench{n:05d}",
+            'title': self._track_title(n),
+            'uploader': 'Benchmark',
+            'webpage_url': url,
+            'formats': [{
+                'format_id': source,
+                'url': f"http://{host}/audio/{n}.{ext}",
+                'ext': ext,
+                'acodec': acodec,
+                'vcodec': 'none',
+            }],
+            'thumbnails': [{'url': f"http://{host}/cover/{n}.jpg", 'width': 1280, 'height': 720}],
+        }
+
+    @staticmethod
+    def _track_title(n):
+        """Titles shaped like real uploads so metadata parsing and title cleaning do their usual work"""
+        return f"Artist {n} - Song {n} (Official Video) [HD]"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(seconds):
+    """Count and p50/p95/max in milliseconds"""
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+    return {
+        'count': len(seconds),
+        'p50_ms': ms(percentile(seconds, 50)),
+        'p95_ms': ms(percentile(seconds, 95)),
+        'max_ms': ms(max(seconds) if seconds else None),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its finished children (ffmpeg), in MB"""
+    if resource is None:
+        return None, None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(own, 1), round(children, 1)
+
+
+def run_benchmark(tracks=20, audio_format='mp3', jobs=4, source='wav', seconds=30, latency=0.0,
+                  use_cover_cache=True, ffmpeg='ffmpeg'):
+    """Run one playlist through the engine and return the measurements"""
+    with tempfile.TemporaryDirectory(prefix="yt2mp3-bench-") as work_dir:
+        work_dir = Path(work_dir)
+        audio = generate_wav(seconds)
+        if source != 'wav':
+            audio = encode_audio(audio, source, ffmpeg, work_dir)
+        server = MediaServer(audio, SOURCES[source][0], generate_cover(ffmpeg), latency)
+        server.start()
+
+        # Measure the pipeline, not the YouTube request pacing
+        previous_limiter = get_rate_limiter()
+        set_rate_limiter(RateLimiter(rate=1000.0, max_rate=1000.0, burst=1000))
+
+        cover_cache = CoverCache(work_dir / "covers", ffmpeg=ffmpeg) if use_cover_cache else None
+        engine = DownloadEngine(f"bench://{server.host}/playlist/{tracks}?source={source}", audio_format,
+                                work_dir / "out", "playlist", max_parallel=jobs, cover_cache=cover_cache,
+                                progress_rate=2.0, extractors=[BenchIE])
+
+        started = {}
+        track_seconds = []
+        errors = []
+        lock = threading.Lock()
+
+        def on_event(event):
+            now = time.monotonic()
+            with lock:
+                if isinstance(event, Started):
+                    started[event.index] = now
+                elif isinstance(event, Completed) and event.index in started:
+                    track_seconds.append(now - started.pop(event.index))
+                elif isinstance(event, Error):
+                    errors.append(event.message)
+
+        engine.subscribe(on_event, Started, Completed, Error)
+        try:
+            begin = time.monotonic()
+            engine.run()
+            wall = time.monotonic() - begin
+        finally:
+            set_rate_limiter(previous_limiter)
+            server.stop()
+
+    completed = len(track_seconds)
+    own_rss, children_rss = peak_rss_mb()
+    stats = engine.get_job_stats()
+    return {
+        'params': {
+            'tracks': tracks,
+            'format': audio_format,
+            'jobs': jobs,
+            'source': source,
+            'seconds': seconds,
+            'latency_ms': round(latency * 1000, 1),
+            'cover_cache': use_cover_cache,
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'yt_dlp': yt_dlp.version.__version__,
+            'platform': platform.platform(),
+            'cpus': engine.transcode_workers,
+        },
+        'completed': completed,
+        'failed': len(errors),
+        'errors': errors[:5],
+        'wall_seconds': round(wall, 3),
+        'tracks_per_min': round(completed / wall * 60, 2) if wall > 0 else 0.0,
+        'stages': {stage.name: latency_summary(stage.latencies()) for stage in engine.stages},
+        'track': latency_summary(track_seconds),
+        'conversions': {'remuxed': stats['remuxed'], 'transcoded': stats['transcoded']},
+        'http_requests': server.requests,
+        'peak_rss_mb': own_rss,
+        'children_peak_rss_mb': children_rss,
+    }
+
+
+def compare(result, baseline, tolerance, min_delta_ms=20.0):
+    """
+    List the metrics that got worse than the baseline by more than the tolerance (a fraction).
+    Stage latencies that moved less than min_delta_ms are noise and never count.
+    """
+    regressions = []
+    checks = [(name, result.get(name), baseline.get(name), higher_is_better)
+              for name, higher_is_better in BASELINE_METRICS.items()]
+    for stage, summary in baseline.get('stages', {}).items():
+        current = result.get('stages', {}).get(stage, {}).get('p95_ms')
+        previous = summary.get('p95_ms')
+        if current is not None and previous is not None and abs(current - previous) >= min_delta_ms:
+            checks.append((f"{stage} p95_ms", current, previous, False))
+
+    for name, current, previous, higher_is_better in checks:
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append((name, previous, current, change))
+    return regressions
+
+
+def print_report(result, stream=sys.stdout):
+    """Readable summary of a benchmark run"""
+    params = result['params']
+    print(f"{params['tracks']} tracks, {params['source']} -> {params['format']}, {params['jobs']} parallel, "
+          f"{params['seconds']} s each", file=stream)
+    print(f"  completed {result['completed']}, failed {result['failed']} in {result['wall_seconds']} s "
+          f"-> {result['tracks_per_min']} tracks/min", file=stream)
+    print(f"  {'stage':<10} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}", file=stream)
+    for name, summary in [*result['stages'].items(), ('track', result['track'])]:
+        print(f"  {name:<10} {summary['count']:>6} {summary['p50_ms'] or '-':>10} "
+              f"{summary['p95_ms'] or '-':>10} {summary['max_ms'] or '-':>10}", file=stream)
+    print(f"  peak RSS {result['peak_rss_mb']} MB (children {result['children_peak_rss_mb']} MB), "
+          f"remuxed {result['conversions']['remuxed']}, transcoded {result['conversions']['transcoded']}",
+          file=stream)
+    for message in result['errors']:
+        print(f"  error: {message}", file=stream)
+
+
+def build_parser():
+    """Command line options"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.pipeline",
+                                     description="Offline throughput benchmark of the download pipeline")
+    parser.add_argument('--tracks', type=int, default=20, help="playlist size (default: 20)")
+    parser.add_argument('--format', choices=['mp3', 'm4a'], default='mp3', help="target format (default: mp3)")
+    parser.add_argument('--jobs', type=int, default=4, help="parallel downloads (default: 4)")
+    parser.add_argument('--source', choices=sorted(SOURCES), default='wav',
+                        help="source audio served to the pipeline; aac with --format m4a measures the remux path")
+    parser.add_argument('--seconds', type=int, default=30, help="length of each track (default: 30)")
+    parser.add_argument('--latency', type=float, default=0.0, help="milliseconds added to every HTTP response")
+    parser.add_argument('--no-cover-cache', action='store_true', help="fetch and process every cover")
+    parser.add_argument('--json', action='store_true', help="print the result as JSON")
+    parser.add_argument('--save-baseline', metavar='FILE', help="store this run as the baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="compare against a stored baseline")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="allowed slowdown against the baseline as a fraction (default: 0.10)")
+    parser.add_argument('--min-delta', type=float, default=20.0,
+                        help="stage latency changes below this many milliseconds are ignored (default: 20)")
+    return parser
+
+
+def main(argv=None):
+    """Benchmark entry point; returns the exit status"""
+    args = build_parser().parse_args(argv)
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        print("ffmpeg not found in PATH; the benchmark needs it for converting and covers", file=sys.stderr)
+        return 2
+
+    result = run_benchmark(args.tracks, args.format, max(1, args.jobs), args.source, args.seconds,
+                           args.latency / 1000, not args.no_cover_cache, ffmpeg)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(result, indent=2), encoding='utf-8')
+        print(f"Baseline saved to {args.save_baseline}", file=sys.stderr)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        if baseline.get('params') != result['params']:
+            print("Warning: baseline was recorded with different parameters", file=sys.stderr)
+        regressions = compare(result, baseline, args.tolerance, args.min_delta)
+        for name, previous, current, change in regressions:
+            print(f"Regression: {name} {previous} -> {current} ({change:+.0%})", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})", file=sys.stderr)
+
+    return 1 if result['failed'] and not result['completed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
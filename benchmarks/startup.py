@@ -0,0 +1,197 @@
+"""
+Benchmarks - Cold Start
+Starts the GUI in fresh interpreters and measures the time until the main window
+first paints, the import time of every module (python -X importtime) and when the
+background warm-up of yt-dlp/mutagen finishes.
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --budget-ms 800
+    python -m benchmarks.startup --save-baseline startup.json
+    python -m benchmarks.startup --baseline startup.json --tolerance 0.2
+
+Exits with status 1 when the budget is exceeded, yt-dlp was loaded before the
+first paint, or the run is slower than the baseline.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must not be imported before the window paints
+DEFERRED_MODULES = ('yt_dlp', 'mutagen', 'gui.tag_editor', 'gui.playlist_selector')
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def probe():
+    """Child process: start the application like main.py and report when the window first paints"""
+    started_at = float(os.environ['YT2MP3_STARTUP_T0'])
+    import main
+    from PySide6.QtCore import QObject, QEvent, QTimer
+
+    imported = time.time()
+    app = main.setup_application()
+    window = main.MainWindow()
+    result = {'import_main_ms': (imported - started_at) * 1000}
+
+    class PaintProbe(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint and 'first_paint_ms' not in result:
+                result['first_paint_ms'] = (time.time() - started_at) * 1000
+                result['loaded_at_paint'] = [name for name in DEFERRED_MODULES if name in sys.modules]
+                QTimer.singleShot(0, wait_for_warm_up)
+            return False
+
+    def wait_for_warm_up():
+        if warm_up.thread is None:
+            QTimer.singleShot(5, wait_for_warm_up)
+            return
+        warm_up.thread.join()
+        result['warm_up_done_ms'] = (time.time() - started_at) * 1000
+        app.quit()
+
+    warm_up = main.WarmUpAfterFirstPaint(window)
+    # Installed last, so it sees the paint first
+    paint_probe = PaintProbe()
+    window.installEventFilter(paint_probe)
+    window.show()
+    # Give up if nothing ever paints (e.g. no display)
+    QTimer.singleShot(30000, app.quit)
+    app.exec()
+    print(json.dumps(result))
+
+
+def parse_import_times(stderr, top=15):
+    """Slowest top-level imports from -X importtime output: [(module, cumulative ms, self ms)]"""
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        # Only modules imported directly by the application (one level of indentation)
+        if match and len(match.group(3)) <= 3:
+            modules.append((match.group(4), int(match.group(2)) / 1000, int(match.group(1)) / 1000))
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return modules[:top]
+
+
+def run_once():
+    """Start one fresh interpreter; returns the probe result plus its import times"""
+    with tempfile.TemporaryDirectory(prefix="yt2mp3-startup-") as home:
+        # Empty profile: no journal to offer for resuming, same state on every run
+        env = dict(os.environ, HOME=home, APPDATA=home, YT2MP3_STARTUP_T0=repr(time.time()))
+        if sys.platform.startswith('linux') and not (env.get('DISPLAY') or env.get('WAYLAND_DISPLAY')):
+            env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'benchmarks.startup', '--probe'],
+                                 cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=120)
+    lines = [line for line in process.stdout.splitlines() if line.startswith('{')]
+    if process.returncode != 0 or not lines:
+        raise Exception(f"Startup probe failed (exit {process.returncode}): {process.stderr[-2000:]}")
+    result = json.loads(lines[-1])
+    if 'first_paint_ms' not in result:
+        raise Exception("The main window never painted")
+    result['imports'] = parse_import_times(process.stderr)
+    return result
+
+
+def run_benchmark(runs=5):
+    """Median of several cold starts (the first run only warms the disk cache)"""
+    run_once()
+    results = [run_once() for _ in range(max(1, runs))]
+
+    def median(key):
+        return round(statistics.median(r[key] for r in results), 1)
+
+    return {
+        'runs': len(results),
+        'python': sys.version.split()[0],
+        'first_paint_ms': median('first_paint_ms'),
+        'import_main_ms': median('import_main_ms'),
+        'warm_up_done_ms': median('warm_up_done_ms'),
+        'loaded_at_paint': sorted({name for r in results for name in r['loaded_at_paint']}),
+        'imports': [{'module': name, 'cumulative_ms': round(cumulative, 1), 'self_ms': round(own, 1)}
+                    for name, cumulative, own in results[len(results) // 2]['imports']],
+    }
+
+
+def print_report(result, stream=sys.stdout):
+    """Readable summary"""
+    print(f"Cold start, median of {result['runs']} runs (Python {result['python']}):", file=stream)
+    print(f"  import main       {result['import_main_ms']:>8.1f} ms", file=stream)
+    print(f"  first paint       {result['first_paint_ms']:>8.1f} ms", file=stream)
+    print(f"  warm-up finished  {result['warm_up_done_ms']:>8.1f} ms", file=stream)
+    if result['loaded_at_paint']:
+        print(f"  loaded before first paint: {', '.join(result['loaded_at_paint'])}", file=stream)
+    print("  slowest imports (cumulative / self ms):", file=stream)
+    for entry in result['imports']:
+        print(f"    {entry['module']:<40} {entry['cumulative_ms']:>8.1f} {entry['self_ms']:>8.1f}", file=stream)
+
+
+def check(result, budget_ms=None, baseline=None, tolerance=0.2):
+    """Problems with this run: budget exceeded, deferred modules loaded early, slower than the baseline"""
+    problems = []
+    if result['loaded_at_paint']:
+        problems.append(f"loaded before the first paint: {', '.join(result['loaded_at_paint'])}")
+    if budget_ms is not None and result['first_paint_ms'] > budget_ms:
+        problems.append(f"first paint {result['first_paint_ms']} ms is over the {budget_ms} ms budget")
+    if baseline:
+        for key in ('first_paint_ms', 'import_main_ms'):
+            previous = baseline.get(key)
+            if previous and (result[key] - previous) / previous > tolerance:
+                problems.append(f"{key} {previous} -> {result[key]} ({(result[key] - previous) / previous:+.0%})")
+    return problems
+
+
+def build_parser():
+    """Command line options"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup",
+                                     description="Cold-start benchmark of the desktop application")
+    parser.add_argument('--probe', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--runs', type=int, default=5, help="measured cold starts (default: 5)")
+    parser.add_argument('--budget-ms', type=float, help="fail if the first paint takes longer")
+    parser.add_argument('--json', action='store_true', help="print the result as JSON")
+    parser.add_argument('--save-baseline', metavar='FILE', help="store this run as the baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="compare against a stored baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed slowdown against the baseline as a fraction (default: 0.2)")
+    return parser
+
+
+def main(argv=None):
+    """Benchmark entry point; returns the exit status"""
+    args = build_parser().parse_args(argv)
+    if args.probe:
+        probe()
+        return 0
+
+    try:
+        result = run_benchmark(args.runs)
+    except Exception as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(result, indent=2), encoding='utf-8')
+        print(f"Baseline saved to {args.save_baseline}", file=sys.stderr)
+
+    baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8')) if args.baseline else None
+    problems = check(result, args.budget_ms, baseline, args.tolerance)
+    for problem in problems:
+        print(f"Regression: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+"""
+Benchmarks - Title Cleaning
+Cleans a fixed corpus of real video titles with the original clean_title and with
+core.titles, checks that both give identical output, and measures titles/sec.
+
+    python -m benchmarks.titles
+    python -m benchmarks.titles --tracks 5000 --distinct 0.3
+    python -m benchmarks.titles --save-baseline titles.json
+    python -m benchmarks.titles --baseline titles.json --tolerance 0.2
+
+Exits with status 1 when any title is cleaned differently, or when a run is slower
+than the baseline.
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from core.titles import TitleCleaner
+
+
+# Titles as they appear on YouTube, including awkward ones (trailing spaces, unicode, nested brackets)
+CORPUS = (
+    "Rick Astley - Never Gonna Give You Up (Official Music Video)",
+    "Queen – Bohemian Rhapsody (Official Video Remastered)",
+    "Daft Punk - Get Lucky (Official Audio) ft. Pharrell Williams, Nile Rodgers",
+    "The Weeknd - Blinding Lights (Official Video)",
+    "Ed Sheeran - Shape of You [Official Video]",
+    "Billie Eilish - bad guy",
+    "Mark Ronson - Uptown Funk (Official Video) ft. Bruno Mars",
+    "Luis Fonsi - Despacito ft. Daddy Yankee",
+    "Calvin Harris, Dua Lipa - One Kiss (Official Video)",
+    "Dua Lipa - Levitating Featuring DaBaby (Official Music Video)",
+    "Eminem - Lose Yourself [HD]",
+    "Nirvana - Smells Like Teen Spirit (Official Music Video)",
+    "a-ha - Take On Me (Official Video) [Remastered in 4K]",
+    "Toto - Africa (Official HD Video)",
+    "Fleetwood Mac - Dreams (Official Music Video) [HD Remaster]",
+    "Michael Jackson - Billie Jean (Official Video)",
+    "Eagles - Hotel California (Live 1977) (Official Video) [HD]",
+    "Led Zeppelin - Stairway To Heaven (Live at Madison Square Garden 1973)",
+    "Adele - Someone Like You (Live at the Royal Albert Hall)",
+    "Coldplay - Viva La Vida (Official Video)",
+    "Imagine Dragons - Believer (Lyrics)",
+    "Lewis Capaldi - Someone You Loved (Lyrics)",
+    "Post Malone, Swae Lee - Sunflower (Spider-Man: Into the Spider-Verse) (Official Video)",
+    "Shakira - Hips Don't Lie (Official 4K Video) ft. Wyclef Jean",
+    "Bad Bunny x Jhay Cortez - Dákiti (Letra/Lyrics)",
+    "Stromae - Alors on danse (Paroles)",
+    "Rosalía - MALAMENTE (Cap.1: Augurio)",
+    "Avicii - Wake Me Up (Official Video)",
+    "Kygo & Whitney Houston - Higher Love (Official Video)",
+    "David Guetta & Sia - Titanium (Alesso Remix)",
+    "Swedish House Mafia ft. John Martin - Don't You Worry Child (Radio Edit)",
+    "Deadmau5 - Strobe (Extended Mix)",
+    "Bonobo : Kerala",
+    "Tame Impala: The Less I Know The Better",
+    "Nils Frahm - Says (Live)",
+    "Hans Zimmer - Time (Inception Soundtrack) HQ",
+    "Ludovico Einaudi - Experience (Official Music Video)",
+    "Lofi Hip Hop Radio - Beats to Relax/Study to",
+    "Chill Vibes Mix 2023 | Relaxing Music",
+    "Best of Jazz 1950s - Full Album",
+    "Pink Floyd - The Dark Side of the Moon (Full Album) 1973",
+    "Radiohead - OK Computer (Full Album)",
+    "Metallica: Enter Sandman (Official Music Video)",
+    "AC/DC - Back In Black (Official Video)",
+    "Guns N' Roses - Sweet Child O' Mine (Official Music Video)",
+    "Bob Marley & The Wailers - Is This Love (Official Music Video)",
+    "Frank Sinatra - Fly Me To The Moon (Live At The Kiel Opera House, St. Louis, MO/1965)",
+    "Elvis Presley - Can't Help Falling In Love (Audio)",
+    "Johnny Cash - Hurt (Official Music Video) HD",
+    "Whitney Houston - I Will Always Love You (Official 4K Video)",
+    "Celine Dion - My Heart Will Go On (Official Music Video)",
+    "Tarkan - Şımarık (Official Video)",
+    "Sezen Aksu - İstanbul Hatırası",
+    "Ceca - Kukavica (Official Video 2013)",
+    "Zdravko Čolić - Ti si mi u krvi",
+    "Bijelo Dugme - Đurđevdan (Audio 1986)",
+    "Riblja Čorba - Lutka sa naslovne strane [Official Audio]",
+    "Rammstein - Du Hast (Official Video)",
+    "Édith Piaf - La vie en rose (Audio officiel)",
+    "BTS (방탄소년단) 'Dynamite' Official MV",
+    "BLACKPINK - 'How You Like That' M/V",
+    "宇多田ヒカル - First Love (Official Music Video)",
+    "Arijit Singh - Tum Hi Ho | Aashiqui 2 | Full Video Song",
+    "Song Title (feat. Someone) - Remix",
+    "Artist - Song Title (prod. by Some Very Long Producer Name Here)",
+    "Artist - Song (Acoustic)",
+    "Artist - Song Acoustic",
+    "Artist - Song Live ",
+    "Artist - Song (2019 Remaster) ",
+    "Artist - Song [Explicit]",
+    "Artist - Song (Clean Version)",
+    "Artist - Song (Visualizer)",
+    "Artist - Song | Official Video",
+    "Artist - Song -",
+    "Artist - Song_",
+    "Artist - Song (Unplugged) (Live)",
+    "Artist - Video Killed the Radio Star",
+    "The Buggles - Video Killed The Radio Star (Official Music Video)",
+    "Artist - Song (x)",
+    "Artist - Song (with Other Artist)",
+    "Artist - Song (A Very Long Parenthetical Description Of Nothing In Particular)",
+    "Artist - Song [A Very Long Bracketed Description Of Nothing In Particular]",
+    "Artist - Song ((nested)) [[double]]",
+    "Artist - Song (unclosed",
+    "Artist - 2020",
+    "1999",
+    "(2001)",
+    "",
+    "   ",
+    "HD",
+    "Official",
+    "Untitled",
+)
+
+
+def reference_clean_title(title):
+    """clean_title exactly as the engine had it before core.titles, kept as the reference output"""
+    remove_terms = [
+        'official video', 'official music video', 'official audio', 'official',
+        'lyrics', 'lyric video', 'with lyrics', 'letra', 'paroles',
+        'hd', 'hq', '4k', 'uhd', '1080p', '720p', '480p',
+        'audio', 'video', 'music video', 'visualizer', 'remaster', 'remastered',
+        'full album', 'full', 'explicit', 'clean version', 'radio edit',
+        'extended', 'remix', 'live', 'acoustic', 'unplugged'
+    ]
+
+    year_pattern = r'\(?(?:19|20)\d{2}\)?'
+    title = re.sub(year_pattern, '', title)
+
+    def process_bracket_content(match):
+        content = match.group(1).strip()
+        content_lower = content.lower()
+
+        for term in remove_terms:
+            if term in content_lower:
+                return ''
+
+        if any(word in content_lower for word in ['feat', 'ft', 'featuring', 'with', '&', 'x']):
+            return match.group(0)
+
+        if len(content) < 30:
+            return match.group(0)
+
+        return ''
+
+    title = re.sub(r'\(([^)]+)\)', process_bracket_content, title)
+    title = re.sub(r'\[([^\]]+)\]', process_bracket_content, title)
+
+    title_lower = title.lower().strip()
+    for term in remove_terms:
+        if title_lower.endswith(term):
+            title = title[:-(len(term))].strip()
+            title_lower = title.lower().strip()
+
+    title = re.sub(r'\s+', ' ', title)
+    title = re.sub(r'\s*[-_|]+\s*$', '', title)
+
+    return title.strip()
+
+
+def corpus_inputs():
+    """Every string clean_title sees for the corpus: whole titles and the part after 'Artist - ' / 'Artist: '"""
+    inputs = list(CORPUS)
+    for title in CORPUS:
+        for separator in (' - ', ': '):
+            if separator in title:
+                inputs.append(title.split(separator, 1)[1].strip())
+                break
+    return inputs
+
+
+def build_playlist(tracks, distinct):
+    """tracks titles cycling through the corpus; a `distinct` fraction is made unique by a track number"""
+    unique = int(tracks * distinct)
+    return [f"{index + 1:04d}. {CORPUS[index % len(CORPUS)]}" if index < unique else CORPUS[index % len(CORPUS)]
+            for index in range(tracks)]
+
+
+def check_equivalence(inputs):
+    """[(title, expected, got)] for every title the new cleaner handles differently"""
+    cleaner = TitleCleaner(cache_size=0)
+    mismatches = []
+    for title in inputs:
+        expected, got = reference_clean_title(title), cleaner.clean(title)
+        if expected != got:
+            mismatches.append((title, expected, got))
+    return mismatches
+
+
+def titles_per_second(clean, titles, repeat):
+    """Best of `repeat` timings of clean(titles), as titles/sec"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        clean(titles)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(len(titles) / best) if best else 0
+
+
+def run_benchmark(tracks=5000, distinct=0.3, repeat=5):
+    """Equivalence check plus titles/sec of the reference, the compiled cleaner and the memoized batch API"""
+    inputs = corpus_inputs()
+    playlist = build_playlist(tracks, distinct)
+    mismatches = check_equivalence(inputs + playlist)
+
+    uncached = TitleCleaner(cache_size=0)
+
+    def batch_cold(titles):
+        # A fresh cache every time: the first pass over a playlist
+        return TitleCleaner().clean_many(titles)
+
+    warm = TitleCleaner()
+    warm.clean_many(playlist)
+
+    return {
+        'tracks': tracks,
+        'distinct': distinct,
+        'python': sys.version.split()[0],
+        'checked': len(inputs) + len(playlist),
+        'mismatches': [{'title': title, 'expected': expected, 'got': got} for title, expected, got in mismatches],
+        'titles_per_sec': {
+            'reference': titles_per_second(lambda titles: [reference_clean_title(t) for t in titles], playlist, repeat),
+            'compiled': titles_per_second(lambda titles: [uncached.clean(t) for t in titles], playlist, repeat),
+            'batch': titles_per_second(batch_cold, playlist, repeat),
+            'batch_warm': titles_per_second(warm.clean_many, playlist, repeat),
+        },
+    }
+
+
+def print_report(result, stream=sys.stdout):
+    """Readable summary"""
+    rates = result['titles_per_sec']
+    print(f"Title cleaning, {result['tracks']} titles ({result['distinct']:.0%} distinct), "
+          f"Python {result['python']}:", file=stream)
+    for name, label in (('reference', 'original clean_title'), ('compiled', 'compiled, no cache'),
+                        ('batch', 'clean_many, cold cache'), ('batch_warm', 'clean_many, warm cache')):
+        speedup = rates[name] / rates['reference'] if rates['reference'] else 0
+        print(f"  {label:<24} {rates[name]:>12,} titles/s  {speedup:>6.1f}x", file=stream)
+    print(f"  equivalence: {result['checked'] - len(result['mismatches'])}/{result['checked']} identical", file=stream)
+    for mismatch in result['mismatches'][:20]:
+        print(f"    {mismatch['title']!r}: expected {mismatch['expected']!r}, got {mismatch['got']!r}", file=stream)
+
+
+def check(result, baseline=None, tolerance=0.2):
+    """Problems with this run: different output, or slower than the baseline"""
+    problems = []
+    if result['mismatches']:
+        problems.append(f"{len(result['mismatches'])} titles cleaned differently from the original")
+    if baseline:
+        for name, previous in baseline.get('titles_per_sec', {}).items():
+            current = result['titles_per_sec'].get(name)
+            if name != 'reference' and previous and current is not None and (previous - current) / previous > tolerance:
+                problems.append(f"{name} {previous:,} -> {current:,} titles/s ({(current - previous) / previous:+.0%})")
+    return problems
+
+
+def build_parser():
+    """Command line options"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.titles",
+                                     description="Speed and equivalence benchmark of title cleaning")
+    parser.add_argument('--tracks', type=int, default=5000, help="titles in the generated playlist (default: 5000)")
+    parser.add_argument('--distinct', type=float, default=0.3,
+                        help="fraction of titles that are unique, the rest repeat the corpus (default: 0.3)")
+    parser.add_argument('--repeat', type=int, default=5, help="timed passes, the best one counts (default: 5)")
+    parser.add_argument('--json', action='store_true', help="print the result as JSON")
+    parser.add_argument('--save-baseline', metavar='FILE', help="store this run as the baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="compare against a stored baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed slowdown against the baseline as a fraction (default: 0.2)")
+    return parser
+
+
+def main(argv=None):
+    """Benchmark entry point; returns the exit status"""
+    args = build_parser().parse_args(argv)
+    result = run_benchmark(max(1, args.tracks), min(max(args.distinct, 0.0), 1.0), max(1, args.repeat))
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        print_report(result)
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"Baseline saved to {args.save_baseline}", file=sys.stderr)
+
+    baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8')) if args.baseline else None
+    problems = check(result, baseline, args.tolerance)
+    for problem in problems:
+        print(f"Regression: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""
+Core Module - Async Engine
+asyncio front end of the download engine for embedding in async services
+
+    async with Engine(download_folder, max_jobs=4) as engine:
+        job = await engine.submit(url, "mp3")
+        async for event in job.events():
+            ...
+"""
+
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from core.engine import DownloadEngine
+from core.events import Completed, Exists, Skipped, Error, Finished
+
+
+class JobResult:
+    """What a finished job produced"""
+
+    def __init__(self, job_id, url):
+        self.job_id = job_id
+        self.url = url
+        self.completed = []
+        self.exists = []
+        self.skipped = []
+        self.errors = []
+        self.cancelled = False
+
+    @property
+    def ok(self):
+        """True if nothing failed"""
+        return not self.errors and not self.cancelled
+
+    def __repr__(self):
+        return (f"JobResult({self.url!r}, completed={len(self.completed)}, exists={len(self.exists)}, "
+                f"skipped={len(self.skipped)}, errors={len(self.errors)}, cancelled={self.cancelled})")
+
+
+class Job:
+    """
+    One submitted URL (or playlist entry) running on an executor thread.
+    Events are handed over to the event loop as they are published; they are only
+    queued once events() is iterated, so jobs nobody listens to don't pile them up.
+    """
+
+    def __init__(self, job_id, url, engine, loop):
+        self.job_id = job_id
+        self.url = url
+        self.engine = engine
+        self.result_data = JobResult(job_id, url)
+        self._loop = loop
+        self._events = None
+        self._done = loop.create_future()
+        self._future = None
+        engine.subscribe(self._on_engine_event)
+
+    def _on_engine_event(self, event):
+        """Called on engine threads; hands the event to the event loop"""
+        self._loop.call_soon_threadsafe(self._deliver, event)
+
+    def _deliver(self, event):
+        """Record and queue an event (on the event loop)"""
+        result = self.result_data
+        if isinstance(event, Completed):
+            result.completed.append(event)
+        elif isinstance(event, Exists):
+            result.exists.append(event)
+        elif isinstance(event, Skipped):
+            result.skipped.append(event)
+        elif isinstance(event, Error):
+            result.errors.append(event)
+        if self._events is not None:
+            self._events.put_nowait(event)
+        if isinstance(event, Finished) and not self._done.done():
+            self._done.set_result(result)
+
+    async def events(self):
+        """
+        Iterate over the events of this job until it finishes.
+        Events published before the first iteration are not replayed, so start
+        iterating right after submit(), before awaiting anything else.
+        """
+        if self._events is None:
+            if self._done.done():
+                return
+            self._events = asyncio.Queue()
+        while True:
+            event = await self._events.get()
+            yield event
+            if isinstance(event, Finished):
+                return
+
+    async def result(self):
+        """Wait for the job to finish; cancelling the wait cancels the job"""
+        try:
+            return await asyncio.shield(self._done)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def cancel(self):
+        """
+        Stop the job: no new tracks are started and downloads in progress are aborted;
+        a track already being converted or tagged is still finished
+        """
+        self.result_data.cancelled = True
+        self.engine.cancel(downloads=True)
+
+    def done(self):
+        """True once the job has finished"""
+        return self._done.done()
+
+
+class Engine:
+    """
+    asyncio API over DownloadEngine.
+    Blocking yt-dlp/ffmpeg work runs on an executor; at most max_jobs jobs run
+    at once and submit() waits for a free slot, so callers can't queue unbounded work.
+    submit_playlist() queues all its entries at once; each takes a slot as one frees up.
+    """
+
+    def __init__(self, download_folder, max_jobs=2, max_parallel=1, archive=None, cover_cache=None,
+                 journal=None, progress_rate=10.0):
+        self.download_folder = Path(download_folder)
+        self.max_jobs = max(1, int(max_jobs))
+        self.max_parallel = max_parallel
+        self.archive = archive
+        self.cover_cache = cover_cache
+        self.journal = journal
+        self.progress_rate = progress_rate
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._slots = None
+        self._executor = None
+        self._loop = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.cancel_all()
+        await self.close()
+
+    def start(self):
+        """Bind the engine to the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_jobs)
+        # One extra thread for playlist listings so they never wait behind running jobs
+        self._executor = ThreadPoolExecutor(max_workers=self.max_jobs + 1, thread_name_prefix="engine")
+
+    def _engine(self, url, audio_format, download_type="auto", selected_indices=None, selected_ids=None):
+        """New DownloadEngine with this engine's shared resources"""
+        return DownloadEngine(url, audio_format, self.download_folder, download_type, selected_indices,
+                              self.max_parallel, selected_ids, self.journal, archive=self.archive,
+                              progress_rate=self.progress_rate, cover_cache=self.cover_cache)
+
+    async def submit(self, url, audio_format="mp3", download_type="auto", selected_indices=None,
+                     selected_ids=None):
+        """Start downloading a URL; waits while max_jobs jobs are already running"""
+        engine = self._engine(url, audio_format, download_type, selected_indices, selected_ids)
+        await self._slots.acquire()
+        return self._start(url, engine, engine.run, slot_held=True)
+
+    def _start(self, url, engine, target, *args, slot_held=False):
+        """Create a job whose task takes a job slot (unless it holds one) and runs target on the executor"""
+        job = Job(next(self._ids), url, engine, self._loop)
+        self.jobs[job.job_id] = job
+        job._future = self._loop.create_task(self._run(job, target, args, slot_held))
+        return job
+
+    async def _run(self, job, target, args, slot_held):
+        """Run a job's target once it has a slot; a job cancelled while waiting never starts"""
+        if not slot_held:
+            await self._slots.acquire()
+        try:
+            if job.result_data.cancelled:
+                job._deliver(Finished())
+                return
+            await self._loop.run_in_executor(self._executor, target, *args)
+        finally:
+            self._slots.release()
+
+    async def submit_playlist(self, url, audio_format="mp3", selected_indices=None, selected_ids=None):
+        """
+        List a playlist and submit one job per entry, so entries can be awaited
+        individually or together: await asyncio.gather(*(job.result() for job in jobs))
+        All jobs are created right away and run max_jobs at a time. Every entry has its
+        own DownloadEngine, so a journal gets one job row per entry rather than one per playlist.
+        """
+        lister = self._engine(url, audio_format, "playlist", selected_indices, selected_ids)
+        entries = await self._loop.run_in_executor(self._executor, lister.list_entries)
+        jobs = []
+        for entry in entries:
+            entry_url = entry.get('webpage_url') or entry.get('url') or url
+            engine = self._engine(url, audio_format, "playlist")
+            jobs.append(self._start(entry_url, engine, engine.run_entries, [entry]))
+        return jobs
+
+    async def gather(self, urls, audio_format="mp3", download_type="auto"):
+        """Download several URLs (at most max_jobs at a time) and return their results in order"""
+        async def run(url):
+            job = await self.submit(url, audio_format, download_type)
+            return await job.result()
+        return await asyncio.gather(*(run(url) for url in urls))
+
+    def get_job(self, job_id):
+        """Submitted job by ID, or None"""
+        return self.jobs.get(job_id)
+
+    def cancel_all(self):
+        """Cancel every unfinished job"""
+        for job in self.jobs.values():
+            if not job.done():
+                job.cancel()
+
+    async def close(self):
+        """Wait for running jobs and shut the executor down"""
+        futures = [job._future for job in self.jobs.values() if job._future is not None]
+        if futures:
+            await asyncio.gather(*futures, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
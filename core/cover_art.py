@@ -0,0 +1,213 @@
+"""
+Core Module - Cover Art
+Fetches video thumbnails into memory, normalizes them for embedding and caches the result
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urlparse
+
+
+def image_mime(data):
+    """Detect the image type from its magic bytes"""
+    if data.startswith(b'\xff\xd8\xff'):
+        return "image/jpeg"
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return "image/png"
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return "image/webp"
+    return None
+
+
+def select_thumbnail(info):
+    """
+    Pick the thumbnail URL to embed.
+    YouTube offers the same art as JPEG and WebP; the best JPEG is preferred so no conversion is needed.
+    """
+    thumbnails = [t for t in info.get('thumbnails') or [] if t.get('url')]
+    if not thumbnails:
+        return info.get('thumbnail')
+
+    # yt-dlp sorts thumbnails from worst to best
+    for thumbnail in reversed(thumbnails):
+        if urlparse(thumbnail['url']).path.lower().endswith(('.jpg', '.jpeg')):
+            return thumbnail['url']
+    return thumbnails[-1]['url']
+
+
+def normalize_cover(data, ffmpeg='ffmpeg'):
+    """
+    Return (data, mime) ready for embedding.
+    JPEG and PNG are used as-is; anything else (WebP) is converted to JPEG through ffmpeg pipes.
+    """
+    mime = image_mime(data)
+    if mime in ("image/jpeg", "image/png"):
+        return data, mime
+
+    result = subprocess.run(
+        [ffmpeg, '-loglevel', 'error', '-i', 'pipe:0', '-frames:v', '1', '-f', 'image2', '-c:v', 'mjpeg', 'pipe:1'],
+        input=data, capture_output=True
+    )
+    if result.returncode != 0 or image_mime(result.stdout) != "image/jpeg":
+        raise Exception(f"Could not convert cover art: {result.stderr.decode(errors='ignore').strip()}")
+    return result.stdout, "image/jpeg"
+
+
+def process_cover(data, edge=600, ffmpeg='ffmpeg', quality=3):
+    """
+    Decode a cover once, centre-crop it to a square, shrink it to at most
+    edge x edge pixels and re-encode it as JPEG. Returns the JPEG bytes.
+    """
+    video_filter = (
+        "crop='min(iw,ih)':'min(iw,ih)',"
+        f"scale='min({edge},iw)':'min({edge},ih)'"
+    )
+    result = subprocess.run(
+        [ffmpeg, '-loglevel', 'error', '-i', 'pipe:0', '-frames:v', '1', '-vf', video_filter,
+         '-q:v', str(quality), '-f', 'image2', '-c:v', 'mjpeg', 'pipe:1'],
+        input=data, capture_output=True
+    )
+    if result.returncode != 0 or image_mime(result.stdout) != "image/jpeg":
+        raise Exception(f"Could not process cover art: {result.stderr.decode(errors='ignore').strip()}")
+    return result.stdout
+
+
+class CoverCache:
+    """
+    Local cache of processed cover art.
+    Covers are stored under the hash of the downloaded image (plus the target
+    edge), and thumbnail URLs map to those hashes, so a known URL costs no
+    download and identical art from different URLs is only processed once.
+    The least recently used covers are evicted once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=50 * 1024 * 1024, edge=600, ffmpeg='ffmpeg', memory_items=32):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.edge = edge
+        self.ffmpeg = ffmpeg
+        self.memory_items = memory_items
+        self.hits = 0
+        self.misses = 0
+
+        self._index_path = self.cache_dir / "index.json"
+        self._urls = {}
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._memory = OrderedDict()  # key -> bytes of recently used covers
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self):
+        """Read the URL and LRU index written by a previous session"""
+        try:
+            index = json.loads(self._index_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        for key, size in index.get('entries', []):
+            if (self.cache_dir / f"{key}.jpg").exists():
+                self._entries[key] = size
+        self._urls = {url: key for url, key in index.get('urls', {}).items() if key in self._entries}
+
+    def _save_index(self):
+        """Write the index atomically (call with lock held)"""
+        temp_path = self._index_path.with_suffix('.tmp')
+        temp_path.write_text(json.dumps({
+            'urls': self._urls,
+            'entries': list(self._entries.items()),
+        }), encoding='utf-8')
+        os.replace(temp_path, self._index_path)
+
+    def _read(self, key):
+        """Cached bytes for a key, marking it as recently used (call with lock held)"""
+        data = self._memory.get(key)
+        if data is None:
+            try:
+                data = (self.cache_dir / f"{key}.jpg").read_bytes()
+            except OSError:
+                return None
+        self._entries.move_to_end(key)
+        self._remember(key, data)
+        return data
+
+    def _remember(self, key, data):
+        """Keep recently used covers in memory (call with lock held)"""
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        """Drop least recently used covers until the cache fits (call with lock held)"""
+        total = sum(self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            total -= size
+            self._memory.pop(key, None)
+            try:
+                (self.cache_dir / f"{key}.jpg").unlink()
+            except OSError:
+                pass
+        self._urls = {url: key for url, key in self._urls.items() if key in self._entries}
+
+    def get(self, url, download, ffmpeg=None):
+        """Processed JPEG cover for a thumbnail URL; download(url) is only called on a URL miss"""
+        with self._lock:
+            key = self._urls.get(url)
+            data = self._read(key) if key else None
+            if data is not None:
+                self.hits += 1
+                return data
+
+        source = download(url)
+        key = f"{hashlib.sha256(source).hexdigest()}_{self.edge}"
+
+        with self._lock:
+            data = self._read(key) if key in self._entries else None
+            if data is not None:
+                self.hits += 1
+                self._urls[url] = key
+                self._save_index()
+                return data
+            self.misses += 1
+
+        data = process_cover(source, self.edge, ffmpeg or self.ffmpeg)
+
+        with self._lock:
+            (self.cache_dir / f"{key}.jpg").write_bytes(data)
+            self._entries[key] = len(data)
+            self._urls[url] = key
+            self._remember(key, data)
+            self._evict()
+            self._save_index()
+        return data
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'covers': len(self._entries),
+                'bytes': sum(self._entries.values()),
+            }
+
+
+def fetch_cover(ydl, info, ffmpeg='ffmpeg', cache=None):
+    """Get the cover for a video in memory; returns (data, mime) or None"""
+    url = select_thumbnail(info)
+    if not url:
+        return None
+
+    def download(thumbnail_url):
+        with ydl.urlopen(thumbnail_url) as response:
+            return response.read()
+
+    if cache is not None:
+        return cache.get(url, download, ffmpeg), "image/jpeg"
+    return normalize_cover(download(url), ffmpeg)
@@ -0,0 +1,601 @@
+"""
+Core Module - Download Daemon
+One shared, persistent job queue served over a small local HTTP/JSON API
+
+    POST   /jobs                   submit {"url": ...} or {"urls": [...]}, optional "format", "type",
+                                   "selected_ids" (playlist entries to download) and "submitter"
+    GET    /jobs                   list jobs (?status=queued|running|done|failed|cancelled)
+    GET    /jobs/<id>              job details and results
+    GET    /jobs/<id>/events       progress as server-sent events (resumable with Last-Event-ID)
+    POST   /jobs/<id>/cancel       cancel (DELETE /jobs/<id> does the same)
+    GET    /jobs/<id>/files/<n>    download the n-th finished file of a job
+    GET    /health                 queue and rate limiter status
+    GET    /metrics                stage timings and counters in Prometheus text format
+                                   (when metrics are enabled, e.g. yt2mp3 serve --metrics)
+
+With a work queue attached the daemon also hands out single tracks to
+distributed workers on other machines (see core.work_queue):
+
+    POST   /work/items             add {"url", "format", "entries": [...]} as one work item per entry
+    POST   /work/claim             lease the next item to {"worker_id"}
+    POST   /work/<id>/heartbeat    renew a lease
+    POST   /work/<id>/complete     report a finished item with its "result"
+    POST   /work/<id>/fail         report a failed item with its "error"
+    GET    /work                   item counts per state
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs, quote
+
+from core.engine import DownloadEngine
+from core.events import Completed, Exists, Skipped, Error, Finished
+from core.metrics import PROMETHEUS_CONTENT_TYPE, get_metrics
+from core.rate_limiter import get_rate_limiter
+
+
+JOB_STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+FINAL_STATES = ('done', 'failed', 'cancelled')
+
+# Finished jobs (with their event logs) kept in memory; older ones stay only in the database
+KEEP_FINISHED = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daemon_jobs (
+    job_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    audio_format TEXT NOT NULL,
+    download_type TEXT NOT NULL,
+    selected_ids_json TEXT,
+    submitter TEXT,
+    status TEXT NOT NULL,
+    results_json TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+"""
+
+
+class DaemonJob:
+    """A submitted URL with its results and a bounded log of its events"""
+
+    def __init__(self, job_id, url, audio_format, download_type, selected_ids=None, submitter=None,
+                 status='queued', created_at=None, results=None, max_events=1000):
+        self.job_id = job_id
+        self.url = url
+        self.audio_format = audio_format
+        self.download_type = download_type
+        self.selected_ids = selected_ids
+        self.submitter = submitter
+        self.status = status
+        self.created_at = created_at or time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.results = results or {'completed': [], 'exists': [], 'skipped': [], 'errors': []}
+        self.engine = None
+        self.cancelled = False
+        self._events = deque(maxlen=max_events)
+        self._seq = 0
+        self.cond = threading.Condition()
+
+    def add_event(self, event):
+        """Record an engine event (called on engine threads)"""
+        data = event.to_dict()
+        with self.cond:
+            if isinstance(event, Completed):
+                self.results['completed'].append(
+                    {'file_path': event.file_path, 'metadata': event.metadata, 'index': event.index})
+            elif isinstance(event, Exists):
+                self.results['exists'].append({'file_path': event.file_path, 'index': event.index})
+            elif isinstance(event, Skipped):
+                self.results['skipped'].append({'title': event.title, 'file_path': event.file_path})
+            elif isinstance(event, Error):
+                self.results['errors'].append(event.message)
+            self._seq += 1
+            self._events.append((self._seq, data))
+            self.cond.notify_all()
+
+    def events_since(self, seq):
+        """Recorded events after the given sequence number (call with cond held)"""
+        return [(n, data) for n, data in self._events if n > seq]
+
+    def finished(self):
+        """True once the job reached a final state"""
+        return self.status in FINAL_STATES
+
+    def summary(self):
+        """Job as a JSON-ready dict"""
+        with self.cond:
+            return {
+                'job_id': self.job_id,
+                'url': self.url,
+                'format': self.audio_format,
+                'type': self.download_type,
+                'selected_ids': self.selected_ids,
+                'submitter': self.submitter,
+                'status': self.status,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'results': json.loads(json.dumps(self.results, default=str)),
+            }
+
+
+class JobQueue:
+    """
+    Persistent FIFO of daemon jobs.
+    Jobs that were queued or running when the daemon stopped are queued again on start.
+    Only the newest keep_finished finished jobs are kept in memory (and listed or served).
+    """
+
+    def __init__(self, path, keep_finished=KEEP_FINISHED):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self.keep_finished = max(0, int(keep_finished))
+        self.jobs = {}
+        self._finished = deque()  # IDs of finished jobs in memory, oldest first
+
+        rows = self._conn.execute(
+            "SELECT job_id, url, audio_format, download_type, selected_ids_json, submitter, status, results_json, "
+            "created_at, started_at, finished_at FROM daemon_jobs ORDER BY created_at"
+        ).fetchall()
+        for job_id, url, audio_format, download_type, selected_ids_json, submitter, status, results_json, \
+                created_at, started_at, finished_at in rows:
+            if status not in FINAL_STATES:
+                status = 'queued'
+            selected_ids = json.loads(selected_ids_json) if selected_ids_json else None
+            results = json.loads(results_json) if results_json and status != 'queued' else None
+            job = DaemonJob(job_id, url, audio_format, download_type, selected_ids, submitter, status,
+                            created_at, results)
+            job.started_at = started_at
+            job.finished_at = finished_at
+            self.jobs[job_id] = job
+            if status == 'queued':
+                self._pending.put(job)
+            else:
+                self._finished.append(job_id)
+        self._evict()
+
+    def submit(self, url, audio_format='mp3', download_type='auto', selected_ids=None, submitter=None):
+        """Queue a new job"""
+        job = DaemonJob(uuid.uuid4().hex[:12], url, audio_format, download_type, selected_ids, submitter)
+        with self._db_lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO daemon_jobs (job_id, url, audio_format, download_type, selected_ids_json, "
+                    "submitter, status, created_at) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+                    (job.job_id, url, audio_format, download_type,
+                     json.dumps(selected_ids) if selected_ids is not None else None, submitter, job.created_at)
+                )
+        with self._lock:
+            self.jobs[job.job_id] = job
+        self._pending.put(job)
+        return job
+
+    def next(self):
+        """Block until a queued job is available; None means stop"""
+        while True:
+            job = self._pending.get()
+            if job is None or not job.cancelled:
+                return job
+
+    def wake(self):
+        """Release one waiting next() call with None"""
+        self._pending.put(None)
+
+    def get(self, job_id):
+        """Job by ID, or None"""
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self, status=None):
+        """All jobs in submission order, or only those in a state"""
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return [job for job in jobs if status is None or job.status == status]
+
+    def counts(self):
+        """Number of jobs per state"""
+        counts = dict.fromkeys(JOB_STATES, 0)
+        for job in self.list():
+            counts[job.status] += 1
+        return counts
+
+    def set_status(self, job, status):
+        """Move a job to a new state and persist it"""
+        now = time.time()
+        with job.cond:
+            newly_finished = status in FINAL_STATES and job.status not in FINAL_STATES
+            job.status = status
+            if status == 'running':
+                job.started_at = now
+            elif status in FINAL_STATES:
+                job.finished_at = now
+            results_json = json.dumps(job.results, default=str)
+            job.cond.notify_all()
+        with self._db_lock:
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE daemon_jobs SET status = ?, results_json = ?, started_at = ?, finished_at = ? "
+                    "WHERE job_id = ?",
+                    (status, results_json, job.started_at, job.finished_at, job.job_id)
+                )
+        if newly_finished:
+            with self._lock:
+                self._finished.append(job.job_id)
+                self._evict()
+
+    def _evict(self):
+        """Forget the oldest finished jobs beyond keep_finished (call with _lock held or before sharing)"""
+        while len(self._finished) > self.keep_finished:
+            self.jobs.pop(self._finished.popleft(), None)
+
+    def close(self):
+        """Close the queue database"""
+        with self._db_lock:
+            self._conn.close()
+
+
+class DownloadDaemon:
+    """Worker pool draining the shared job queue; all workers share one rate limiter, archive and cover cache"""
+
+    def __init__(self, download_folder, queue_path, workers=2, max_parallel=2, archive=None,
+                 cover_cache=None, progress_rate=2.0, work_queue=None):
+        self.download_folder = Path(download_folder)
+        self.queue = JobQueue(queue_path)
+        self.work_queue = work_queue
+        self.workers = max(1, int(workers))
+        self.max_parallel = max_parallel
+        self.archive = archive
+        self.cover_cache = cover_cache
+        self.progress_rate = progress_rate
+        self.rate_limiter = get_rate_limiter()
+        self._threads = []
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start the worker threads"""
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"daemon-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Stop after the tracks in progress; unfinished jobs are queued again on the next start"""
+        self._stopping.set()
+        for job in self.queue.list('running'):
+            if job.engine is not None:
+                job.engine.cancel()
+        for _ in self._threads:
+            self.queue.wake()
+        for thread in self._threads:
+            thread.join()
+        self.queue.close()
+        if self.work_queue is not None:
+            self.work_queue.close()
+
+    def submit(self, url, audio_format='mp3', download_type='auto', selected_ids=None, submitter=None):
+        """Queue a URL for the worker pool"""
+        return self.queue.submit(url, audio_format, download_type, selected_ids, submitter)
+
+    def cancel(self, job):
+        """Cancel a queued or running job"""
+        # Under the job's lock, so a worker picking the job up either sees the flag or has set job.engine
+        with job.cond:
+            if job.finished():
+                return False
+            job.cancelled = True
+            engine = job.engine
+            queued = engine is None and job.status == 'queued'
+        if engine is not None:
+            engine.cancel()
+        elif queued:
+            self.queue.set_status(job, 'cancelled')
+            job.add_event(Finished())
+        return True
+
+    def _work(self):
+        """Worker loop"""
+        while not self._stopping.is_set():
+            job = self.queue.next()
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job):
+        """Download one job"""
+        engine = DownloadEngine(job.url, job.audio_format, self.download_folder, job.download_type,
+                                max_parallel=self.max_parallel, selected_ids=job.selected_ids, archive=self.archive,
+                                progress_rate=self.progress_rate, cover_cache=self.cover_cache)
+        engine.subscribe(job.add_event)
+        with job.cond:
+            if job.cancelled:
+                # Cancelled after next() handed it out; cancel() finishes it
+                return
+            job.engine = engine
+            self.queue.set_status(job, 'running')
+        try:
+            engine.run()
+        finally:
+            job.engine = None
+            if job.cancelled:
+                status = 'cancelled'
+            elif self._stopping.is_set():
+                status = 'queued'
+            elif job.results['errors'] and not (job.results['completed'] or job.results['exists']
+                                                or job.results['skipped']):
+                status = 'failed'
+            else:
+                status = 'done'
+            self.queue.set_status(job, status)
+
+    def health(self):
+        """Queue and rate limiter status"""
+        return {
+            'status': 'ok',
+            'workers': self.workers,
+            'jobs': self.queue.counts(),
+            'rate_limiter': self.rate_limiter.metrics(),
+        }
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end; the daemon is attached to the server"""
+
+    protocol_version = "HTTP/1.1"
+    heartbeat_interval = 15.0
+
+    @property
+    def daemon(self):
+        """DownloadDaemon served by this handler"""
+        return self.server.download_daemon
+
+    def log_message(self, format, *args):
+        """Keep request logging off the console"""
+        pass
+
+    def _send_json(self, data, status=200):
+        """Send a JSON response"""
+        body = json.dumps(data, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        """Send a JSON error response"""
+        self._send_json({'error': message}, status)
+
+    def _read_json(self):
+        """Decode the JSON request body; raises ValueError unless it is an object"""
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        request = json.loads(self.rfile.read(length).decode('utf-8'))
+        if not isinstance(request, dict):
+            raise ValueError("not a JSON object")
+        return request
+
+    def _route(self):
+        """(path parts, query) of the request"""
+        parsed = urlparse(self.path)
+        return [part for part in parsed.path.split('/') if part], parse_qs(parsed.query)
+
+    def _job(self, job_id):
+        """Job for a URL path, answering 404 if there is none"""
+        job = self.daemon.queue.get(job_id)
+        if job is None:
+            self._send_error(404, f"Unknown job {job_id}")
+        return job
+
+    def do_GET(self):
+        parts, query = self._route()
+        if parts == ['health']:
+            self._send_json(self.daemon.health())
+        elif parts == ['metrics']:
+            self._send_metrics()
+        elif parts and parts[0] == 'work':
+            self._work_request(parts, {})
+        elif parts == ['jobs']:
+            status = query.get('status', [None])[0]
+            self._send_json({'jobs': [job.summary() for job in self.daemon.queue.list(status)]})
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self._job(parts[1])
+            if job:
+                self._send_json(job.summary())
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'events':
+            job = self._job(parts[1])
+            if job:
+                since = self.headers.get('Last-Event-ID') or query.get('since', ['0'])[0]
+                try:
+                    since = int(since)
+                except ValueError:
+                    since = -1
+                if since < 0:
+                    self._send_error(400, "Last-Event-ID and since must be event numbers")
+                    return
+                self._stream_events(job, since)
+        elif len(parts) == 4 and parts[0] == 'jobs' and parts[2] == 'files':
+            job = self._job(parts[1])
+            if job:
+                self._send_file(job, parts[3])
+        else:
+            self._send_error(404, "Not found")
+
+    def do_POST(self):
+        parts, _ = self._route()
+        if parts == ['jobs']:
+            try:
+                request = self._read_json()
+            except ValueError:
+                self._send_error(400, "Body must be a JSON object")
+                return
+            urls = request['urls'] if 'urls' in request else [request['url']] if request.get('url') else []
+            audio_format = request.get('format', 'mp3')
+            download_type = request.get('type', 'auto')
+            if not urls:
+                self._send_error(400, "No url given")
+                return
+            if not isinstance(urls, list) or not all(isinstance(url, str) and url for url in urls):
+                self._send_error(400, "url must be a string and urls a list of strings")
+                return
+            if audio_format not in ('mp3', 'm4a') or download_type not in ('auto', 'single', 'playlist'):
+                self._send_error(400, "Unsupported format or type")
+                return
+            selected_ids = request.get('selected_ids')
+            if selected_ids is not None and not (isinstance(selected_ids, list)
+                                                 and all(isinstance(video_id, str) for video_id in selected_ids)):
+                self._send_error(400, "selected_ids must be a list of strings")
+                return
+            jobs = [self.daemon.submit(url, audio_format, download_type, selected_ids, request.get('submitter'))
+                    for url in urls]
+            self._send_json({'jobs': [job.summary() for job in jobs]}, 201)
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+            self._cancel(parts[1])
+        elif parts and parts[0] == 'work':
+            try:
+                request = self._read_json()
+            except ValueError:
+                self._send_error(400, "Body must be a JSON object")
+                return
+            self._work_request(parts, request)
+        else:
+            self._send_error(404, "Not found")
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) == 2 and parts[0] == 'jobs':
+            self._cancel(parts[1])
+        else:
+            self._send_error(404, "Not found")
+
+    def _work_request(self, parts, request):
+        """Lease queue endpoints for distributed workers"""
+        work_queue = self.daemon.work_queue
+        if work_queue is None:
+            self._send_error(404, "Work queue not enabled")
+            return
+        if parts == ['work'] and self.command == 'GET':
+            self._send_json(work_queue.stats())
+        elif parts == ['work', 'items']:
+            if not request.get('url') or not request.get('entries'):
+                self._send_error(400, "url and entries are required")
+                return
+            batch_id = work_queue.enqueue(request['url'], request.get('format', 'mp3'), request['entries'])
+            self._send_json({'batch_id': batch_id}, 201)
+        elif parts == ['work', 'claim']:
+            self._send_json({'item': work_queue.claim(request.get('worker_id'))})
+        elif len(parts) == 3 and parts[2] in ('heartbeat', 'complete', 'fail'):
+            item_id, worker_id = parts[1], request.get('worker_id')
+            if parts[2] == 'heartbeat':
+                ok = work_queue.heartbeat(item_id, worker_id)
+            elif parts[2] == 'complete':
+                ok = work_queue.complete(item_id, worker_id, request.get('result'))
+            else:
+                ok = work_queue.fail(item_id, worker_id, request.get('error'))
+            self._send_json({'ok': ok})
+        else:
+            self._send_error(404, "Not found")
+
+    def _cancel(self, job_id):
+        """Cancel a job and answer with its state"""
+        job = self._job(job_id)
+        if job:
+            cancelled = self.daemon.cancel(job)
+            self._send_json(dict(job.summary(), cancelled=cancelled))
+
+    def _send_metrics(self):
+        """Prometheus text exposition of the process metrics plus job counts"""
+        metrics = get_metrics()
+        if not metrics.enabled:
+            self._send_error(404, "Metrics are disabled (start the daemon with --metrics)")
+            return
+        lines = [metrics.prometheus(), f"# TYPE {metrics.prefix}_daemon_jobs gauge\n"]
+        for status, count in self.daemon.queue.counts().items():
+            lines.append(f'{metrics.prefix}_daemon_jobs{{status="{status}"}} {count}\n')
+        body = ''.join(lines).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_file(self, job, number):
+        """Stream a finished file of a job"""
+        try:
+            file_path = Path(job.results['completed'][int(number)]['file_path'])
+        except (ValueError, IndexError):
+            self._send_error(404, "No such file")
+            return
+        if not file_path.exists():
+            self._send_error(410, "File no longer exists")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(file_path.stat().st_size))
+        self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(file_path.name)}")
+        self.end_headers()
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(64 * 1024)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+    def _stream_events(self, job, seq):
+        """Send job events as server-sent events until the job is finished"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        try:
+            while True:
+                with job.cond:
+                    events = job.events_since(seq)
+                    if not events and not job.finished():
+                        job.cond.wait(self.heartbeat_interval)
+                        events = job.events_since(seq)
+                    finished = job.finished()
+
+                if not events and not finished:
+                    self.wfile.write(b": keep-alive\n\n")
+                for n, data in events:
+                    seq = n
+                    self.wfile.write(f"id: {n}\nevent: {data['event']}\ndata: {json.dumps(data, default=str)}\n\n"
+                                     .encode('utf-8'))
+                self.wfile.flush()
+
+                if finished and not events:
+                    # Jobs loaded from an earlier run have no event log left
+                    if seq == 0:
+                        self.wfile.write(b"event: finished\ndata: {\"event\": \"finished\"}\n\n")
+                        self.wfile.flush()
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+
+def create_server(daemon, host='127.0.0.1', port=8765):
+    """HTTP server bound to the given daemon (call serve_forever() on it)"""
+    server = ThreadingHTTPServer((host, port), DaemonRequestHandler)
+    server.daemon_threads = True
+    server.download_daemon = daemon
+    return server
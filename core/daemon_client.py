@@ -0,0 +1,84 @@
+"""
+Core Module - Daemon Client
+Talks to a running download daemon over its HTTP/JSON API
+"""
+
+import json
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from core.events import event_from_dict
+
+
+class DaemonError(Exception):
+    """The daemon rejected a request or could not be reached"""
+
+
+class DaemonClient:
+    """Small blocking client for core.daemon"""
+
+    def __init__(self, base_url="http://127.0.0.1:8765", timeout=10.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, data=None):
+        """Send a request and decode the JSON answer"""
+        body = json.dumps(data).encode('utf-8') if data is not None else None
+        request = Request(self.base_url + path, data=body, method=method,
+                          headers={'Content-Type': 'application/json'})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except HTTPError as e:
+            try:
+                message = json.loads(e.read().decode('utf-8')).get('error', str(e))
+            except ValueError:
+                message = str(e)
+            raise DaemonError(message) from e
+        except OSError as e:
+            raise DaemonError(f"Download daemon not reachable at {self.base_url}: {e}") from e
+
+    def health(self):
+        """Queue and rate limiter status"""
+        return self.request('GET', '/health')
+
+    def submit(self, urls, audio_format='mp3', download_type='auto', selected_ids=None, submitter=None):
+        """Queue one or more URLs; returns the created jobs"""
+        if isinstance(urls, str):
+            urls = [urls]
+        data = {'urls': list(urls), 'format': audio_format, 'type': download_type,
+                'selected_ids': selected_ids, 'submitter': submitter}
+        return self.request('POST', '/jobs', data)['jobs']
+
+    def list_jobs(self, status=None):
+        """All jobs, or only those in a state"""
+        return self.request('GET', '/jobs' + (f'?status={status}' if status else ''))['jobs']
+
+    def get_job(self, job_id):
+        """Job details and results"""
+        return self.request('GET', f'/jobs/{job_id}')
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job"""
+        return self.request('POST', f'/jobs/{job_id}/cancel')
+
+    def events(self, job_id, since=0):
+        """
+        Yield the events of a job (core.events instances) as they happen,
+        until the job has finished.
+        """
+        request = Request(f"{self.base_url}/jobs/{job_id}/events?since={since}")
+        try:
+            response = urlopen(request)
+        except OSError as e:
+            raise DaemonError(f"Download daemon not reachable at {self.base_url}: {e}") from e
+
+        with response:
+            data_lines = []
+            for raw in response:
+                line = raw.decode('utf-8').rstrip('\r\n')
+                if line.startswith('data:'):
+                    data_lines.append(line[5:].strip())
+                elif not line and data_lines:
+                    yield event_from_dict(json.loads('\n'.join(data_lines)))
+                    data_lines = []
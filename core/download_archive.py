@@ -0,0 +1,132 @@
+"""
+Core Module - Download Archive
+Persistent index of downloaded videos keyed by YouTube video ID
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from utils.name_allocator import CASE_INSENSITIVE
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive (
+    video_id TEXT NOT NULL,
+    audio_format TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    size INTEGER,
+    sha256 TEXT,
+    downloaded_at REAL NOT NULL,
+    PRIMARY KEY (video_id, audio_format)
+);
+"""
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadArchive:
+    """
+    Archive of finished downloads.
+    The whole table is held in memory so lookups are O(1) dict hits;
+    every change is written through to SQLite.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+        self._entries = {}
+        self._by_path = {}
+        for video_id, audio_format, file_path, size, sha256, downloaded_at in self._conn.execute(
+                "SELECT video_id, audio_format, file_path, size, sha256, downloaded_at FROM archive"):
+            self._index(video_id, audio_format, {
+                'file_path': file_path,
+                'size': size,
+                'sha256': sha256,
+                'downloaded_at': downloaded_at,
+            })
+
+    def _index(self, video_id, audio_format, entry):
+        """Put an entry into the in-memory indexes"""
+        key = (video_id, audio_format)
+        self._entries[key] = entry
+        self._by_path[self._path_key(entry['file_path'])] = key
+
+    @staticmethod
+    def _path_key(file_path):
+        """Normalized path used for reverse lookups; case only folded where the file system ignores it"""
+        path = str(Path(file_path).resolve())
+        return path.casefold() if CASE_INSENSITIVE else path
+
+    def lookup(self, video_id, audio_format):
+        """Archived entry for a video in a format, or None if missing or its file is gone"""
+        if not video_id:
+            return None
+        with self._lock:
+            entry = self._entries.get((video_id, audio_format))
+        if entry is None or not Path(entry['file_path']).exists():
+            return None
+        return dict(entry, video_id=video_id, audio_format=audio_format)
+
+    def add(self, video_id, audio_format, file_path):
+        """Record a finished download"""
+        file_path = Path(file_path)
+        entry = {
+            'file_path': str(file_path),
+            'size': file_path.stat().st_size,
+            'sha256': file_sha256(file_path),
+            'downloaded_at': time.time(),
+        }
+        with self._lock:
+            old = self._entries.get((video_id, audio_format))
+            if old is not None:
+                self._by_path.pop(self._path_key(old['file_path']), None)
+            self._index(video_id, audio_format, entry)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO archive VALUES (?, ?, ?, ?, ?, ?)",
+                    (video_id, audio_format, entry['file_path'], entry['size'], entry['sha256'],
+                     entry['downloaded_at'])
+                )
+
+    def update_file(self, old_path, new_path=None):
+        """
+        Keep the archive consistent after a file was retagged and/or renamed.
+        Files that are not in the archive are ignored.
+        """
+        new_path = Path(new_path or old_path)
+        with self._lock:
+            key = self._by_path.pop(self._path_key(old_path), None)
+            if key is None:
+                return False
+            entry = dict(self._entries[key])
+            entry['file_path'] = str(new_path)
+            if new_path.exists():
+                entry['size'] = new_path.stat().st_size
+                entry['sha256'] = file_sha256(new_path)
+            self._index(key[0], key[1], entry)
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE archive SET file_path = ?, size = ?, sha256 = ? WHERE video_id = ? AND audio_format = ?",
+                    (entry['file_path'], entry['size'], entry['sha256'], key[0], key[1])
+                )
+        return True
+
+    def close(self):
+        """Close the archive database"""
+        with self._lock:
+            self._conn.close()
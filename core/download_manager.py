@@ -1,353 +1,77 @@
 """
-Core Module - Download Manager with thumbnail support
+Core Module - Download Manager
+Thin Qt adapter over the download engine: runs it on a QThread and forwards its events as signals
 """
 
-import os
-import time
+import getpass
+import threading
+from dataclasses import asdict
 from pathlib import Path
 from PySide6.QtCore import QObject, Signal, QThread
-import yt_dlp
 
-from utils.file_utils import sanitize_filename
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB, TDRC
-from mutagen.mp4 import MP4, MP4Cover
+from core.cover_art import CoverCache
+from core.download_archive import DownloadArchive
+from core.events import EngineObserver, Finished
+from core.job_journal import JobJournal
+from core.rate_limiter import get_rate_limiter
+from utils.file_utils import get_app_data_dir
 
 
-class DownloadWorker(QObject):
-    """Worker thread for downloading audio"""
+class EngineRunner(QObject):
+    """Runs a DownloadEngine when its QThread starts"""
     
-    started = Signal(str)
-    progress = Signal(float)
-    completed = Signal(str, dict, object)
-    error = Signal(str)
-    playlist_progress = Signal(int, int)
-    file_exists_check = Signal(str, str, dict, object)
-    
-    def __init__(self, url, audio_format, download_folder, download_type="auto", selected_indices=None):
+    def __init__(self, engine):
         super().__init__()
-        self.url = url
-        self.audio_format = audio_format
-        self.music_dir = Path(download_folder)
-        self.download_type = download_type
-        self.selected_indices = selected_indices
-        self.is_playlist = False
-        self.total_videos = 0
-        self.current_video = 0
+        self.engine = engine
         
     def run(self):
         """Execute download"""
-        try:
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'outtmpl': str(self.music_dir / '%(title)s.%(ext)s'),
-                'postprocessors': [
-                    {
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': self.audio_format,
-                        'preferredquality': '192',
-                    },
-                    {
-                        'key': 'EmbedThumbnail',
-                        'already_have_thumbnail': False,
-                    }
-                ],
-                'writethumbnail': True,  # Will create separate .jpg/.png
-                'embedthumbnail': True,  # Also tries to embed, but doesn't always work
-                'add_metadata': False,
-                'progress_hooks': [self.progress_hook],
-                'quiet': True,
-                'no_warnings': True,
-                'ignoreerrors': True,
-                'sleep_interval': 2,
-                'max_sleep_interval': 5,
-            }
-
-            effective_url = self.url
+        self.engine.run()
 
-            if self.download_type == "single":
-                if "list=" in effective_url and "&noplaylist=1" not in effective_url:
-                    effective_url += "&noplaylist=1"
-                ydl_opts['yes_playlist'] = False
 
-            elif self.download_type == "playlist":
-                effective_url = effective_url.replace("&noplaylist=1", "")
-                ydl_opts['yes_playlist'] = True
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(effective_url, download=False)
-                
-                if not info:
-                    self.error.emit("Failed to extract video information")
-                    return
-                
-                # Proveri dostupnost za single video
-                if self.download_type == "single":
-                    if info.get('availability', '') == 'private':
-                        self.error.emit("This video is private. You need to sign in to access it.")
-                        return
-                    if 'unavailable' in str(info.get('title', '')).lower() or 'terminated' in str(info.get('uploader', '')).lower():
-                        self.error.emit("This video is no longer available.")
-                        return
-                
-                is_playlist_detected = 'entries' in info
-                if self.download_type == "single":
-                    is_playlist_detected = False
-
-                if is_playlist_detected:
-                    self.is_playlist = True
-                    entries = [e for e in info['entries'] if e is not None]
-                    
-                    if self.selected_indices is not None:
-                        entries = [entries[i] for i in self.selected_indices if i < len(entries)]
-                    
-                    self.total_videos = len(entries)
-                    
-                    for idx, entry in enumerate(entries, 1):
-                        self.current_video = idx
-                        self.playlist_progress.emit(idx, self.total_videos)
-                        
-                        try:
-                            self.download_single_video(entry, ydl, idx)
-                            time.sleep(2)
-                        except Exception as e:
-                            error_msg = str(e)
-                            if "rate-limited" in error_msg.lower():
-                                self.error.emit("YouTube rate limit reached. Please wait and try again later.")
-                                break
-                            self.error.emit(f"Skipped '{entry.get('title', 'Unknown')}': {str(e)}")
-                            continue
-                else:
-                    self.download_single_video(info, ydl)
-                    
-        except Exception as e:
-            self.error.emit(f"Download failed: {str(e)}")
-            
-    def download_single_video(self, info, ydl, track_number=None):
-        """Download a single video"""
-        title = info.get('title', 'Unknown')
-        self.started.emit(title)
-        
-        metadata = self.extract_metadata(info)
-        potential_path = self.generate_filename(metadata, title)
-        
-        if potential_path.exists():
-            self.file_exists_check.emit(
-                potential_path.name,
-                str(potential_path),
-                metadata,
-                track_number
-            )
-            return
-        
-        try:
-            ydl.download([info['webpage_url'] if 'webpage_url' in info else info['id']])
-        except Exception as e:
-            if "rate-limited" in str(e).lower():
-                raise Exception("Rate limited by YouTube")
-            raise e
-        
-        file_path = self.find_downloaded_file(title)
-        
-        if file_path:
-            # Cleanup thumbnails
-            self.cleanup_thumbnails(file_path)
-            
-            # Embed thumbnail into the audio file
-            self.embed_thumbnail_into_file(file_path, info)
-            
-            self.completed.emit(str(file_path), metadata, track_number)
-        else:
-            self.error.emit(f"Downloaded file not found for: {title}")
+class SignalForwarder(EngineObserver):
+    """
+    Re-emits engine events as the DownloadManager's Qt signals.
+    Called on engine threads; Qt queues the signals to the receivers' thread.
+    """
     
-    def cleanup_thumbnails(self, audio_file):
-        """Remove leftover thumbnail files"""
-        audio_path = Path(audio_file)
-        thumb_extensions = ['.jpg', '.jpeg', '.png', '.webp']
+    def __init__(self, manager):
+        self.manager = manager
         
-        for ext in thumb_extensions:
-            thumb_file = audio_path.parent / f"{audio_path.stem}{ext}"
-            if thumb_file.exists():
-                try:
-                    thumb_file.unlink()
-                except:
-                    pass
-    
-    def embed_thumbnail_into_file(self, file_path, info):
-        """Embed thumbnail into the audio file using mutagen"""
-        try:
-            # Find thumbnail file
-            thumb_extensions = ['.jpg', '.jpeg', '.png', '.webp']
-            audio_path = Path(file_path)
-            
-            thumb_file = None
-            for ext in thumb_extensions:
-                candidate = audio_path.parent / f"{audio_path.stem}{ext}"
-                if candidate.exists():
-                    thumb_file = candidate
-                    break
-            
-            if not thumb_file:
-                return  # No thumbnail to embed
-            
-            # Read thumbnail data
-            with open(thumb_file, 'rb') as f:
-                thumb_data = f.read()
-            
-            # Get MIME type
-            mime_type = "image/jpeg"
-            if thumb_file.suffix.lower() == ".png":
-                mime_type = "image/png"
-            elif thumb_file.suffix.lower() == ".webp":
-                mime_type = "image/webp"
-            
-            # Embed into MP3 or M4A
-            if file_path.suffix.lower() == ".mp3":
-                audio = MP3(file_path, ID3=ID3)
-                if not audio.tags:
-                    audio.add_tags()
-                audio.tags.add(
-                    APIC(
-                        encoding=3,  # UTF-8
-                        mime=mime_type,
-                        type=3,  # Cover art
-                        desc='Cover',
-                        data=thumb_data
-                    )
-                )
-                audio.save()
-                
-            elif file_path.suffix.lower() == ".m4a":
-                audio = MP4(file_path)
-                cover = MP4Cover(thumb_data, imageformat=MP4Cover.FORMAT_JPEG if mime_type == "image/jpeg" else MP4Cover.FORMAT_PNG)
-                audio["covr"] = [cover]
-                audio.save()
-            
-            # Delete temporary thumbnail file
-            thumb_file.unlink()
-            
-        except Exception as e:
-            print(f"Failed to embed thumbnail: {str(e)}")
-    
-    def generate_filename(self, metadata, fallback_title):
-        """Generate expected filename based on metadata"""
-        artist = metadata.get('artist', '')
-        title = metadata.get('title', fallback_title)
+    def on_started(self, event):
+        if event.index is not None:
+            self.manager.track_started.emit(event.index, event.title)
+        self.manager.download_started.emit(event.title)
         
-        if artist and title:
-            filename = f"{artist} - {title}"
-        elif title:
-            filename = title
-        else:
-            filename = fallback_title
-            
-        filename = sanitize_filename(filename)
-        return self.music_dir / f"{filename}.{self.audio_format}"
+    def on_progress(self, event):
+        self.manager.track_status.emit(asdict(event))
+        self.manager.progress_updated.emit(event.percent)
+        if event.index is not None:
+            self.manager.track_progress.emit(event.index, event.percent)
             
-    def extract_metadata(self, info):
-        """Extract metadata from video info with improved parsing"""
-        metadata = {}
+    def on_queue(self, event):
+        self.manager.queue_status.emit(asdict(event))
         
-        title = info.get('title', '')
+    def on_playlist_progress(self, event):
+        self.manager.playlist_progress.emit(event.completed, event.total)
         
-        if ' - ' in title:
-            parts = title.split(' - ', 1)
-            artist = parts[0].strip()
-            song_title = parts[1].strip()
-            song_title = self.clean_title(song_title)
-            metadata['artist'] = artist
-            metadata['title'] = song_title
-        elif ': ' in title:
-            parts = title.split(': ', 1)
-            artist = parts[0].strip()
-            song_title = self.clean_title(parts[1].strip())
-            metadata['artist'] = artist
-            metadata['title'] = song_title
-        else:
-            cleaned = self.clean_title(title)
-            metadata['title'] = cleaned
-            metadata['artist'] = info.get('uploader', info.get('channel', ''))
+    def on_stage_stats(self, event):
+        self.manager.pipeline_stats.emit(event.stages)
         
-        metadata['album'] = info.get('album', info.get('playlist_title', ''))
+    def on_completed(self, event):
+        self.manager.download_completed.emit(event.file_path, event.metadata, event.index)
         
-        return metadata
-    
-    def clean_title(self, title):
-        """Remove extra info from title - keep artist names in parentheses"""
-        import re
+    def on_exists(self, event):
+        self.manager.file_exists.emit(event.file_name, event.file_path, event.metadata, event.index)
         
-        remove_terms = [
-            'official video', 'official music video', 'official audio', 'official',
-            'lyrics', 'lyric video', 'with lyrics', 'letra', 'paroles',
-            'hd', 'hq', '4k', 'uhd', '1080p', '720p', '480p',
-            'audio', 'video', 'music video', 'visualizer', 'remaster', 'remastered',
-            'full album', 'full', 'explicit', 'clean version', 'radio edit',
-            'extended', 'remix', 'live', 'acoustic', 'unplugged'
-        ]
+    def on_skipped(self, event):
+        self.manager.download_skipped.emit(event.title, event.file_path)
         
-        year_pattern = r'\(?(?:19|20)\d{2}\)?'
-        title = re.sub(year_pattern, '', title)
+    def on_error(self, event):
+        self.manager.error_occurred.emit(event.message)
         
-        def process_bracket_content(match):
-            content = match.group(1).strip()
-            content_lower = content.lower()
-            
-            for term in remove_terms:
-                if term in content_lower:
-                    return ''
-            
-            if any(word in content_lower for word in ['feat', 'ft', 'featuring', 'with', '&', 'x']):
-                return match.group(0)
-            
-            if len(content) < 30:
-                return match.group(0)
-            
-            return ''
-        
-        title = re.sub(r'\(([^)]+)\)', process_bracket_content, title)
-        title = re.sub(r'\[([^\]]+)\]', process_bracket_content, title)
-        
-        title_lower = title.lower().strip()
-        for term in remove_terms:
-            if title_lower.endswith(term):
-                title = title[:-(len(term))].strip()
-                title_lower = title.lower().strip()
-        
-        title = re.sub(r'\s+', ' ', title)
-        title = re.sub(r'\s*[-_|]+\s*$', '', title)
-        
-        return title.strip()
-        
-    def find_downloaded_file(self, title):
-        """Find the downloaded file by title"""
-        sanitized = sanitize_filename(title)
-        time.sleep(0.5)
-        
-        for file in self.music_dir.glob(f"*.{self.audio_format}"):
-            if sanitized.lower() in file.stem.lower():
-                return file
-                
-        possible_path = self.music_dir / f"{sanitized}.{self.audio_format}"
-        if possible_path.exists():
-            return possible_path
-            
-        files = list(self.music_dir.glob(f"*.{self.audio_format}"))
-        if files:
-            return max(files, key=lambda p: p.stat().st_mtime)
-            
-        return None
-        
-    def progress_hook(self, d):
-        """Handle download progress updates"""
-        if d['status'] == 'downloading':
-            if 'total_bytes' in d:
-                percent = (d['downloaded_bytes'] / d['total_bytes']) * 100
-                self.progress.emit(percent)
-            elif 'total_bytes_estimate' in d:
-                percent = (d['downloaded_bytes'] / d['total_bytes_estimate']) * 100
-                self.progress.emit(percent)
-        elif d['status'] == 'finished':
-            self.progress.emit(100)
+    def on_finished(self, event):
+        self.manager.engine_finished.emit()
 
 
 class DownloadManager(QObject):
@@ -355,23 +79,88 @@ class DownloadManager(QObject):
     
     download_started = Signal(str)
     progress_updated = Signal(float)
+    track_started = Signal(int, str)
+    track_progress = Signal(int, float)
+    download_skipped = Signal(str, str)
+    track_status = Signal(dict)
+    queue_status = Signal(dict)
+    pipeline_stats = Signal(list)
     download_completed = Signal(str, dict, object)
     playlist_progress = Signal(int, int)
     error_occurred = Signal(str)
     all_downloads_finished = Signal()
     file_exists = Signal(str, str, dict, object)
+    engine_finished = Signal()
     
     def __init__(self):
         super().__init__()
         self.thread = None
-        self.worker = None
+        self.engine = None
+        self.runner = None
         self.download_folder = Path.home() / "Music"
+        self.max_parallel = 1
+        self.progress_rate = 10.0
+        self.journal = None
+        self.archive = None
+        self.cover_cache = None
+        self.cover_size = 600
+        self.engine_finished.connect(self.cleanup)
         
     def set_download_folder(self, folder):
         """Set download folder"""
         self.download_folder = Path(folder)
         
-    def start_download(self, url, audio_format, download_type="auto", selected_indices=None):
+    def set_progress_rate(self, max_rate):
+        """Set the maximum number of progress events per second for each track"""
+        self.progress_rate = float(max_rate)
+        
+    def set_max_parallel(self, max_parallel):
+        """Set how many playlist tracks may be downloaded at the same time"""
+        self.max_parallel = max(1, int(max_parallel))
+        
+    def get_journal(self):
+        """Job journal shared by all downloads (opened on first use)"""
+        if self.journal is None:
+            self.journal = JobJournal(get_app_data_dir() / "journal.sqlite3")
+        return self.journal
+        
+    def get_archive(self):
+        """Download archive shared by all downloads (opened on first use)"""
+        if self.archive is None:
+            self.archive = DownloadArchive(get_app_data_dir() / "archive.sqlite3")
+        return self.archive
+        
+    def get_cover_cache(self):
+        """Cover art cache shared by all downloads (opened on first use)"""
+        if self.cover_cache is None:
+            self.cover_cache = CoverCache(get_app_data_dir() / "covers", edge=self.cover_size)
+        return self.cover_cache
+        
+    def unfinished_jobs(self):
+        """Playlist jobs that were interrupted before they finished"""
+        return self.get_journal().unfinished_jobs()
+        
+    def flush_journal(self):
+        """Write pending journal updates to disk (e.g. before the app closes)"""
+        if self.journal is not None:
+            self.journal.flush()
+        
+    def discard_job(self, job_id):
+        """Forget an interrupted job"""
+        self.get_journal().discard_job(job_id)
+        
+    def resume_download(self, job_id, max_parallel=None):
+        """Resume an interrupted playlist job where it stopped"""
+        job = self.get_journal().get_job(job_id)
+        if job is None:
+            self.error_occurred.emit("Interrupted download could not be found")
+            return
+        self.download_folder = Path(job['download_folder'])
+        self.start_download(job['url'], job['audio_format'], job['download_type'],
+                            max_parallel=max_parallel, resume_job_id=job_id)
+        
+    def start_download(self, url, audio_format, download_type="auto", selected_indices=None, max_parallel=None,
+                       selected_ids=None, resume_job_id=None):
         """Start download in background thread"""
         try:
             if self.thread and self.thread.isRunning():
@@ -381,36 +170,85 @@ class DownloadManager(QObject):
             # Thread already deleted, continue
             pass
         
-        self.thread = QThread()
-        self.worker = DownloadWorker(url, audio_format, self.download_folder, download_type, selected_indices)
-        self.worker.moveToThread(self.thread)
+        if max_parallel is None:
+            max_parallel = self.max_parallel
         
-        self.thread.started.connect(self.worker.run)
-        self.worker.started.connect(self.download_started)
-        self.worker.progress.connect(self.progress_updated)
-        self.worker.completed.connect(self.download_completed)
-        self.worker.playlist_progress.connect(self.playlist_progress)
-        self.worker.error.connect(self.error_occurred)
-        self.worker.file_exists_check.connect(self.file_exists)
+        # Imported on first use: it pulls in yt-dlp and mutagen (usually warmed up by main.py already)
+        from core.engine import DownloadEngine
+        self.engine = DownloadEngine(url, audio_format, self.download_folder, download_type, selected_indices,
+                                     max_parallel, selected_ids, self.get_journal(), resume_job_id,
+                                     self.get_archive(), self.progress_rate, self.get_cover_cache())
+        self.engine.subscribe(SignalForwarder(self))
         
-        self.worker.completed.connect(self.check_if_finished)
-        self.worker.error.connect(self.check_if_finished)
-        self.worker.file_exists_check.connect(self.check_if_finished)
+        self.thread = QThread()
+        self.runner = EngineRunner(self.engine)
+        self.runner.moveToThread(self.thread)
+        self.thread.started.connect(self.runner.run)
         self.thread.finished.connect(self.thread.deleteLater)
         
         self.thread.start()
+            
+    def get_job_stats(self):
+        """Counters of the current (or last) download job"""
+        return self.engine.get_job_stats() if self.engine else {}
         
-    def check_if_finished(self):
-        """Check if all downloads are finished"""
-        if self.worker and self.worker.is_playlist:
-            if self.worker.current_video >= self.worker.total_videos:
-                self.cleanup()
-        else:
-            self.cleanup()
+    def get_rate_limiter_metrics(self):
+        """Current request rate and backoff state of the shared rate limiter"""
+        return get_rate_limiter().metrics()
             
     def cleanup(self):
         """Clean up thread"""
         if self.thread and self.thread.isRunning():
             self.thread.quit()
             self.thread.wait()
-        self.all_downloads_finished.emit()
\ No newline at end of file
+        self.all_downloads_finished.emit()
+
+
+class RemoteDownloadManager(DownloadManager):
+    """
+    DownloadManager that hands downloads to a download daemon (core.daemon)
+    and forwards the daemon's progress as the usual signals.
+    Files are written to the daemon's output folder; journal and archive live there too.
+    """
+    
+    def __init__(self, base_url):
+        super().__init__()
+        # urllib.request is only needed (and imported) in daemon mode
+        from core.daemon_client import DaemonClient
+        self.client = DaemonClient(base_url)
+        self.remote_job_id = None
+        
+    def start_download(self, url, audio_format, download_type="auto", selected_indices=None, max_parallel=None,
+                       selected_ids=None, resume_job_id=None):
+        """Queue the download on the daemon and follow its events in the background"""
+        job = self.client.submit(url, audio_format, download_type, selected_ids, submitter=getpass.getuser())[0]
+        self.remote_job_id = job['job_id']
+        threading.Thread(target=self._follow, args=(self.remote_job_id,), name="daemon-events", daemon=True).start()
+        
+    def _follow(self, job_id):
+        """Re-emit the daemon's events for a job until it finishes"""
+        from core.daemon_client import DaemonError
+        forwarder = SignalForwarder(self)
+        finished = False
+        try:
+            for event in self.client.events(job_id):
+                forwarder(event)
+                finished = isinstance(event, Finished)
+        except DaemonError as e:
+            self.error_occurred.emit(str(e))
+        if not finished:
+            self.engine_finished.emit()
+            
+    def get_archive(self):
+        """The daemon owns the download archive"""
+        return None
+        
+    def unfinished_jobs(self):
+        """The daemon queues its own interrupted jobs again; nothing to offer here"""
+        return []
+        
+    def get_job_stats(self):
+        """Results of the current (or last) daemon job"""
+        if not self.remote_job_id:
+            return {}
+        return self.client.get_job(self.remote_job_id)['results']
@@ -0,0 +1,844 @@
+"""
+Core Module - Download Engine
+Qt-free fetch -> transcode -> tag pipeline shared by the GUI and the command line
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+from pathlib import Path
+import yt_dlp
+from yt_dlp.extractor.youtube import YoutubeIE
+from yt_dlp.postprocessor import FFmpegExtractAudioPP
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+
+from core.cover_art import fetch_cover
+from core.events import (
+    EventPublisher, Started, Progress, QueueProgress, PlaylistProgress, StageStats,
+    Completed, Exists, Skipped, Error, Finished,
+)
+from core.metrics import get_metrics
+from core.profiling import get_profiler
+from core.progress import ProgressReporter
+from core.rate_limiter import get_rate_limiter, is_throttle_error
+from core.tag_manager import TagManager
+from core.titles import clean_title
+from utils.file_utils import sanitize_filename
+from utils.name_allocator import get_name_allocator
+
+
+# Prefer source streams that can be stream-copied into the target container
+FORMAT_SELECTORS = {
+    'm4a': 'bestaudio[acodec^=mp4a]/bestaudio/best',
+    'mp3': 'bestaudio[acodec=mp3]/bestaudio/best',
+}
+
+class ExtractAudioPP(FFmpegExtractAudioPP):
+    """FFmpegExtractAudioPP that records whether it stream-copied or re-encoded the audio"""
+    # Stays 'remux' when ffmpeg isn't run at all (the file already is in the target format)
+    conversion = 'remux'
+
+    def run_ffmpeg(self, path, out_path, codec, opts):
+        self.conversion = 'remux' if codec == 'copy' else 'transcode'
+        return super().run_ffmpeg(path, out_path, codec, opts)
+
+
+class TrackJob:
+    """A single playlist entry travelling through the download pipeline"""
+    
+    def __init__(self, index, info):
+        self.index = index
+        self.info = info
+        self.title = info.get('title', 'Unknown')
+        self.metadata = {}
+        self.file_path = None
+        self.target = None  # final "Artist - Title" path, reserved until the file is moved there
+        self.cover = None
+        self.state = 'queued'
+        
+    @classmethod
+    def from_journal(cls, track):
+        """Rebuild a job from a journaled track, starting over if its files are gone"""
+        info = track['info'] if track['info'] else track['entry']
+        job = cls(track['index'], info)
+        job.metadata = track['metadata']
+        job.state = track['state']
+        if track['file_path'] and Path(track['file_path']).exists():
+            job.file_path = Path(track['file_path'])
+        elif job.state != 'queued':
+            job.state = 'queued'
+            job.info = track['entry']
+        return job
+
+
+class PipelineStage:
+    """
+    One stage of the download pipeline.
+    Runs `handler` on its own worker threads, fed by a bounded input queue.
+    Whatever the handler returns is passed on to `next_stage`; returning None drops the job.
+    """
+    
+    def __init__(self, name, handler, workers, maxsize, next_stage=None, on_error=None, on_done=None):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=max(1, maxsize))
+        self.next_stage = next_stage
+        self.on_error = on_error
+        self.on_done = on_done
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.durations = []
+        self.started_at = None
+        self._threads = []
+        self._lock = threading.Lock()
+        self._abort = None
+        
+    def start(self, abort_event):
+        """Start the stage worker threads"""
+        self._abort = abort_event
+        self.started_at = time.monotonic()
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"{self.name}-stage", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            
+    def put(self, job):
+        """Queue a job, blocking while the stage is full"""
+        self.queue.put(job)
+        
+    def close(self):
+        """Let the workers finish everything queued, then stop them"""
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+            
+    def stats(self):
+        """Queue depth and throughput snapshot"""
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        with self._lock:
+            processed, failed, busy = self.processed, self.failed, self.busy_seconds
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'queue_depth': self.queue.qsize(),
+            'processed': processed,
+            'failed': failed,
+            'throughput': processed / elapsed if elapsed > 0 else 0.0,
+            'busy_seconds': busy,
+        }
+        
+    def latencies(self):
+        """Seconds the handler spent on each job so far (processed and failed)"""
+        with self._lock:
+            return list(self.durations)
+        
+    def _loop(self):
+        """Worker loop; every job is either passed on or ended (on_done), whatever fails"""
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            if self._abort is not None and self._abort.is_set():
+                self._callback(self.on_done, job)
+                continue
+            
+            started = time.monotonic()
+            try:
+                result = self.handler(job)
+            except Exception as e:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    self.failed += 1
+                    self.busy_seconds += elapsed
+                    self.durations.append(elapsed)
+                self._callback(self.on_error, self, job, e)
+                self._callback(self.on_done, job)
+                continue
+            
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.processed += 1
+                self.busy_seconds += elapsed
+                self.durations.append(elapsed)
+            
+            if result is not None and self.next_stage is not None:
+                try:
+                    self.next_stage.put(result)
+                    continue
+                except Exception as e:
+                    self._callback(self.on_error, self, job, e)
+            self._callback(self.on_done, job)
+            
+    def _callback(self, callback, *args):
+        """Run on_error/on_done; a failure is reported instead of ending the worker thread"""
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            get_metrics().error(self.name, e)
+            print(f"{self.name} stage: {callback.__name__} failed: {e}", file=sys.stderr)
+
+
+class DownloadEngine(EventPublisher):
+    """
+    Downloads one URL (video or playlist) through the pipeline.
+    Knows nothing about Qt: everything it reports is published as typed
+    events (core.events) to its subscribers, on the thread that produced them.
+    """
+    
+    def __init__(self, url, audio_format, download_folder, download_type="auto", selected_indices=None,
+                 max_parallel=1, selected_ids=None, journal=None, resume_job_id=None, archive=None,
+                 progress_rate=10.0, cover_cache=None, extractors=None):
+        super().__init__()
+        self.url = url
+        self.audio_format = audio_format
+        self.music_dir = Path(download_folder)
+        self.download_type = download_type
+        self.selected_indices = selected_indices
+        self.selected_ids = selected_ids
+        self.journal = journal
+        self.resume_job_id = resume_job_id
+        self.archive = archive
+        self.cover_cache = cover_cache
+        self.extractors = list(extractors or [])
+        self.tag_manager = TagManager()
+        self._ffmpeg = None
+        self.progress_reporter = ProgressReporter(self._publish_track_progress, self._publish_queue_progress,
+                                                  max_rate=progress_rate)
+        self.job_id = None
+        self.max_parallel = max(1, int(max_parallel or 1))
+        self.is_playlist = False
+        self.total_videos = 0
+        self.current_video = 0
+        self.completed_videos = 0
+        self._ydl_opts = None
+        self._lane = threading.local()
+        self._count_lock = threading.Lock()
+        self._abort = threading.Event()
+        self._abort_downloads = threading.Event()
+        self._thread_ydls = []
+        self.names = get_name_allocator(self.music_dir)
+        self.transcode_workers = os.cpu_count() or 1
+        self.stages = []
+        self.rate_limiter = get_rate_limiter()
+        self.metrics = get_metrics()
+        self.profiler = get_profiler()
+        self.profile = None
+        self.job_stats = {
+            'videos_extracted': 0,
+            'downloads_from_resolved_info': 0,
+            're_extractions': 0,
+            'archived_skips': 0,
+            'remuxed': 0,
+            'transcoded': 0,
+            'conversion_paths': {},
+        }
+        
+    def prepare_options(self):
+        """Build the yt-dlp options for this job; returns (listing options, URL to extract)"""
+        # FFmpegExtractAudio and tagging run as separate pipeline stages.
+        # The video ID keeps parallel lanes (and other jobs writing to the same folder) from
+        # sharing .part and output files when two entries have the same title
+        ydl_opts = {
+            'format': FORMAT_SELECTORS.get(self.audio_format, 'bestaudio/best'),
+            'outtmpl': str(self.music_dir / '%(title)s [%(id)s].%(ext)s'),
+            'add_metadata': False,
+            'progress_hooks': [self.progress_hook],
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            # Listing and per-track calls must raise so throttling reaches the rate limiter
+            'ignoreerrors': False,
+        }
+
+        effective_url = self.url
+
+        if self.download_type == "single":
+            if "list=" in effective_url and "&noplaylist=1" not in effective_url:
+                effective_url += "&noplaylist=1"
+            ydl_opts['yes_playlist'] = False
+
+        elif self.download_type == "playlist":
+            effective_url = effective_url.replace("&noplaylist=1", "")
+            ydl_opts['yes_playlist'] = True
+
+        self._ydl_opts = dict(ydl_opts)
+        return ydl_opts, effective_url
+        
+    def run(self):
+        """Execute download"""
+        self._profiled(YoutubeIE.get_temp_id(self.url), self._run)
+        
+    def _profiled(self, video_id, target, *args):
+        """Run target, under a job profile if the profiler picks this job (see core.profiling)"""
+        if self.profiler is not None:
+            self.profile = self.profiler.start(self.url, video_id)
+        if self.profile is None:
+            return target(*args)
+        try:
+            with self.profile.thread():
+                return target(*args)
+        finally:
+            profile, self.profile = self.profile, None
+            profile.finish()
+        
+    def _run(self):
+        """Download the URL and publish Finished at the end"""
+        started = time.perf_counter()
+        try:
+            ydl_opts, effective_url = self.prepare_options()
+
+            if self.resume_job_id:
+                self.resume_journal_job()
+                return
+
+            # Archived single videos are skipped before any network call
+            if self.download_type == "single":
+                video_id = YoutubeIE.get_temp_id(effective_url)
+                if self.skip_if_archived({'id': video_id, 'title': self.url}):
+                    return
+
+            # Playlists are only listed here; each picked entry is resolved later in the fetch stage
+            listing_opts = dict(ydl_opts)
+            if self.download_type != "single":
+                listing_opts['extract_flat'] = 'in_playlist'
+
+            with self.create_ydl(listing_opts) as ydl:
+                info = self.extract_info(ydl, effective_url)
+                
+                if not info:
+                    self.publish(Error("Failed to extract video information"))
+                    return
+                
+                # Proveri dostupnost za single video
+                if self.download_type == "single":
+                    if info.get('availability', '') == 'private':
+                        self.publish(Error("This video is private. You need to sign in to access it."))
+                        return
+                    if 'unavailable' in str(info.get('title', '')).lower() or 'terminated' in str(info.get('uploader', '')).lower():
+                        self.publish(Error("This video is no longer available."))
+                        return
+                
+                is_playlist_detected = 'entries' in info
+                if self.download_type == "single":
+                    is_playlist_detected = False
+
+                if is_playlist_detected:
+                    self.download_entries(self.select_entries(info))
+                else:
+                    self.progress_reporter.total_tracks = 1
+                    self.download_single_video(info, self._thread_ydl())
+                    
+        except Exception as e:
+            self.metrics.error('job', e)
+            self.publish(Error(f"Download failed: {str(e)}"))
+        finally:
+            self._close_thread_ydls()
+            self.metrics.observe('job', time.perf_counter() - started)
+            self.publish(Finished())
+            
+    def run_entries(self, entries):
+        """Execute download of playlist entries that were already listed (see list_entries)"""
+        video_id = entries[0].get('id') if len(entries) == 1 else None
+        self._profiled(video_id, self._run_entries, entries)
+        
+    def _run_entries(self, entries):
+        """Download listed entries and publish Finished at the end"""
+        try:
+            self.prepare_options()
+            self.download_entries(entries)
+        except Exception as e:
+            self.publish(Error(f"Download failed: {str(e)}"))
+        finally:
+            self._close_thread_ydls()
+            self.publish(Finished())
+            
+    def list_entries(self):
+        """List the playlist and return the selected flat entries without downloading anything"""
+        ydl_opts, effective_url = self.prepare_options()
+        with self.create_ydl(dict(ydl_opts, extract_flat='in_playlist')) as ydl:
+            info = self.extract_info(ydl, effective_url)
+        if not info:
+            raise Exception("Failed to extract video information")
+        if 'entries' not in info:
+            return [info]
+        return self.select_entries(info)
+        
+    def download_entries(self, entries):
+        """Journal the entries as a new job and run them through the pipeline"""
+        self.is_playlist = True
+        jobs = [TrackJob(idx, entry) for idx, entry in enumerate(entries, 1)]
+        jobs = [job for job in jobs if not self.skip_if_archived(job.info)]
+        self.total_videos = len(jobs)
+        if self.journal:
+            self.job_id = self.journal.create_job(
+                self.url, self.audio_format, self.music_dir, self.download_type,
+                [(job.index, job.info) for job in jobs]
+            )
+        self.download_playlist(jobs)
+        
+    def select_entries(self, playlist_info):
+        """
+        Pick the playlist entries to download from the flat listing.
+        Selected video IDs take priority over indices so the listing order can't pick the wrong song.
+        """
+        entries = []
+        for position, entry in enumerate(playlist_info['entries'], 1):
+            if entry is None:
+                continue
+            entry.setdefault('playlist_title', playlist_info.get('title', ''))
+            entry.setdefault('playlist_index', position)
+            entries.append(entry)
+        
+        if self.selected_ids is not None:
+            wanted = set(self.selected_ids)
+            entries = [e for e in entries if e.get('id') in wanted]
+        elif self.selected_indices is not None:
+            entries = [entries[i] for i in self.selected_indices if i < len(entries)]
+        
+        return entries
+        
+    def skip_if_archived(self, entry):
+        """Skip a video that is already in the download archive (checked by video ID, no network)"""
+        if self.archive is None:
+            return False
+        archived = self.archive.lookup(entry.get('id'), self.audio_format)
+        if archived is None:
+            return False
+        
+        with self._count_lock:
+            self.job_stats['archived_skips'] += 1
+        self.metrics.inc('tracks', outcome='archived')
+        self.publish(Skipped(entry.get('title') or entry.get('id'), archived['file_path']))
+        return True
+        
+    def resolve_entry(self, ydl, entry):
+        """Extract a flat playlist entry into a full info dict (no-op if already resolved)"""
+        if entry.get('_type', 'video') not in ('url', 'url_transparent'):
+            return entry
+        
+        extra_info = {
+            'playlist_title': entry.get('playlist_title', ''),
+            'playlist_index': entry.get('playlist_index'),
+        }
+        with self.metrics.span('extract'):
+            info = self.rate_limiter.call(ydl.process_ie_result, dict(entry), download=False, extra_info=extra_info)
+        if not info:
+            raise Exception("Video is unavailable")
+        with self._count_lock:
+            self.job_stats['videos_extracted'] += 1
+        return info
+            
+    def resume_journal_job(self):
+        """Continue an interrupted journaled job from the stage each track had reached"""
+        self.is_playlist = True
+        self.job_id = self.resume_job_id
+        jobs = [TrackJob.from_journal(track) for track in self.journal.load_tracks(self.job_id)]
+        self.total_videos = len(jobs)
+        self.download_playlist(jobs)
+        
+    def _journal(self, job, state, error=None):
+        """Record a track state change in the job journal"""
+        job.state = state
+        if self.journal and self.job_id and job.index is not None:
+            self.journal.update_track(self.job_id, job.index, state, info=job.info, metadata=job.metadata,
+                                      file_path=job.file_path, error=error)
+            
+    def download_playlist(self, jobs):
+        """Run playlist entries through the fetch -> transcode -> tag pipeline"""
+        self.progress_reporter.total_tracks = len(jobs)
+        depth = self.max_parallel * 2
+        fetch, transcode, tag = self.fetch_track, self.transcode_track, self.tag_track
+        if self.profile is not None:
+            fetch, transcode, tag = (self.profile.wrap(handler) for handler in (fetch, transcode, tag))
+        self.tag_stage = PipelineStage("tag", tag, 1, depth,
+                                       on_error=self._on_stage_error, on_done=self._mark_track_done)
+        self.transcode_stage = PipelineStage("transcode", transcode, self.transcode_workers, depth,
+                                             next_stage=self.tag_stage,
+                                             on_error=self._on_stage_error, on_done=self._mark_track_done)
+        self.fetch_stage = PipelineStage("fetch", fetch, self.max_parallel, depth,
+                                         next_stage=self.transcode_stage,
+                                         on_error=self._on_stage_error, on_done=self._mark_track_done)
+        self.stages = [self.fetch_stage, self.transcode_stage, self.tag_stage]
+        
+        for stage in reversed(self.stages):
+            stage.start(self._abort)
+        
+        for job in jobs:
+            if self._abort.is_set():
+                break
+            self.fetch_stage.put(job)
+        
+        # Each stage drains completely before its consumer is told to stop
+        for stage in self.stages:
+            stage.close()
+        self._close_thread_ydls()
+        
+        if self.journal and self.job_id and not self._abort.is_set():
+            self.journal.finish_job(self.job_id)
+        
+    def cancel(self, downloads=False):
+        """
+        Stop handing out new tracks; tracks already in a stage are finished.
+        With downloads=True, downloads in progress are aborted too (at their next progress update).
+        """
+        if downloads:
+            self._abort_downloads.set()
+        self._abort.set()
+        
+    def get_pipeline_stats(self):
+        """Queue depth and throughput of every pipeline stage"""
+        return [stage.stats() for stage in self.stages]
+            
+    def _on_stage_error(self, stage, job, exc):
+        """Handle a track that failed in one of the pipeline stages"""
+        error_msg = str(exc)
+        if is_throttle_error(error_msg):
+            error_msg = "still rate limited by YouTube after backing off"
+        self._journal(job, 'failed', error_msg)
+        self.metrics.inc('tracks', outcome='failed')
+        self.metrics.error(stage.name, error_msg)
+        self.publish(Error(f"Skipped '{job.title}': {error_msg}", job.title))
+                    
+    def _mark_track_done(self, job=None):
+        """Count a finished track (downloaded, skipped or failed) and report progress"""
+        if job is not None:
+            self._release_target(job)
+        with self._count_lock:
+            self.completed_videos += 1
+            self.current_video = self.completed_videos
+            done = self.completed_videos
+        self.progress_reporter.finish(job.index if job else None)
+        self.publish(PlaylistProgress(done, self.total_videos))
+        if self.stages:
+            self.publish(StageStats(self.get_pipeline_stats()))
+            
+    def create_ydl(self, opts):
+        """
+        New YoutubeDL instance.
+        Extra extractor classes (e.g. the benchmark's stand-in extractor) are
+        registered ahead of the built-in ones, which end with the catch-all generic extractor.
+        """
+        if not self.extractors:
+            return yt_dlp.YoutubeDL(opts)
+        ydl = yt_dlp.YoutubeDL(opts, auto_init=False)
+        for extractor in self.extractors:
+            ydl.add_info_extractor(extractor())
+        ydl.add_default_info_extractors()
+        return ydl
+        
+    def _thread_ydl(self):
+        """YoutubeDL instance owned by the calling pipeline thread"""
+        ydl = getattr(self._lane, 'ydl', None)
+        if ydl is None:
+            ydl = self.create_ydl(self._ydl_opts)
+            self._lane.ydl = ydl
+            with self._count_lock:
+                self._thread_ydls.append(ydl)
+        return ydl
+        
+    def _close_thread_ydls(self):
+        """Close YoutubeDL instances created by pipeline threads"""
+        with self._count_lock:
+            ydls, self._thread_ydls = self._thread_ydls, []
+        for ydl in ydls:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+            
+    def download_single_video(self, info, ydl, track_number=None):
+        """Download a single video, running all pipeline stages on the calling thread"""
+        job = TrackJob(track_number, info)
+        try:
+            for stage in (self.fetch_track, self.transcode_track, self.tag_track):
+                if stage(job, ydl) is None:
+                    return
+        finally:
+            self._release_target(job)
+            
+    def download_track(self, entry):
+        """
+        Download one (possibly flat) playlist entry on the calling thread.
+        Unlike run(), failures are raised to the caller; used by distributed workers.
+        """
+        self._profiled(entry.get('id'), self._download_track, entry)
+        
+    def _download_track(self, entry):
+        """Download one entry on the calling thread"""
+        self.prepare_options()
+        try:
+            if self.skip_if_archived(entry):
+                return
+            self.progress_reporter.total_tracks = 1
+            self.download_single_video(entry, self._thread_ydl())
+        finally:
+            self._close_thread_ydls()
+            
+    def fetch_track(self, job, ydl=None):
+        """Fetch stage: check for an existing file and download the source audio"""
+        if job.state != 'queued':
+            return job
+        
+        ydl = ydl or self._thread_ydl()
+        info = job.info
+        self._lane.track_index = job.index
+        try:
+            self.publish(Started(job.title, job.index))
+            
+            info = job.info = self.resolve_entry(ydl, info)
+            job.title = info.get('title', job.title)
+            job.metadata = self.extract_metadata(info)
+            potential_path = self.generate_filename(job.metadata, job.title)
+            
+            if potential_path.exists():
+                self.metrics.inc('tracks', outcome='exists')
+                self.publish(Exists(
+                    potential_path.name,
+                    str(potential_path),
+                    job.metadata,
+                    job.index
+                ))
+                self._journal(job, 'done')
+                return None
+            
+            # Hold the final name while the track is in flight, so parallel lanes,
+            # batch jobs and workers sharing the folder never pick the same one
+            job.target = self.names.reserve(potential_path.name)
+            result = self.download_resolved(ydl, info)
+        finally:
+            self._lane.track_index = None
+        
+        if not result:
+            raise Exception("Download failed")
+        
+        job.info = self.downloaded_info(result)
+        job.file_path = Path(job.info['filepath'])
+        job.cover = self.fetch_cover_art(ydl, job.info)
+        self._journal(job, 'fetched')
+        return job
+    
+    def downloaded_info(self, result):
+        """
+        Info dict of the file yt-dlp actually wrote.
+        yt-dlp records the final path (after moving files) in requested_downloads;
+        those entries only keep the keys that differ from the video's info dict, so they are merged back.
+        """
+        downloads = result.get('requested_downloads') or [{}]
+        info = dict(result, **downloads[-1])
+        info.pop('requested_downloads', None)
+        file_path = info.get('filepath')
+        if not file_path or not os.path.exists(file_path):
+            raise Exception("Downloaded file not found")
+        return info
+    
+    def extract_info(self, ydl, url):
+        """Resolve a URL without downloading, counting every video that gets extracted"""
+        with self.metrics.span('extract'):
+            info = self.rate_limiter.call(ydl.extract_info, url, download=False)
+        if info:
+            entries = info.get('entries')
+            if entries is None:
+                extracted = 1
+            else:
+                extracted = len([e for e in entries if e and e.get('_type', 'video') == 'video'])
+            with self._count_lock:
+                self.job_stats['videos_extracted'] += extracted
+        return info
+    
+    def download_resolved(self, ydl, info):
+        """
+        Download from an already resolved info dict so the video is not extracted twice.
+        Falls back to a fresh extraction when the resolved dict has no formats
+        (e.g. flat playlist entries) or the stored stream URLs were rejected.
+        """
+        if info.get('formats') or info.get('url'):
+            try:
+                with self.metrics.span('download'):
+                    result = self.rate_limiter.call(ydl.process_ie_result, dict(info), download=True)
+            except yt_dlp.utils.DownloadError as e:
+                if is_throttle_error(e):
+                    raise
+                result = None
+            if result:
+                with self._count_lock:
+                    self.job_stats['downloads_from_resolved_info'] += 1
+                return result
+        
+        with self._count_lock:
+            self.job_stats['re_extractions'] += 1
+            self.job_stats['videos_extracted'] += 1
+        self.metrics.inc('retries', reason='re_extract')
+        url = info['webpage_url'] if 'webpage_url' in info else info['id']
+        with self.metrics.span('download'):
+            return self.rate_limiter.call(ydl.extract_info, url, download=True)
+    
+    def get_job_stats(self):
+        """Snapshot of the job counters"""
+        with self._count_lock:
+            stats = dict(self.job_stats)
+            stats['conversion_paths'] = dict(stats['conversion_paths'])
+            return stats
+    
+    def transcode_track(self, job, ydl=None):
+        """
+        Transcode stage: bring the audio into the target format with ffmpeg.
+        Sources already in the target codec are only remuxed (stream copy);
+        everything else is re-encoded.
+        """
+        if job.state != 'fetched':
+            return job
+        
+        self.progress_reporter.stage(job.index, 'transcode')
+        ydl = ydl or self._thread_ydl()
+        # The postprocessor stream-copies when the codec already matches; only it knows which it did
+        extractor = ExtractAudioPP(ydl, preferredcodec=self.audio_format, preferredquality='192')
+        started = time.perf_counter()
+        try:
+            job.info = ydl.run_pp(extractor, job.info)
+        finally:
+            self.metrics.observe('transcode', time.perf_counter() - started, path=extractor.conversion)
+        job.file_path = Path(job.info['filepath'])
+        
+        with self._count_lock:
+            self.job_stats['remuxed' if extractor.conversion == 'remux' else 'transcoded'] += 1
+            self.job_stats['conversion_paths'][job.index] = extractor.conversion
+        self._journal(job, 'transcoded')
+        return job
+    
+    def tag_track(self, job, ydl=None):
+        """Tagging stage: write tags and cover art, give the file its final name and report it"""
+        file_path = job.file_path
+        
+        if job.state == 'transcoded':
+            self.progress_reporter.stage(job.index, 'tag')
+            
+            # Cover is normally fetched during the fetch stage; resumed jobs fetch it here
+            cover = job.cover
+            if cover is None:
+                cover = self.fetch_cover_art(ydl or self._thread_ydl(), job.info)
+            
+            self.write_track_tags(file_path, job.metadata, cover)
+            job.cover = None
+            self._journal(job, 'tagged')
+        
+        file_path = self.move_to_target(job)
+        if self.archive is not None and job.info.get('id'):
+            self.archive.add(job.info['id'], self.audio_format, file_path)
+        
+        self.metrics.inc('tracks', outcome='completed')
+        self.publish(Completed(str(file_path), job.metadata, job.index))
+        self._journal(job, 'done')
+        return job
+    
+    def move_to_target(self, job):
+        """Give the tagged file its final (reserved) name; returns the new path"""
+        if job.target is None:
+            # Resumed jobs reserve here; the file's own name counts as free
+            name = self.generate_filename(job.metadata, job.title).name
+            job.target = self.names.reserve(name, current=job.file_path)
+        try:
+            if job.target != job.file_path:
+                os.replace(job.file_path, job.target)
+                job.file_path = job.target
+        finally:
+            self._release_target(job)
+        return job.file_path
+    
+    def _release_target(self, job):
+        """Give back the final name reserved for a job (moved there, failed or cancelled)"""
+        if job.target is not None:
+            self.names.release(job.target)
+            job.target = None
+    
+    def fetch_cover_art(self, ydl, info):
+        """Fetch the cover art into memory; returns (data, mime) or None"""
+        if self._ffmpeg is None:
+            self._ffmpeg = FFmpegPostProcessor(ydl).executable or 'ffmpeg'
+        try:
+            with self.metrics.span('cover'):
+                return fetch_cover(ydl, info, self._ffmpeg, self.cover_cache)
+        except Exception as e:
+            self.metrics.error('cover', e)
+            print(f"Failed to fetch cover art: {str(e)}", file=sys.stderr)
+            return None
+    
+    def write_track_tags(self, file_path, metadata, cover):
+        """Write text tags and cover art in a single mutagen save"""
+        cover_data, cover_mime = cover if cover else (None, None)
+        if not self.tag_manager.write_tags(file_path, metadata, cover_data=cover_data, cover_mime=cover_mime):
+            raise Exception("Failed to write tags")
+    
+    def generate_filename(self, metadata, fallback_title):
+        """Generate expected filename based on metadata"""
+        artist = metadata.get('artist', '')
+        title = metadata.get('title', fallback_title)
+        
+        if artist and title:
+            filename = f"{artist} - {title}"
+        elif title:
+            filename = title
+        else:
+            filename = fallback_title
+            
+        filename = sanitize_filename(filename)
+        return self.music_dir / f"{filename}.{self.audio_format}"
+            
+    def extract_metadata(self, info):
+        """Extract metadata from video info with improved parsing"""
+        metadata = {}
+        
+        title = info.get('title', '')
+        
+        if ' - ' in title:
+            parts = title.split(' - ', 1)
+            artist = parts[0].strip()
+            song_title = parts[1].strip()
+            song_title = self.clean_title(song_title)
+            metadata['artist'] = artist
+            metadata['title'] = song_title
+        elif ': ' in title:
+            parts = title.split(': ', 1)
+            artist = parts[0].strip()
+            song_title = self.clean_title(parts[1].strip())
+            metadata['artist'] = artist
+            metadata['title'] = song_title
+        else:
+            cleaned = self.clean_title(title)
+            metadata['title'] = cleaned
+            metadata['artist'] = info.get('uploader', info.get('channel', ''))
+        
+        metadata['album'] = info.get('album', info.get('playlist_title', ''))
+        
+        return metadata
+    
+    def clean_title(self, title):
+        """Remove extra info from title - keep artist names in parentheses (see core.titles)"""
+        return clean_title(title)
+        
+    def progress_hook(self, d):
+        """Handle download progress updates (coalesced by the progress reporter)"""
+        if self._abort_downloads.is_set():
+            raise yt_dlp.utils.DownloadCancelled("Download cancelled")
+        track_index = getattr(self._lane, 'track_index', None)
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        if d['status'] == 'downloading':
+            self.progress_reporter.update(track_index, 'fetch', d.get('downloaded_bytes'), total)
+        elif d['status'] == 'finished':
+            downloaded = d.get('downloaded_bytes') or total
+            self.progress_reporter.update(track_index, 'fetch', downloaded, downloaded, force=True)
+            self.metrics.inc('downloaded_bytes', downloaded or 0)
+            
+    def _publish_track_progress(self, status):
+        """Publish a coalesced per-track progress event"""
+        self.publish(Progress(**status))
+        
+    def _publish_queue_progress(self, status):
+        """Publish a coalesced aggregate progress event"""
+        self.publish(QueueProgress(**status))
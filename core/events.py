@@ -0,0 +1,173 @@
+"""
+Core Module - Engine Events
+Typed events published by the download engine and a lightweight observer interface
+"""
+
+import sys
+import threading
+from dataclasses import dataclass, field, fields, asdict
+from typing import Optional
+
+from core.metrics import get_metrics
+
+
+@dataclass(frozen=True)
+class Event:
+    """Base class of all engine events"""
+    name = 'event'
+
+    def to_dict(self):
+        """Event fields plus its name, e.g. for JSON output"""
+        return dict(asdict(self), event=self.name)
+
+
+@dataclass(frozen=True)
+class Started(Event):
+    """A track started downloading (index is None for single videos)"""
+    name = 'started'
+    title: str
+    index: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Progress(Event):
+    """Coalesced progress of one track"""
+    name = 'progress'
+    index: Optional[int]
+    stage: str
+    percent: float
+    downloaded_bytes: int = 0
+    total_bytes: Optional[int] = None
+    speed: Optional[float] = None
+    eta: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class QueueProgress(Event):
+    """Aggregate progress of every track in the job"""
+    name = 'queue'
+    completed: int
+    total: int
+    active: int
+    stages: dict = field(default_factory=dict)
+    downloaded_bytes: int = 0
+    total_bytes: int = 0
+    speed: float = 0.0
+    eta: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class PlaylistProgress(Event):
+    """A track left the pipeline (downloaded, skipped or failed)"""
+    name = 'playlist_progress'
+    completed: int
+    total: int
+
+
+@dataclass(frozen=True)
+class StageStats(Event):
+    """Queue depth and throughput of every pipeline stage"""
+    name = 'stage_stats'
+    stages: list
+
+
+@dataclass(frozen=True)
+class Completed(Event):
+    """A track was downloaded, converted and tagged"""
+    name = 'completed'
+    file_path: str
+    metadata: dict
+    index: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Exists(Event):
+    """The target file is already there; the track was not downloaded"""
+    name = 'exists'
+    file_name: str
+    file_path: str
+    metadata: dict
+    index: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Skipped(Event):
+    """The video is in the download archive; the track was not downloaded"""
+    name = 'skipped'
+    title: str
+    file_path: str
+
+
+@dataclass(frozen=True)
+class Error(Event):
+    """The job (title is None) or a single track (title set) failed"""
+    name = 'error'
+    message: str
+    title: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Finished(Event):
+    """The engine is done with its URL"""
+    name = 'finished'
+
+
+EVENT_TYPES = {
+    cls.name: cls
+    for cls in (Started, Progress, QueueProgress, PlaylistProgress, StageStats,
+                Completed, Exists, Skipped, Error, Finished)
+}
+
+
+def event_from_dict(data):
+    """Rebuild an event from Event.to_dict() output (e.g. received over HTTP)"""
+    cls = EVENT_TYPES[data['event']]
+    return cls(**{f.name: data[f.name] for f in fields(cls) if f.name in data})
+
+
+class EventPublisher:
+    """Keeps subscribers and delivers events to them on the publishing thread"""
+
+    def __init__(self):
+        self._subscribers = []
+        self._subscribers_lock = threading.Lock()
+
+    def subscribe(self, callback, *event_types):
+        """
+        Call callback(event) for every published event, or only for the given event types.
+        Returns a function that removes the subscription.
+        """
+        entry = (callback, event_types or (Event,))
+        with self._subscribers_lock:
+            self._subscribers.append(entry)
+
+        def unsubscribe():
+            with self._subscribers_lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+        return unsubscribe
+
+    def publish(self, event):
+        """Deliver an event to every matching subscriber; errors in one don't stop the others"""
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for callback, event_types in subscribers:
+            if isinstance(event, event_types):
+                # A failing subscriber (e.g. a closed stdout pipe) must not take the publishing thread down
+                try:
+                    callback(event)
+                except Exception as e:
+                    get_metrics().error('subscriber', e)
+                    print(f"Event subscriber failed on {event.name}: {e}", file=sys.stderr)
+
+
+class EngineObserver:
+    """
+    Observer base class: subscribe an instance and override the on_<event name>
+    methods you care about (on_completed, on_error, on_progress, ...).
+    """
+
+    def __call__(self, event):
+        handler = getattr(self, f"on_{event.name}", None)
+        if handler is not None:
+            handler(event)
@@ -0,0 +1,236 @@
+"""
+Core Module - Job Journal
+Crash-safe SQLite record of playlist jobs and the state of every track
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from core.metrics import get_metrics
+
+
+TRACK_STATES = ('queued', 'fetched', 'transcoded', 'tagged', 'done', 'failed')
+FINAL_STATES = ('done', 'failed')
+
+# Only what is needed to pick a track up again; full info dicts (formats, stream URLs) expire anyway
+INFO_KEYS = (
+    '_type', 'id', 'url', 'ie_key', 'title', 'webpage_url', 'uploader', 'channel',
+    'album', 'playlist_title', 'playlist_index', 'ext', 'acodec', 'filepath', 'thumbnail',
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    audio_format TEXT NOT NULL,
+    download_folder TEXT NOT NULL,
+    download_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    video_id TEXT,
+    title TEXT,
+    state TEXT NOT NULL,
+    entry_json TEXT,
+    info_json TEXT,
+    metadata_json TEXT,
+    file_path TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+
+
+def trim_info(info):
+    """Reduce an info dict to the fields worth journaling"""
+    trimmed = {key: info[key] for key in INFO_KEYS if info.get(key) is not None}
+    thumbnails = [{'id': t.get('id'), 'url': t['url']} for t in info.get('thumbnails') or [] if t.get('url')]
+    if thumbnails:
+        trimmed['thumbnails'] = thumbnails
+    return trimmed
+
+
+class JobJournal:
+    """
+    On-disk job journal.
+    Track updates are queued in memory and written by a background thread in
+    one transaction per batch, so stage workers never wait on disk I/O.
+    """
+
+    def __init__(self, path, flush_interval=0.5, batch_size=200):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+        self._db_lock = threading.Lock()
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._writer_loop, name="job-journal", daemon=True)
+        self._writer.start()
+
+    def create_job(self, url, audio_format, download_folder, download_type, tracks):
+        """Record a new job with all its tracks queued; tracks is a list of (index, entry)"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._db_lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, 'running', ?, ?)",
+                    (job_id, url, audio_format, str(download_folder), download_type, now, now)
+                )
+                self._conn.executemany(
+                    "INSERT INTO tracks (job_id, idx, video_id, title, state, entry_json, updated_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                    [
+                        (job_id, idx, entry.get('id'), entry.get('title'), json.dumps(trim_info(entry)), now)
+                        for idx, entry in tracks
+                    ]
+                )
+        return job_id
+
+    def update_track(self, job_id, index, state, info=None, metadata=None, file_path=None, error=None):
+        """Queue a track state change (written in the next batch)"""
+        if state not in TRACK_STATES:
+            raise ValueError(f"Unknown track state: {state}")
+        update = (
+            state,
+            json.dumps(trim_info(info)) if info is not None else None,
+            json.dumps(metadata) if metadata is not None else None,
+            str(file_path) if file_path is not None else None,
+            error,
+            time.time(),
+            job_id,
+            index,
+        )
+        with self._pending_lock:
+            self._pending.append(update)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def finish_job(self, job_id):
+        """Mark a job as finished so it is not offered for resuming"""
+        self.flush()
+        self._set_job_status(job_id, 'finished')
+
+    def discard_job(self, job_id):
+        """Drop an unfinished job the user doesn't want to resume"""
+        self.flush()
+        self._set_job_status(job_id, 'discarded')
+
+    def _set_job_status(self, job_id, status):
+        """Update the status column of a job"""
+        with self._db_lock:
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?",
+                    (status, time.time(), job_id)
+                )
+
+    def get_job(self, job_id):
+        """Job row as a dict, or None"""
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT job_id, url, audio_format, download_folder, download_type, status, created_at "
+                "FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ('job_id', 'url', 'audio_format', 'download_folder', 'download_type', 'status', 'created_at')
+        return dict(zip(keys, row))
+
+    def unfinished_jobs(self):
+        """Jobs interrupted before they finished, newest first, with remaining track counts"""
+        self.flush()
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT j.job_id, j.url, j.audio_format, j.download_folder, j.download_type, j.created_at, "
+                "COUNT(t.idx), SUM(CASE WHEN t.state IN ('done', 'failed') THEN 0 ELSE 1 END) "
+                "FROM jobs j LEFT JOIN tracks t ON t.job_id = j.job_id "
+                "WHERE j.status = 'running' GROUP BY j.job_id ORDER BY j.created_at DESC"
+            ).fetchall()
+        keys = ('job_id', 'url', 'audio_format', 'download_folder', 'download_type', 'created_at',
+                'total', 'remaining')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def load_tracks(self, job_id, include_finished=False):
+        """Tracks of a job in playlist order, with their journaled state"""
+        self.flush()
+        query = ("SELECT idx, video_id, title, state, entry_json, info_json, metadata_json, file_path, error "
+                 "FROM tracks WHERE job_id = ?")
+        if not include_finished:
+            query += " AND state NOT IN ('done', 'failed')"
+        with self._db_lock:
+            rows = self._conn.execute(query + " ORDER BY idx", (job_id,)).fetchall()
+
+        tracks = []
+        for idx, video_id, title, state, entry_json, info_json, metadata_json, file_path, error in rows:
+            tracks.append({
+                'index': idx,
+                'video_id': video_id,
+                'title': title,
+                'state': state,
+                'entry': json.loads(entry_json) if entry_json else {},
+                'info': json.loads(info_json) if info_json else None,
+                'metadata': json.loads(metadata_json) if metadata_json else {},
+                'file_path': file_path,
+                'error': error,
+            })
+        return tracks
+
+    def flush(self):
+        """Write all queued track updates now"""
+        # Batches are taken and written under the same lock so they land in order
+        with self._db_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE tracks SET state = ?, "
+                    "info_json = COALESCE(?, info_json), "
+                    "metadata_json = COALESCE(?, metadata_json), "
+                    "file_path = COALESCE(?, file_path), "
+                    "error = ?, updated_at = ? "
+                    "WHERE job_id = ? AND idx = ?",
+                    batch
+                )
+
+    def _writer_loop(self):
+        """Flush queued updates every flush_interval seconds or when a batch fills up"""
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                get_metrics().error('journal', e)
+                print(f"Job journal write failed: {e}", file=sys.stderr)
+
+    def close(self):
+        """Flush and close the journal"""
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join()
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
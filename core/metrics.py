@@ -0,0 +1,248 @@
+"""
+Core Module - Metrics
+Stage timing spans and counters, exported as Prometheus text or as a JSON summary.
+Off by default: until enable_metrics() is called the shared registry is a no-op.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+
+# Histogram buckets for stage durations, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _NullSpan:
+    """Span of the disabled registry; does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class NullMetrics:
+    """Registry used while metrics are disabled; every call is a no-op"""
+    enabled = False
+
+    def span(self, stage, **labels):
+        """Time a block of work (no-op)"""
+        return NULL_SPAN
+
+    def inc(self, name, value=1, **labels):
+        """Add to a counter (no-op)"""
+
+    def observe(self, stage, seconds, **labels):
+        """Record a stage duration (no-op)"""
+
+    def error(self, stage, message):
+        """Count an error (no-op)"""
+
+
+class Span:
+    """Context manager that records how long a stage took (whether it succeeded or not)"""
+    __slots__ = ('metrics', 'stage', 'labels', 'started')
+
+    def __init__(self, metrics, stage, labels):
+        self.metrics = metrics
+        self.stage = stage
+        self.labels = labels
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+def _label_key(labels):
+    """Hashable, ordered form of a label dict"""
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(pairs):
+    """Prometheus label set, e.g. {stage="fetch",le="0.5"}"""
+    if not pairs:
+        return ''
+    def escape(value):
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in pairs) + '}'
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and stage duration histograms.
+    Stage spans go into one histogram (<prefix>_stage_seconds) labelled by stage;
+    counters are exported as <prefix>_<name>_total.
+    """
+    enabled = True
+
+    def __init__(self, prefix='yt2mp3', buckets=DEFAULT_BUCKETS, max_errors=20):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.started_at = time.time()
+        self.recent_errors = deque(maxlen=max_errors)
+        self._counters = {}
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage, **labels):
+        """Time a block of work: with metrics.span('download'): ..."""
+        return Span(self, stage, labels)
+
+    def inc(self, name, value=1, **labels):
+        """Add to a counter"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, stage, seconds, **labels):
+        """Record one stage duration"""
+        key = (stage, _label_key(labels))
+        with self._lock:
+            entry = self._stages.get(key)
+            if entry is None:
+                entry = self._stages[key] = {'count': 0, 'sum': 0.0, 'max': 0.0,
+                                             'buckets': [0] * len(self.buckets)}
+            entry['count'] += 1
+            entry['sum'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry['buckets'][i] += 1
+                    break
+
+    def error(self, stage, message):
+        """Count an error of a stage and keep its message for the summary"""
+        self.inc('errors', stage=stage)
+        with self._lock:
+            self.recent_errors.append({'time': time.time(), 'stage': stage, 'message': str(message)})
+
+    def snapshot(self):
+        """Everything recorded so far as plain data"""
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            stages = [{'stage': stage, 'labels': dict(labels), 'count': entry['count'],
+                       'sum_seconds': round(entry['sum'], 6),
+                       'mean_seconds': round(entry['sum'] / entry['count'], 6),
+                       'max_seconds': round(entry['max'], 6)}
+                      for (stage, labels), entry in sorted(self._stages.items())]
+            errors = list(self.recent_errors)
+        return {
+            'started_at': self.started_at,
+            'uptime_seconds': round(time.time() - self.started_at, 3),
+            'counters': counters,
+            'stages': stages,
+            'recent_errors': errors,
+        }
+
+    def prometheus(self):
+        """Prometheus text exposition of all metrics"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            stages = sorted((key, dict(entry, buckets=list(entry['buckets'])))
+                            for key, entry in self._stages.items())
+
+        lines = []
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{self.prefix}_{name}_total"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        if stages:
+            metric = f"{self.prefix}_stage_seconds"
+            lines.append(f"# HELP {metric} Time spent in each pipeline stage")
+            lines.append(f"# TYPE {metric} histogram")
+            for (stage, labels), entry in stages:
+                pairs = (('stage', stage),) + labels
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry['buckets']):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_format_labels(pairs + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{metric}_bucket{_format_labels(pairs + (('le', '+Inf'),))} {entry['count']}")
+                lines.append(f"{metric}_sum{_format_labels(pairs)} {entry['sum']:.6f}")
+                lines.append(f"{metric}_count{_format_labels(pairs)} {entry['count']}")
+
+        uptime = f"{self.prefix}_uptime_seconds"
+        lines.append(f"# TYPE {uptime} gauge")
+        lines.append(f"{uptime} {time.time() - self.started_at:.3f}")
+        return '\n'.join(lines) + '\n'
+
+    def write_summary(self, path, **extra):
+        """Write the snapshot (plus any extra fields) as a JSON file, replacing it atomically"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(path.name + '.tmp')
+        temp.write_text(json.dumps(dict(self.snapshot(), **extra), indent=2, default=str), encoding='utf-8')
+        os.replace(temp, path)
+
+
+_shared_metrics = NullMetrics()
+_shared_lock = threading.Lock()
+
+
+def get_metrics():
+    """Metrics registry shared by the whole process (a no-op one unless enabled)"""
+    return _shared_metrics
+
+
+def set_metrics(metrics):
+    """Replace the shared registry (NullMetrics() turns metrics off again)"""
+    global _shared_metrics
+    with _shared_lock:
+        _shared_metrics = metrics
+
+
+def enable_metrics():
+    """Turn metrics on for the process; returns the shared registry"""
+    global _shared_metrics
+    with _shared_lock:
+        if not _shared_metrics.enabled:
+            _shared_metrics = Metrics()
+        return _shared_metrics
+
+
+def serve_metrics(metrics, host='127.0.0.1', port=9464):
+    """Serve a Prometheus /metrics endpoint on a background thread; returns the server"""
+    # Imported here: the engine and the GUI import this module and don't need an HTTP server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        """Serves GET /metrics from the registry"""
+
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            """Keep scrapes off the console"""
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
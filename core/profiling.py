@@ -0,0 +1,278 @@
+"""
+Core Module - Job Profiling
+Opt-in cProfile/tracemalloc capture of single download jobs, without touching the code.
+
+    YT2MP3_PROFILE=1              profile every job (N: one job in N)
+    YT2MP3_PROFILE_MATCH=<text>   only jobs whose URL or video ID contains the text
+    YT2MP3_PROFILE_DIR=<folder>   output folder (default: profiles in the app data folder)
+    YT2MP3_PROFILE_KEEP=<count>   profiles kept before the oldest are deleted (default: 20)
+    YT2MP3_PROFILE_MEMORY=0       skip tracemalloc (it slows the job down noticeably)
+
+Every profiled job writes <time>-<video id>.prof (open with pstats or snakeviz)
+and a .txt report with the top memory allocators and the slowest functions.
+"""
+
+import contextlib
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+from utils.file_utils import get_app_data_dir
+
+
+# From 3.12 cProfile runs on sys.monitoring: one profiler sees every thread and a second one can't start
+PROFILES_ALL_THREADS = sys.version_info >= (3, 12)
+
+
+def job_tag(url, video_id=None):
+    """Short file-name-safe tag for a job: the video ID, playlist ID or the end of the URL"""
+    tag = video_id
+    if not tag:
+        parsed = urlparse(url or '')
+        query = parse_qs(parsed.query)
+        for key in ('v', 'list'):
+            if query.get(key):
+                tag = query[key][0]
+                break
+        else:
+            tag = parsed.path.rstrip('/').rsplit('/', 1)[-1] or parsed.netloc
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', tag or '')[:48].strip('_') or 'job'
+
+
+class JobProfile:
+    """
+    Profile of one running job.
+    Before Python 3.12 every thread working on the job gets its own profiler (see thread())
+    and they are merged when the job ends; from 3.12 one profiler covers all threads,
+    including those of other jobs running at the same time.
+    """
+
+    def __init__(self, sampler, url, video_id=None):
+        self.sampler = sampler
+        self.url = url
+        self.video_id = video_id
+        self.tag = job_tag(url, video_id)
+        self._profiles = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._global_profile = None
+        self._traced_by_us = False
+        self._memory_start = None
+        self._started = None
+
+    def begin(self):
+        """Start profiling on the calling thread (raises ValueError if another profiler is active)"""
+        self._started = time.perf_counter()
+        if PROFILES_ALL_THREADS:
+            profile = cProfile.Profile()
+            profile.enable()
+            self._global_profile = profile
+            self._profiles.append(profile)
+        if self.sampler.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._traced_by_us = True
+            self._memory_start = tracemalloc.take_snapshot()
+
+    @contextlib.contextmanager
+    def thread(self):
+        """Profile the calling thread while the block runs (nested blocks are fine)"""
+        if PROFILES_ALL_THREADS or getattr(self._local, 'active', False):
+            yield
+            return
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+        self._local.active = True
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._local.active = False
+
+    def wrap(self, func):
+        """func, profiled on whichever thread calls it"""
+        def profiled(*args, **kwargs):
+            with self.thread():
+                return func(*args, **kwargs)
+        return profiled
+
+    def finish(self):
+        """Stop profiling and write the .prof file and report; returns the .prof path or None"""
+        elapsed = time.perf_counter() - self._started
+        if self._global_profile is not None:
+            self._global_profile.disable()
+        try:
+            memory = self._memory_report() if self.sampler.memory else []
+            with self._lock:
+                profiles = list(self._profiles)
+            if not profiles:
+                return None
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            return self.sampler.write(self, stats, elapsed, len(profiles), memory)
+        except OSError as e:
+            print(f"Could not write profile of {self.url}: {e}")
+            return None
+        finally:
+            if self._traced_by_us and tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self.sampler.release(self)
+
+    def _memory_report(self):
+        """Lines describing the biggest allocations made since the job started"""
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        if self._traced_by_us:
+            tracemalloc.stop()
+
+        lines = [f"traced memory: {current / 1048576:.1f} MB now, {peak / 1048576:.1f} MB peak", "",
+                 f"Top {self.sampler.top} allocators (growth since the job started):"]
+        for stat in snapshot.compare_to(self._memory_start, 'lineno')[:self.sampler.top]:
+            frame = stat.traceback[0]
+            lines.append(f"  {stat.size_diff / 1024:+10.1f} KiB  {stat.count_diff:+7d} blocks  "
+                         f"{frame.filename}:{frame.lineno}")
+        return lines
+
+
+class ProfileSampler:
+    """
+    Decides which jobs are profiled (every Nth job, optionally only matching ones)
+    and keeps the output folder from growing without bound. One job is profiled at a time.
+    """
+
+    def __init__(self, output_dir, every=1, match=None, keep=20, memory=True, top=25):
+        self.output_dir = Path(output_dir)
+        self.every = max(1, int(every))
+        self.match = match
+        self.keep = max(1, int(keep))
+        self.memory = memory
+        self.top = top
+        self.jobs_seen = 0
+        self.profiled = 0
+        self.skipped_busy = 0
+        self._active = None
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """Sampler configured by the YT2MP3_PROFILE* variables, or None if profiling is off"""
+        environ = os.environ if environ is None else environ
+        every = environ.get('YT2MP3_PROFILE')
+        match = environ.get('YT2MP3_PROFILE_MATCH')
+        if not every and not match:
+            return None
+        try:
+            every = int(every or 1)
+            keep = int(environ.get('YT2MP3_PROFILE_KEEP') or 20)
+        except ValueError:
+            print("YT2MP3_PROFILE and YT2MP3_PROFILE_KEEP must be numbers; profiling is off")
+            return None
+        if every <= 0:
+            return None
+        output_dir = environ.get('YT2MP3_PROFILE_DIR') or get_app_data_dir() / "profiles"
+        return cls(output_dir, every, match, keep, memory=environ.get('YT2MP3_PROFILE_MEMORY') != '0')
+
+    def start(self, url, video_id=None):
+        """JobProfile if this job is picked (and no other job is being profiled), otherwise None"""
+        if self.match and self.match not in (url or '') and self.match != video_id:
+            return None
+        with self._lock:
+            self.jobs_seen += 1
+            if (self.jobs_seen - 1) % self.every:
+                return None
+            if self._active is not None:
+                self.skipped_busy += 1
+                return None
+            profile = self._active = JobProfile(self, url, video_id)
+        try:
+            profile.begin()
+        except ValueError as e:
+            print(f"Could not profile {url}: {e}")
+            self.release(profile)
+            return None
+        return profile
+
+    def release(self, profile):
+        """Let the next picked job be profiled"""
+        with self._lock:
+            if self._active is profile:
+                self._active = None
+
+    def write(self, profile, stats, elapsed, threads, memory_lines):
+        """Write the .prof file and the text report, then rotate old profiles"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{profile.tag}-{os.getpid()}-{next(self._ids)}"
+        prof_path = self.output_dir / f"{stem}.prof"
+        stats.dump_stats(str(prof_path))
+
+        functions = io.StringIO()
+        stats.stream = functions
+        stats.sort_stats('cumulative').print_stats(30)
+        scope = "all threads" if PROFILES_ALL_THREADS else f"{threads} thread(s) of this job"
+        report = [
+            f"url: {profile.url}",
+            f"video id: {profile.video_id or '-'}",
+            f"wall time: {elapsed:.3f} s",
+            f"profiled: {scope}, Python {sys.version.split()[0]}",
+            *memory_lines,
+            "",
+            "Top functions by cumulative time:",
+            functions.getvalue(),
+        ]
+        prof_path.with_suffix('.txt').write_text('\n'.join(report), encoding='utf-8')
+
+        with self._lock:
+            self.profiled += 1
+        self.rotate()
+        return prof_path
+
+    def rotate(self):
+        """Delete the oldest profiles beyond the keep limit"""
+        profiles = sorted(self.output_dir.glob('*.prof'), key=lambda p: p.stat().st_mtime, reverse=True)
+        for old in profiles[self.keep:]:
+            for path in (old, old.with_suffix('.txt')):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+
+_shared_sampler = None
+_shared_loaded = False
+_shared_lock = threading.Lock()
+
+
+def get_profiler():
+    """Profile sampler of the process (from the environment on first use), or None"""
+    global _shared_sampler, _shared_loaded
+    with _shared_lock:
+        if not _shared_loaded:
+            _shared_sampler = ProfileSampler.from_env()
+            _shared_loaded = True
+        return _shared_sampler
+
+
+def set_profiler(sampler):
+    """Replace the process profile sampler (None turns profiling off)"""
+    global _shared_sampler, _shared_loaded
+    with _shared_lock:
+        _shared_sampler = sampler
+        _shared_loaded = True
@@ -0,0 +1,139 @@
+"""
+Core Module - Progress Reporter
+Coalesces per-chunk download callbacks into rate-limited progress events
+"""
+
+import threading
+import time
+
+
+STAGES = ('fetch', 'transcode', 'tag')
+
+
+class TrackProgress:
+    """Byte counters and smoothed speed/ETA of one track"""
+
+    def __init__(self, index):
+        self.index = index
+        self.stage = 'fetch'
+        self.downloaded_bytes = 0
+        self.total_bytes = None
+        self.speed = None
+        self.eta = None
+        self.last_emit = 0.0
+        self._last_sample = None
+
+    def sample(self, now, downloaded_bytes, total_bytes, smoothing):
+        """Fold a new byte count into the moving-average speed and ETA"""
+        if downloaded_bytes is not None:
+            if self._last_sample is not None:
+                last_time, last_bytes = self._last_sample
+                elapsed = now - last_time
+                if elapsed > 0 and downloaded_bytes >= last_bytes:
+                    rate = (downloaded_bytes - last_bytes) / elapsed
+                    self.speed = rate if self.speed is None else smoothing * rate + (1 - smoothing) * self.speed
+            self._last_sample = (now, downloaded_bytes)
+            self.downloaded_bytes = downloaded_bytes
+        if total_bytes:
+            self.total_bytes = total_bytes
+
+        if self.speed and self.total_bytes:
+            eta = max(0.0, (self.total_bytes - self.downloaded_bytes) / self.speed)
+            self.eta = eta if self.eta is None else smoothing * eta + (1 - smoothing) * self.eta
+
+    def percent(self):
+        """Progress of the current stage in percent"""
+        if self.stage != 'fetch':
+            return 100.0
+        if not self.total_bytes:
+            return 0.0
+        return min(100.0, self.downloaded_bytes / self.total_bytes * 100)
+
+    def event(self):
+        """Snapshot as a progress event dict"""
+        return {
+            'index': self.index,
+            'stage': self.stage,
+            'downloaded_bytes': self.downloaded_bytes,
+            'total_bytes': self.total_bytes,
+            'percent': self.percent(),
+            'speed': self.speed,
+            'eta': self.eta,
+        }
+
+
+class ProgressReporter:
+    """
+    Turns raw progress callbacks into at most `max_rate` events per second per
+    track, plus an aggregate event for the whole queue at the same rate.
+    Stage changes and finished tracks are always reported immediately.
+    """
+
+    def __init__(self, on_track, on_queue=None, max_rate=10.0, smoothing=0.3):
+        self.on_track = on_track
+        self.on_queue = on_queue
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.smoothing = smoothing
+        self.total_tracks = 0
+        self.completed_tracks = 0
+        self._tracks = {}
+        self._last_queue_emit = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, index, stage='fetch', downloaded_bytes=None, total_bytes=None, force=False):
+        """Record progress of a track; emits only when the rate limit allows"""
+        now = time.monotonic()
+        with self._lock:
+            track = self._tracks.get(index)
+            if track is None:
+                track = self._tracks[index] = TrackProgress(index)
+            if stage != track.stage:
+                track.stage = stage
+                force = True
+            track.sample(now, downloaded_bytes, total_bytes, self.smoothing)
+
+            if not force and now - track.last_emit < self.min_interval:
+                return
+            track.last_emit = now
+            event = track.event()
+            queue_event = self._queue_event(now, force)
+
+        self.on_track(event)
+        if queue_event is not None:
+            self.on_queue(queue_event)
+
+    def stage(self, index, stage):
+        """Report that a track entered a new stage"""
+        self.update(index, stage, force=True)
+
+    def finish(self, index):
+        """Report that a track left the pipeline (done, skipped or failed)"""
+        now = time.monotonic()
+        with self._lock:
+            self._tracks.pop(index, None)
+            self.completed_tracks += 1
+            queue_event = self._queue_event(now, True)
+        if queue_event is not None:
+            self.on_queue(queue_event)
+
+    def _queue_event(self, now, force):
+        """Aggregate event for the whole queue, or None if rate limited (call with lock held)"""
+        if self.on_queue is None:
+            return None
+        if not force and now - self._last_queue_emit < self.min_interval:
+            return None
+        self._last_queue_emit = now
+
+        downloaded = sum(t.downloaded_bytes for t in self._tracks.values())
+        total = sum(t.total_bytes or 0 for t in self._tracks.values())
+        speed = sum(t.speed or 0 for t in self._tracks.values() if t.stage == 'fetch')
+        return {
+            'completed': self.completed_tracks,
+            'total': self.total_tracks,
+            'active': len(self._tracks),
+            'stages': {name: sum(1 for t in self._tracks.values() if t.stage == name) for name in STAGES},
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'speed': speed,
+            'eta': (total - downloaded) / speed if speed and total > downloaded else None,
+        }
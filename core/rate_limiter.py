@@ -0,0 +1,170 @@
+"""
+Core Module - Rate Limiter
+Process-wide token bucket for every yt-dlp request, with AIMD rate control
+"""
+
+import random
+import re
+import threading
+import time
+
+from core.metrics import get_metrics
+
+
+# HTTP 429 as yt-dlp reports it, or YouTube's own wording; a bare "429" could be part of an ID or title
+THROTTLE_PATTERN = re.compile(
+    r'http error 429|status(?: code)?:? ?429\b|\b429 too many requests'
+    r'|too many requests|rate[- ]limit|throttl',
+    re.IGNORECASE
+)
+
+THROTTLE_STATUS = 429
+
+
+def _http_status(error):
+    """HTTP status carried by an exception or the network error it wraps (yt-dlp DownloadError)"""
+    wrapped = getattr(error, 'exc_info', None)
+    for exc in (error, wrapped[1] if wrapped else None, getattr(error, '__cause__', None)):
+        status = getattr(exc, 'status', None) or getattr(exc, 'code', None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_throttle_error(error):
+    """Check if an exception or message means YouTube is throttling us"""
+    if _http_status(error) == THROTTLE_STATUS:
+        return True
+    return THROTTLE_PATTERN.search(str(error)) is not None
+
+
+class RateLimiter:
+    """
+    Token-bucket request scheduler shared by all yt-dlp calls.
+    The refill rate grows additively while requests succeed and is cut
+    multiplicatively on throttling, which also pauses the whole queue for an
+    exponentially growing, jittered backoff before requests resume.
+    """
+
+    def __init__(self, rate=1.0, min_rate=0.1, max_rate=4.0, burst=4, increase=0.1, decrease=0.5,
+                 base_backoff=5.0, max_backoff=300.0, max_retries=6):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+
+        self.requests = 0
+        self.throttles = 0
+        self.consecutive_throttles = 0
+        self.last_backoff = 0.0
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        """Add the tokens earned since the last refill"""
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    self._cond.wait(self._paused_until - now)
+                    continue
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.requests += 1
+                    return
+                self._cond.wait((1 - self._tokens) / self.rate)
+
+    def report_success(self):
+        """Additive increase after a request went through"""
+        with self._cond:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            self.consecutive_throttles = 0
+
+    def report_throttled(self):
+        """Multiplicative decrease and a jittered exponential pause; returns the pause in seconds"""
+        with self._cond:
+            self.throttles += 1
+            self.consecutive_throttles += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+
+            backoff = min(self.max_backoff, self.base_backoff * (2 ** (self.consecutive_throttles - 1)))
+            backoff = random.uniform(backoff / 2, backoff)
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + backoff)
+            self._tokens = 0.0
+            self._last_refill = now
+            self.last_backoff = backoff
+            self._cond.notify_all()
+            return backoff
+
+    def call(self, func, *args, **kwargs):
+        """
+        Run a request under the limiter.
+        Throttled requests wait out the backoff and are retried up to max_retries
+        times; any other error is raised straight away.
+        """
+        attempts = 0
+        while True:
+            self.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_throttle_error(e):
+                    raise
+                attempts += 1
+                self.report_throttled()
+                if attempts > self.max_retries:
+                    raise
+                get_metrics().inc('retries', reason='throttled')
+                continue
+            self.report_success()
+            return result
+
+    def metrics(self):
+        """Current rate and backoff state"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'rate': self.rate,
+                'tokens': self._tokens,
+                'requests': self.requests,
+                'throttles': self.throttles,
+                'consecutive_throttles': self.consecutive_throttles,
+                'last_backoff': self.last_backoff,
+                'paused_for': max(0.0, self._paused_until - now),
+            }
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Rate limiter shared by every yt-dlp call in the process"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
+
+
+def set_rate_limiter(limiter):
+    """Replace the shared rate limiter (e.g. with different limits)"""
+    global _shared_limiter
+    with _shared_lock:
+        _shared_limiter = limiter
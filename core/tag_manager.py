@@ -3,10 +3,29 @@ Core Module - Tag Manager
 Handles MP3/M4A metadata operations using mutagen, PRESERVING existing cover art
 """
 
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 from mutagen.mp3 import MP3
-from mutagen.mp4 import MP4
+from mutagen.mp4 import MP4, Atoms
 from mutagen.id3 import ID3, TIT2, TPE1, TALB, TRCK, APIC
+from core.cover_art import image_mime
+from core.metrics import get_metrics
+
+
+@dataclass
+class TagWriteResult:
+    """Outcome of one file of TagManager.write_many()"""
+    file_path: str
+    ok: bool = False
+    error: Optional[str] = None
+    bytes_rewritten: int = 0
+    elapsed: float = 0.0
+    cancelled: bool = False
 
 
 class TagManager:
@@ -15,130 +34,220 @@ class TagManager:
     def __init__(self):
         pass
         
-    def write_tags(self, file_path, metadata, cover_path=None):
+    def write_tags(self, file_path, metadata, cover_path=None, cover_data=None, cover_mime=None):
         """
         Write metadata tags to audio file.
-        If cover_path is None, preserves existing cover art.
+        A new cover can be given as a file (cover_path) or in memory (cover_data + cover_mime).
+        If neither is given, preserves existing cover art.
         """
-        file_path = Path(file_path)
-        
         try:
-            if file_path.suffix.lower() == '.mp3':
-                return self._write_mp3_tags(file_path, metadata, cover_path)
-            elif file_path.suffix.lower() == '.m4a':
-                return self._write_m4a_tags(file_path, metadata, cover_path)
-            else:
-                return False
+            self._write_file(Path(file_path), metadata, cover_path, cover_data, cover_mime)
+            return True
         except Exception as e:
             print(f"Error writing tags: {e}")
             return False
             
-    def _write_mp3_tags(self, file_path, metadata, cover_path=None):
-        """Write tags to MP3 file, preserving or replacing cover art"""
+    def write_many(self, items, workers=4, progress=None, cancel=None):
+        """
+        Write tags to many files on a thread pool, at most `workers` files at a time.
+        items are (file_path, metadata) pairs or dicts with file_path, metadata and optionally
+        cover_path / cover_data / cover_mime, as for write_tags (existing covers are kept unless
+        a new one is given). progress(done, total, result) is called from the worker threads,
+        possibly at the same time, after each file; once the cancel event (threading.Event)
+        is set, files not started yet are skipped. Returns one TagWriteResult per item, in the
+        order of items.
+        """
+        jobs = [self._tag_job(item) for item in items]
+        results = [None] * len(jobs)
+        lock = threading.Lock()
+        done = 0
+        
+        # A file listed more than once is written by one worker, in order
+        groups = {}
+        for index, job in enumerate(jobs):
+            key = os.path.normcase(os.path.abspath(job['file_path']))
+            groups.setdefault(key, []).append(index)
+        
+        def run(indices):
+            nonlocal done
+            for index in indices:
+                result = self._write_job(jobs[index], cancel)
+                with lock:
+                    results[index] = result
+                    done += 1
+                    count = done
+                # Outside the lock, and a failing callback must not cost the remaining files
+                if progress is not None:
+                    try:
+                        progress(count, len(jobs), result)
+                    except Exception as e:
+                        print(f"Tag write progress callback failed: {e}")
+        
+        if groups:
+            with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="tag-writer") as pool:
+                for future in [pool.submit(run, indices) for indices in groups.values()]:
+                    future.result()
+        return results
+        
+    def _tag_job(self, item):
+        """Normalize a write_many() item to a dict of write_tags arguments"""
+        if isinstance(item, dict):
+            return dict(item, metadata=item.get('metadata') or {})
+        file_path, metadata = item
+        return {'file_path': file_path, 'metadata': metadata or {}}
+        
+    def _write_job(self, job, cancel):
+        """Write one write_many() item; never raises"""
+        file_path = Path(job['file_path'])
+        if cancel is not None and cancel.is_set():
+            return TagWriteResult(str(file_path), error="cancelled", cancelled=True)
+        started = time.perf_counter()
         try:
-            audio = MP3(file_path, ID3=ID3)
+            rewritten = self._write_file(file_path, job['metadata'], job.get('cover_path'),
+                                         job.get('cover_data'), job.get('cover_mime'))
+            return TagWriteResult(str(file_path), ok=True, bytes_rewritten=rewritten,
+                                  elapsed=time.perf_counter() - started)
+        except Exception as e:
+            return TagWriteResult(str(file_path), error=str(e) or type(e).__name__,
+                                  elapsed=time.perf_counter() - started)
             
-            if audio.tags is None:
-                audio.add_tags()
-
-            # Sačuvaj postojeći cover art ako ne dodeljujemo novi
-            existing_cover = None
-            if cover_path is None and 'APIC:' in audio.tags:
-                existing_cover = audio.tags['APIC:']
-
-            # Obriši samo osnovne frejmove
-            for frame in ['TIT2', 'TPE1', 'TALB', 'TRCK']:
-                if frame in audio.tags:
-                    del audio.tags[frame]
+    def _write_file(self, file_path, metadata, cover_path=None, cover_data=None, cover_mime=None):
+        """
+        Write tags to one file; raises on failure.
+        Returns the bytes rewritten: the whole file if mutagen had to resize it
+        (everything after the tags moves), otherwise the size of the tag block.
+        """
+        metrics = get_metrics()
+        suffix = file_path.suffix.lower()
+        
+        try:
+            with metrics.span('write_tags', format=suffix.lstrip('.')):
+                if cover_data is None and cover_path and Path(cover_path).exists():
+                    cover_data, cover_mime = self._read_cover_file(cover_path)
+                
+                size_before = file_path.stat().st_size
+                if suffix == '.mp3':
+                    tag_size = self._write_mp3_tags(file_path, metadata, cover_data, cover_mime)
+                elif suffix == '.m4a':
+                    tag_size = self._write_m4a_tags(file_path, metadata, cover_data, cover_mime)
+                else:
+                    raise ValueError(f"Unsupported file type: {file_path.name}")
+                size_after = file_path.stat().st_size
+        except Exception:
+            metrics.error('write_tags', f"Could not write tags to {file_path.name}")
+            raise
+        
+        return size_after if size_after != size_before else tag_size
+            
+    def _read_cover_file(self, cover_path):
+        """Read a cover image file; returns (data, mime)"""
+        with open(cover_path, "rb") as img_file:
+            cover_data = img_file.read()
+        # Trust the bytes over the extension (e.g. WebP saved as .png)
+        mime = image_mime(cover_data)
+        if mime is None:
+            mime = "image/png" if str(cover_path).lower().endswith(".png") else "image/jpeg"
+        return cover_data, mime
+            
+    def _write_mp3_tags(self, file_path, metadata, cover_data=None, cover_mime=None):
+        """Write tags to MP3 file, preserving or replacing cover art; returns the ID3 tag size"""
+        audio = MP3(file_path, ID3=ID3)
+        
+        if audio.tags is None:
+            audio.add_tags()
 
-            # Postavi osnovne tagove
-            if metadata.get('title') and metadata['title'].strip():
-                audio.tags.add(TIT2(encoding=3, text=metadata['title'].strip()))
-            if metadata.get('artist') and metadata['artist'].strip():
-                audio.tags.add(TPE1(encoding=3, text=metadata['artist'].strip()))
-            if metadata.get('album') and metadata['album'].strip():
-                audio.tags.add(TALB(encoding=3, text=metadata['album'].strip()))
-            if metadata.get('tracknumber'):
-                try:
-                    track_num = str(int(metadata['tracknumber']))
-                    audio.tags.add(TRCK(encoding=3, text=track_num))
-                except (ValueError, TypeError):
-                    pass
+        # Sačuvaj postojeći cover art ako ne dodeljujemo novi
+        existing_cover = None
+        if cover_data is None and 'APIC:' in audio.tags:
+            existing_cover = audio.tags['APIC:']
 
-            # Rukuj cover art-om
-            if cover_path and Path(cover_path).exists():
-                try:
-                    with open(cover_path, "rb") as img_file:
-                        cover_data = img_file.read()
-                    mime = "image/jpeg"
-                    if cover_path.lower().endswith(".png"):
-                        mime = "image/png"
-                    audio.tags.add(APIC(
-                        encoding=3,
-                        mime=mime,
-                        type=3,  # Front cover
-                        desc='Cover',
-                        data=cover_data
-                    ))
-                except Exception as e:
-                    print(f"Warning: Could not embed new cover art: {e}")
-            elif existing_cover:
-                # Vrati sačuvani cover art
-                audio.tags.add(existing_cover)
+        # Obriši samo osnovne frejmove
+        for frame in ['TIT2', 'TPE1', 'TALB', 'TRCK']:
+            if frame in audio.tags:
+                del audio.tags[frame]
 
-            audio.save()
-            return True
+        # Postavi osnovne tagove
+        if metadata.get('title') and metadata['title'].strip():
+            audio.tags.add(TIT2(encoding=3, text=metadata['title'].strip()))
+        if metadata.get('artist') and metadata['artist'].strip():
+            audio.tags.add(TPE1(encoding=3, text=metadata['artist'].strip()))
+        if metadata.get('album') and metadata['album'].strip():
+            audio.tags.add(TALB(encoding=3, text=metadata['album'].strip()))
+        if metadata.get('tracknumber'):
+            try:
+                track_num = str(int(metadata['tracknumber']))
+                audio.tags.add(TRCK(encoding=3, text=track_num))
+            except (ValueError, TypeError):
+                pass
 
-        except Exception as e:
-            print(f"Error writing MP3 tags: {e}")
-            return False
-            
-    def _write_m4a_tags(self, file_path, metadata, cover_path=None):
-        """Write tags to M4A file, preserving or replacing cover art"""
-        try:
-            audio = MP4(file_path)
-            
-            # Sačuvaj postojeći cover
-            existing_cover = None
-            if cover_path is None and 'covr' in audio:
-                existing_cover = audio['covr']
+        # Rukuj cover art-om
+        if cover_data is not None:
+            audio.tags.delall('APIC')
+            audio.tags.add(APIC(
+                encoding=3,
+                mime=cover_mime or "image/jpeg",
+                type=3,  # Front cover
+                desc='Cover',
+                data=cover_data
+            ))
+        elif existing_cover:
+            # Vrati sačuvani cover art
+            audio.tags.add(existing_cover)
 
-            # Osnovni tagovi
-            if metadata.get('title') and metadata['title'].strip():
-                audio['\xa9nam'] = [metadata['title'].strip()]
-            if metadata.get('artist') and metadata['artist'].strip():
-                audio['\xa9ART'] = [metadata['artist'].strip()]
-            if metadata.get('album') and metadata['album'].strip():
-                audio['\xa9alb'] = [metadata['album'].strip()]
-            if metadata.get('tracknumber'):
-                try:
-                    track_num = int(metadata['tracknumber'])
-                    audio['trkn'] = [(track_num, 0)]
-                except (ValueError, TypeError):
-                    pass
+        # Size of the tag before saving; mutagen keeps it when the new tags fit in its padding
+        tag_size = audio.tags.size if hasattr(audio.tags, 'size') else 0
+        audio.save()
+        return tag_size
+        
+    def _write_m4a_tags(self, file_path, metadata, cover_data=None, cover_mime=None):
+        """Write tags to M4A file, preserving or replacing cover art; returns the metadata atom size"""
+        audio = MP4(file_path)
+        
+        # Sačuvaj postojeći cover
+        existing_cover = None
+        if cover_data is None and 'covr' in audio:
+            existing_cover = audio['covr']
 
-            # Cover art
-            if cover_path and Path(cover_path).exists():
-                try:
-                    with open(cover_path, "rb") as img_file:
-                        cover_data = img_file.read()
-                    from mutagen.mp4 import MP4Cover
-                    fmt = MP4Cover.FORMAT_JPEG
-                    if cover_path.lower().endswith(".png"):
-                        fmt = MP4Cover.FORMAT_PNG
-                    audio['covr'] = [MP4Cover(cover_data, imageformat=fmt)]
-                except Exception as e:
-                    print(f"Warning: Could not embed new cover art in M4A: {e}")
-            elif existing_cover:
-                audio['covr'] = existing_cover
+        # Osnovni tagovi
+        if metadata.get('title') and metadata['title'].strip():
+            audio['\xa9nam'] = [metadata['title'].strip()]
+        if metadata.get('artist') and metadata['artist'].strip():
+            audio['\xa9ART'] = [metadata['artist'].strip()]
+        if metadata.get('album') and metadata['album'].strip():
+            audio['\xa9alb'] = [metadata['album'].strip()]
+        if metadata.get('tracknumber'):
+            try:
+                track_num = int(metadata['tracknumber'])
+                audio['trkn'] = [(track_num, 0)]
+            except (ValueError, TypeError):
+                pass
 
-            audio.save()
-            return True
+        # Cover art
+        if cover_data is not None:
+            from mutagen.mp4 import MP4Cover
+            # MP4 only knows JPEG and PNG; never label other data (WebP) as one of them
+            mime = image_mime(cover_data) or cover_mime
+            if mime == "image/png":
+                fmt = MP4Cover.FORMAT_PNG
+            elif mime == "image/jpeg":
+                fmt = MP4Cover.FORMAT_JPEG
+            else:
+                raise ValueError(f"Unsupported cover format for M4A: {mime}")
+            audio['covr'] = [MP4Cover(cover_data, imageformat=fmt)]
+        elif existing_cover:
+            audio['covr'] = existing_cover
 
-        except Exception as e:
-            print(f"Error writing M4A tags: {e}")
-            return False
-            
+        audio.save()
+        return self._m4a_meta_size(file_path)
+        
+    def _m4a_meta_size(self, file_path):
+        """Size of the moov/udta/meta atom (tags plus padding), 0 if there is none"""
+        with open(file_path, 'rb') as f:
+            try:
+                return Atoms(f).path(b"moov", b"udta", b"meta")[-1].length
+            except KeyError:
+                return 0
+        
     def read_tags(self, file_path):
         """Read basic metadata (no cover art)"""
         file_path = Path(file_path)
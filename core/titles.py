@@ -0,0 +1,108 @@
+"""
+Core Module - Title Cleaning
+Strips "(Official Video)", "[HD]", years and similar noise from video titles.
+The patterns are compiled once and results are memoized, so cleaning the
+titles of a 5,000-entry playlist costs little more than cleaning its distinct titles.
+"""
+
+import functools
+import re
+
+
+# Bracket groups containing any of these are dropped; titles ending in them are trimmed
+REMOVE_TERMS = (
+    'official video', 'official music video', 'official audio', 'official',
+    'lyrics', 'lyric video', 'with lyrics', 'letra', 'paroles',
+    'hd', 'hq', '4k', 'uhd', '1080p', '720p', '480p',
+    'audio', 'video', 'music video', 'visualizer', 'remaster', 'remastered',
+    'full album', 'full', 'explicit', 'clean version', 'radio edit',
+    'extended', 'remix', 'live', 'acoustic', 'unplugged',
+)
+
+# Bracket groups mentioning a featured artist are kept (unless they contain a term above)
+FEATURE_WORDS = ('feat', 'ft', 'featuring', 'with', '&', 'x')
+
+YEAR = re.compile(r'\(?(?:19|20)\d{2}\)?')
+PARENTHESES = re.compile(r'\(([^)]+)\)')
+SQUARE_BRACKETS = re.compile(r'\[([^\]]+)\]')
+WHITESPACE = re.compile(r'\s+')
+TRAILING_SEPARATORS = re.compile(r'\s*[-_|]+\s*$')
+
+
+def _alternation(words):
+    """One compiled regex matching any of the words anywhere (longest first)"""
+    return re.compile('|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True)))
+
+
+class TitleCleaner:
+    """
+    Compiled title cleaner with an LRU cache of results.
+    Output is identical to the original per-call clean_title, including its quirks
+    (e.g. suffix trimming slices the unstripped title); benchmarks/titles.py checks this.
+    """
+
+    def __init__(self, remove_terms=REMOVE_TERMS, feature_words=FEATURE_WORDS, cache_size=8192):
+        self.remove_terms = tuple(remove_terms)
+        self._remove = _alternation(self.remove_terms)
+        self._feature = _alternation(feature_words)
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._clean) if cache_size else self._clean
+
+    def clean(self, title):
+        """Cleaned title (memoized)"""
+        return self._cached(title)
+
+    def clean_many(self, titles):
+        """Clean a whole list of titles in one call; repeated titles are cleaned once"""
+        clean = self._cached
+        return [clean(title) for title in titles]
+
+    def cache_info(self):
+        """functools cache statistics (hits, misses, size), or None without a cache"""
+        info = getattr(self._cached, 'cache_info', None)
+        return info() if info else None
+
+    def clear_cache(self):
+        """Forget memoized results"""
+        if hasattr(self._cached, 'cache_clear'):
+            self._cached.cache_clear()
+
+    def _bracket(self, match):
+        """Replacement for one (...) or [...] group"""
+        content = match.group(1).strip()
+        content_lower = content.lower()
+        if self._remove.search(content_lower):
+            return ''
+        if self._feature.search(content_lower) or len(content) < 30:
+            return match.group(0)
+        return ''
+
+    def _clean(self, title):
+        """Uncached cleaning of one title"""
+        title = YEAR.sub('', title)
+        title = PARENTHESES.sub(self._bracket, title)
+        title = SQUARE_BRACKETS.sub(self._bracket, title)
+
+        title_lower = title.lower().strip()
+        # Most titles end in none of the terms; only those go through the term-by-term pass
+        if title_lower.endswith(self.remove_terms):
+            for term in self.remove_terms:
+                if title_lower.endswith(term):
+                    title = title[:-(len(term))].strip()
+                    title_lower = title.lower().strip()
+
+        title = WHITESPACE.sub(' ', title)
+        title = TRAILING_SEPARATORS.sub('', title)
+        return title.strip()
+
+
+_default_cleaner = TitleCleaner()
+
+
+def clean_title(title):
+    """Remove extra info from a title - keeps artist names in parentheses"""
+    return _default_cleaner.clean(title)
+
+
+def clean_titles(titles):
+    """clean_title() for a list of titles, sharing one cache"""
+    return _default_cleaner.clean_many(titles)
@@ -0,0 +1,346 @@
+"""
+Core Module - Distributed Work Queue
+Playlist entries shared by several machines, claimed under time-limited leases
+"""
+
+import json
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from core.daemon_client import DaemonClient
+from core.engine import DownloadEngine
+from core.events import Completed, Exists, Skipped
+from core.job_journal import trim_info
+from core.metrics import get_metrics
+
+
+ITEM_STATES = ('pending', 'leased', 'done', 'failed')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    item_id TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    audio_format TEXT NOT NULL,
+    entry_json TEXT NOT NULL,
+    status TEXT NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result_json TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS work_items_claim ON work_items (status, created_at);
+"""
+
+
+def default_worker_id():
+    """Worker name that is unique across machines"""
+    return f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}"
+
+
+class LeaseQueue:
+    """
+    Work queue in an SQLite file that several machines can open (e.g. on an NFS share).
+    A claimed item is leased to one worker until lease_expires; workers renew the
+    lease with heartbeats, and items whose lease ran out can be claimed again.
+    Items that failed max_attempts times are marked failed.
+
+    Uses a rollback journal instead of WAL: WAL needs shared memory, which
+    network file systems don't provide.
+    """
+
+    def __init__(self, path, lease_seconds=120.0, max_attempts=3, timeout=30.0):
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=timeout, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.executescript(SCHEMA)
+
+    def _transaction(self, func, *args):
+        """Run func(conn, *args) in a write transaction taken up front (BEGIN IMMEDIATE)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._conn, *args)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, url, audio_format, entries):
+        """Add one work item per playlist entry; returns the batch ID"""
+        batch_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        rows = [
+            (uuid.uuid4().hex, batch_id, url, audio_format, json.dumps(trim_info(entry)), now, now)
+            for entry in entries
+        ]
+
+        def insert(conn):
+            conn.executemany(
+                "INSERT INTO work_items (item_id, batch_id, url, audio_format, entry_json, status, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)",
+                rows
+            )
+        self._transaction(insert)
+        return batch_id
+
+    def claim(self, worker_id):
+        """Lease the oldest available item (pending or with an expired lease); None if there is none"""
+        def take(conn):
+            now = time.time()
+            self._expire(conn, now)
+            row = conn.execute(
+                "SELECT item_id, batch_id, url, audio_format, entry_json, attempts FROM work_items "
+                "WHERE status = 'pending' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            item_id, batch_id, url, audio_format, entry_json, attempts = row
+            conn.execute(
+                "UPDATE work_items SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE item_id = ?",
+                (worker_id, now + self.lease_seconds, now, item_id)
+            )
+            return {
+                'item_id': item_id,
+                'batch_id': batch_id,
+                'url': url,
+                'audio_format': audio_format,
+                'entry': json.loads(entry_json),
+                'attempt': attempts + 1,
+                'lease_seconds': self.lease_seconds,
+            }
+        return self._transaction(take)
+
+    def _expire(self, conn, now):
+        """Give expired leases back to the queue, or fail items that used up their attempts"""
+        conn.execute(
+            "UPDATE work_items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = CASE WHEN attempts >= ? THEN 'lease expired too often' ELSE error END, "
+            "lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (self.max_attempts, self.max_attempts, now, now)
+        )
+
+    def reclaim_expired(self):
+        """Sweep expired leases now (claim() does this too)"""
+        self._transaction(self._expire, time.time())
+
+    def heartbeat(self, item_id, worker_id):
+        """Extend a lease; False if the worker no longer holds it"""
+        def renew(conn):
+            now = time.time()
+            cursor = conn.execute(
+                "UPDATE work_items SET lease_expires = ?, updated_at = ? "
+                "WHERE item_id = ? AND lease_owner = ? AND status = 'leased' AND lease_expires >= ?",
+                (now + self.lease_seconds, now, item_id, worker_id, now)
+            )
+            return cursor.rowcount == 1
+        return self._transaction(renew)
+
+    def complete(self, item_id, worker_id, result=None):
+        """Mark a leased item as done; False if the lease was lost meanwhile"""
+        def finish(conn):
+            cursor = conn.execute(
+                "UPDATE work_items SET status = 'done', result_json = ?, error = NULL, lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE item_id = ? AND lease_owner = ? AND status = 'leased'",
+                (json.dumps(result, default=str), time.time(), item_id, worker_id)
+            )
+            return cursor.rowcount == 1
+        return self._transaction(finish)
+
+    def fail(self, item_id, worker_id, error):
+        """Give a failed item back for another attempt, or mark it failed after max_attempts"""
+        def release(conn):
+            cursor = conn.execute(
+                "UPDATE work_items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE item_id = ? AND lease_owner = ? AND status = 'leased'",
+                (self.max_attempts, str(error), time.time(), item_id, worker_id)
+            )
+            return cursor.rowcount == 1
+        return self._transaction(release)
+
+    def stats(self):
+        """Number of items per state, overall and per batch"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT batch_id, status, COUNT(*) FROM work_items GROUP BY batch_id, status"
+            ).fetchall()
+        totals = dict.fromkeys(ITEM_STATES, 0)
+        batches = {}
+        for batch_id, status, count in rows:
+            totals[status] += count
+            batches.setdefault(batch_id, dict.fromkeys(ITEM_STATES, 0))[status] = count
+        return {'items': totals, 'batches': batches}
+
+    def close(self):
+        """Close the queue database"""
+        with self._lock:
+            self._conn.close()
+
+
+class HttpLeaseQueue:
+    """LeaseQueue served by a download daemon (python -m yt2mp3 serve), for machines without a shared disk"""
+
+    def __init__(self, base_url, timeout=30.0):
+        self.client = DaemonClient(base_url, timeout)
+
+    def enqueue(self, url, audio_format, entries):
+        """Add one work item per playlist entry; returns the batch ID"""
+        data = {'url': url, 'format': audio_format, 'entries': [trim_info(entry) for entry in entries]}
+        return self.client.request('POST', '/work/items', data)['batch_id']
+
+    def claim(self, worker_id):
+        """Lease the oldest available item; None if there is none"""
+        return self.client.request('POST', '/work/claim', {'worker_id': worker_id}).get('item')
+
+    def reclaim_expired(self):
+        """Expired leases are swept by the daemon on every claim"""
+
+    def heartbeat(self, item_id, worker_id):
+        """Extend a lease; False if the worker no longer holds it"""
+        return self.client.request('POST', f'/work/{item_id}/heartbeat', {'worker_id': worker_id})['ok']
+
+    def complete(self, item_id, worker_id, result=None):
+        """Mark a leased item as done"""
+        data = {'worker_id': worker_id, 'result': result}
+        return self.client.request('POST', f'/work/{item_id}/complete', data)['ok']
+
+    def fail(self, item_id, worker_id, error):
+        """Give a failed item back for another attempt"""
+        data = {'worker_id': worker_id, 'error': str(error)}
+        return self.client.request('POST', f'/work/{item_id}/fail', data)['ok']
+
+    def stats(self):
+        """Number of items per state, overall and per batch"""
+        return self.client.request('GET', '/work')
+
+    def close(self):
+        """Nothing to close"""
+
+
+def open_work_queue(location, **kwargs):
+    """LeaseQueue for a database path, or HttpLeaseQueue for a daemon URL"""
+    if str(location).startswith(('http://', 'https://')):
+        return HttpLeaseQueue(location)
+    return LeaseQueue(location, **kwargs)
+
+
+class LeaseWorker:
+    """
+    Claims work items and downloads them one track at a time into a shared library,
+    renewing the lease from a heartbeat thread while the track is processed.
+    """
+
+    def __init__(self, work_queue, download_folder, worker_id=None, archive=None, cover_cache=None,
+                 poll_interval=5.0, on_event=None):
+        self.queue = work_queue
+        self.download_folder = Path(download_folder)
+        self.worker_id = worker_id or default_worker_id()
+        self.archive = archive
+        self.cover_cache = cover_cache
+        self.poll_interval = poll_interval
+        self.on_event = on_event
+        self.processed = 0
+        self.failed = 0
+        self.queue_errors = 0
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Finish the current item, then stop"""
+        self._stop.set()
+
+    def run(self, exit_when_empty=False):
+        """
+        Work until stopped (or until the queue is empty).
+        Queue errors (an unreachable daemon, a locked database) are reported and retried
+        with backoff; an item whose outcome couldn't be stored is retried once its lease runs out.
+        """
+        errors_in_row = 0
+        while not self._stop.is_set():
+            try:
+                item = self.queue.claim(self.worker_id)
+                if item is None:
+                    errors_in_row = 0
+                    if exit_when_empty:
+                        return
+                    self._stop.wait(self.poll_interval)
+                    continue
+                self.process(item)
+                errors_in_row = 0
+            except Exception as e:
+                errors_in_row += 1
+                self.queue_errors += 1
+                get_metrics().error('work_queue', e)
+                print(f"Work queue error in {self.worker_id}: {e}", file=sys.stderr)
+                self._stop.wait(min(60.0, self.poll_interval * 2 ** (errors_in_row - 1)))
+
+    def process(self, item):
+        """Download one leased item and report the outcome to the queue"""
+        result = {'worker_id': self.worker_id, 'files': [], 'exists': [], 'skipped': []}
+
+        def collect(event):
+            if isinstance(event, Completed):
+                result['files'].append(event.file_path)
+            elif isinstance(event, Exists):
+                result['exists'].append(event.file_path)
+            elif isinstance(event, Skipped):
+                result['skipped'].append(event.file_path)
+
+        entry = item['entry']
+        engine = DownloadEngine(entry.get('webpage_url') or entry.get('url') or item['url'], item['audio_format'],
+                                self.download_folder, "single", archive=self.archive,
+                                cover_cache=self.cover_cache)
+        engine.subscribe(collect, Completed, Exists, Skipped)
+        if self.on_event is not None:
+            engine.subscribe(self.on_event)
+
+        lease_lost = threading.Event()
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(item, done, lease_lost),
+                                     name="lease-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            engine.download_track(entry)
+        except Exception as e:
+            self.failed += 1
+            get_metrics().error('work_item', e)
+            print(f"Work item {item['item_id']} failed (attempt {item.get('attempt')}): {e}", file=sys.stderr)
+            if not lease_lost.is_set():
+                self.queue.fail(item['item_id'], self.worker_id, e)
+            return False
+        finally:
+            done.set()
+            heartbeat.join()
+
+        self.processed += 1
+        if lease_lost.is_set():
+            # Another worker owns the item now; the file is in the library either way
+            return False
+        return self.queue.complete(item['item_id'], self.worker_id, result)
+
+    def _heartbeat(self, item, done, lease_lost):
+        """Renew the lease at a third of its length until the item is done"""
+        interval = max(1.0, item.get('lease_seconds', 120.0) / 3)
+        while not done.wait(interval):
+            try:
+                if not self.queue.heartbeat(item['item_id'], self.worker_id):
+                    lease_lost.set()
+                    return
+            except Exception as e:
+                get_metrics().error('lease', e)
+                print(f"Lease heartbeat failed: {e}", file=sys.stderr)
@@ -2,8 +2,20 @@
 GUI Package
 """
 
+import importlib
+
 from .main_window import MainWindow
-from .tag_editor import TagEditorDialog
-from .playlist_selector import PlaylistSelectorDialog
 
-__all__ = ['MainWindow', 'TagEditorDialog', 'PlaylistSelectorDialog']
\ No newline at end of file
+# The dialogs pull in yt-dlp and mutagen, so they are only imported when first used
+_LAZY = {
+    'TagEditorDialog': '.tag_editor',
+    'PlaylistSelectorDialog': '.playlist_selector',
+}
+
+__all__ = ['MainWindow', 'TagEditorDialog', 'PlaylistSelectorDialog']
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -11,17 +11,19 @@ from PySide6.QtWidgets import (
     QTableWidgetItem, QLabel, QComboBox, QMessageBox,
     QHeaderView, QFileDialog, QAbstractItemView
 )
-from PySide6.QtCore import Qt, QSize, QUrl
+from PySide6.QtCore import Qt, QSize, QUrl, QTimer
 from PySide6.QtGui import QFont, QDesktopServices, QIcon
 from pathlib import Path
+import os
 import subprocess
-import yt_dlp
 import sys
 import traceback
 
-from core.download_manager import DownloadManager
-from gui.tag_editor import TagEditorDialog
-from gui.playlist_selector import PlaylistSelectorDialog
+from core.download_manager import DownloadManager, RemoteDownloadManager
+from core.rate_limiter import get_rate_limiter
+
+# yt_dlp, mutagen and the dialogs are imported where they are first used so the
+# window can paint before they load (main.py warms them up in the background)
 
 
 # Debug: catch all unhandled exceptions
@@ -38,12 +40,16 @@ class MainWindow(QMainWindow):
     
     def __init__(self):
         super().__init__()
-        self.download_manager = DownloadManager()
+        # YT2MP3_DAEMON=http://host:port sends downloads to a shared download daemon
+        daemon_url = os.environ.get("YT2MP3_DAEMON")
+        self.download_manager = RemoteDownloadManager(daemon_url) if daemon_url else DownloadManager()
         self.download_folder = Path.home() / "Music"
         self.download_folder.mkdir(parents=True, exist_ok=True)
         self.downloaded_files = []  # Store file paths
+        self.pending_resumes = []  # Interrupted jobs the user chose to resume
         self.setup_ui()
         self.connect_signals()
+        QTimer.singleShot(0, self.offer_resume)
         
     def setup_ui(self):
         """Initialize user interface"""
@@ -454,11 +460,13 @@ class MainWindow(QMainWindow):
         
         self.download_manager.download_started.connect(self.on_download_started)
         self.download_manager.progress_updated.connect(self.on_progress_updated)
+        self.download_manager.track_status.connect(self.on_track_status)
         self.download_manager.download_completed.connect(self.on_download_completed)
         self.download_manager.playlist_progress.connect(self.on_playlist_progress)
         self.download_manager.error_occurred.connect(self.on_error)
         self.download_manager.all_downloads_finished.connect(self.on_all_finished)
         self.download_manager.file_exists.connect(self.on_file_exists)
+        self.download_manager.download_skipped.connect(self.on_download_skipped)
         
     def browse_folder(self):
         """Browse for download folder"""
@@ -479,6 +487,7 @@ class MainWindow(QMainWindow):
         
     def is_video_available(self, url):
         """Proveri da li je video dostupan bez download-a"""
+        import yt_dlp
         try:
             ydl_opts = {
                 'extract_flat': True,
@@ -488,7 +497,7 @@ class MainWindow(QMainWindow):
             }
             
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+                info = get_rate_limiter().call(ydl.extract_info, url, download=False)
                 if not info:
                     return False
                 # Proveri da li je dostupan
@@ -535,18 +544,34 @@ class MainWindow(QMainWindow):
             self._start_download_with_mode(url, audio_format, mode, None)
             
         elif type_choice == "Playlist":
+            from gui.playlist_selector import PlaylistSelectorDialog
             dialog = PlaylistSelectorDialog(url, self)
             if dialog.exec():
                 selected_indices = dialog.get_selected_indices()
                 if selected_indices:
-                    self._start_download_with_mode(url, audio_format, "playlist", selected_indices)
+                    self._start_download_with_mode(url, audio_format, "playlist", selected_indices,
+                                                   dialog.get_selected_ids())
                 else:
                     QMessageBox.information(self, "No Selection", "Nema izabranih pesama.")
             else:
                 self.track_label.setText("✅ Spremno za download")
                 
-    def _start_download_with_mode(self, url, audio_format, mode, selected_indices):
+    def _start_download_with_mode(self, url, audio_format, mode, selected_indices, selected_ids=None):
         """Helper to start download with proper UI state"""
+        self._prepare_ui_for_download()
+    
+        try:
+            self.download_manager.start_download(url, audio_format, mode, selected_indices,
+                                                 selected_ids=selected_ids)
+        except Exception as e:
+            import traceback
+            print("❌ ERROR IN START DOWNLOAD:")
+            traceback.print_exc()
+            QMessageBox.critical(self, "Error", f"An error occurred: {str(e)}")
+            self.on_all_finished()
+        
+    def _prepare_ui_for_download(self):
+        """Lock inputs and show track progress while a download runs"""
         self.download_btn.setEnabled(False)
         self.url_input.setEnabled(False)
         self.format_combo.setEnabled(False)
@@ -556,16 +581,56 @@ class MainWindow(QMainWindow):
         self.track_progress.setVisible(True)
         self.track_progress.setValue(0)
         self.track_label.setText("⏳ Starting download...")
-    
+        
+    def offer_resume(self):
+        """Ask whether to resume playlist downloads interrupted in an earlier session"""
         try:
-            self.download_manager.start_download(url, audio_format, mode, selected_indices)
+            jobs = self.download_manager.unfinished_jobs()
+        except Exception as e:
+            print(f"Could not read job journal: {e}")
+            return
+        
+        for job in jobs:
+            reply = QMessageBox.question(
+                self,
+                "Nastavi Download",
+                f"Prethodni download nije završen ({job['remaining']} od {job['total']} pesama preostalo):\n"
+                f"{job['url']}\n\nŽeliš da nastaviš gde je stao?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.Yes
+            )
+            if reply == QMessageBox.StandardButton.Yes:
+                self.pending_resumes.append(job)
+            else:
+                self.download_manager.discard_job(job['job_id'])
+                
+        self.resume_next_job()
+        
+    def resume_next_job(self):
+        """Start the next interrupted job the user chose to resume"""
+        if not self.pending_resumes:
+            return
+        job = self.pending_resumes.pop(0)
+        
+        self.download_folder = Path(job['download_folder'])
+        self.folder_display.setText(str(self.download_folder))
+        self._prepare_ui_for_download()
+        
+        try:
+            self.download_manager.resume_download(job['job_id'])
         except Exception as e:
-            import traceback
-            print("❌ ERROR IN START DOWNLOAD:")
             traceback.print_exc()
             QMessageBox.critical(self, "Error", f"An error occurred: {str(e)}")
             self.on_all_finished()
         
+    def closeEvent(self, event):
+        """Persist the job journal before closing so interrupted jobs can resume"""
+        try:
+            self.download_manager.flush_journal()
+        except Exception as e:
+            print(f"Could not flush job journal: {e}")
+        super().closeEvent(event)
+        
     def on_download_started(self, title):
         """Handle download started signal"""
         self.track_label.setText(f"⬇ Downloading: {title}")
@@ -574,6 +639,17 @@ class MainWindow(QMainWindow):
         """Update progress bar"""
         self.track_progress.setValue(int(progress))
         
+    def on_track_status(self, status):
+        """Show download speed and ETA on the track progress bar"""
+        if status['stage'] != 'fetch' or not status['speed']:
+            self.track_progress.setFormat("%p%")
+            return
+        text = f"%p%  •  {status['speed'] / (1024 * 1024):.1f} MB/s"
+        if status['eta'] is not None:
+            eta = int(status['eta'])
+            text += f"  •  ETA {eta // 60}:{eta % 60:02d}"
+        self.track_progress.setFormat(text)
+        
     def on_playlist_progress(self, current, total):
         """Update playlist progress"""
         self.playlist_label.setText(f"📋 Playlist: {current} od {total}")
@@ -601,19 +677,23 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.StandardButton.No:
             self.add_file_to_table(metadata, filepath)
         
+    def on_download_skipped(self, title, file_path):
+        """Handle a track skipped because it is already in the download archive"""
+        self.track_label.setText(f"⏭ Već preuzeto: {title} ({Path(file_path).name})")
+        
     def on_error(self, error_msg):
         """Handle error"""
-        if "rate" in error_msg.lower() and "limit" in error_msg.lower():
+        if error_msg.startswith("Skipped"):
+            self.track_label.setText(error_msg)
+        elif "rate" in error_msg.lower() and "limit" in error_msg.lower():
             QMessageBox.critical(
                 self, 
                 "YouTube Rate Limit", 
                 "YouTube je ograničio preuzimanja. Sačekaj 30-60 minuta i probaj ponovo.\n\n" + error_msg
             )
             self.on_all_finished()
-        elif not error_msg.startswith("Skipped"):
-            self.track_label.setText(f"❌ Greška: {error_msg}")
         else:
-            self.track_label.setText(error_msg)
+            self.track_label.setText(f"❌ Greška: {error_msg}")
         
     def on_all_finished(self):
         """Handle all downloads finished"""
@@ -629,6 +709,9 @@ class MainWindow(QMainWindow):
         self.browse_btn.setEnabled(True)
         self.url_input.clear()
         
+        if self.pending_resumes:
+            QTimer.singleShot(0, self.resume_next_job)
+        
     def add_file_to_table(self, metadata, file_path):
         """Add downloaded file to table"""
         row = self.files_table.rowCount()
@@ -679,7 +762,8 @@ class MainWindow(QMainWindow):
             'album': self.files_table.item(row, 2).text() if self.files_table.item(row, 2) else "",
         }
         
-        dialog = TagEditorDialog(str(file_path), metadata, None, self)
+        from gui.tag_editor import TagEditorDialog
+        dialog = TagEditorDialog(str(file_path), metadata, None, self, archive=self.download_manager.get_archive())
         if dialog.exec():
             updated_metadata = dialog.get_metadata()
             final_path = dialog.get_final_path()
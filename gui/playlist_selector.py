@@ -6,7 +6,8 @@ from PySide6.QtWidgets import (
     QMessageBox
 )
 from PySide6.QtCore import Qt, QThread, Signal, QObject
-import yt_dlp
+
+from core.rate_limiter import get_rate_limiter
 
 
 class PlaylistInfoWorker(QObject):
@@ -22,6 +23,7 @@ class PlaylistInfoWorker(QObject):
         
     def run(self):
         """Fetch playlist info"""
+        import yt_dlp  # loaded here, on the worker thread, not when the window opens
         try:
             self.progress.emit("Fetching playlist information...")
             
@@ -32,8 +34,9 @@ class PlaylistInfoWorker(QObject):
                 'playlistend': 50,  # Limit to first 50 videos
             }
             
+            limiter = get_rate_limiter()
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(self.url, download=False)
+                info = limiter.call(ydl.extract_info, self.url, download=False)
                 
                 if 'entries' in info:
                     entries = []
@@ -59,7 +62,7 @@ class PlaylistInfoWorker(QObject):
                         list_id = self.url.split("list=")[1].split("&")[0]
                         forced_url = f"https://www.youtube.com/playlist?list={list_id}"
                         self.progress.emit(f"Trying playlist URL: {forced_url}")
-                        info = ydl.extract_info(forced_url, download=False)
+                        info = limiter.call(ydl.extract_info, forced_url, download=False)
                         if 'entries' in info:
                             entries = []
                             for entry in info['entries']:
@@ -342,4 +345,8 @@ class PlaylistSelectorDialog(QDialog):
         
     def get_selected_indices(self):
         """Get list of selected video indices"""
-        return self.selected_indices
\ No newline at end of file
+        return self.selected_indices
+        
+    def get_selected_ids(self):
+        """Get video IDs of the selected entries"""
+        return [self.videos[i]['id'] for i in self.selected_indices if self.videos[i].get('id')]
\ No newline at end of file
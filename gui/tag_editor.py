@@ -13,14 +13,16 @@ from pathlib import Path
 
 from core.tag_manager import TagManager
 from utils.file_utils import sanitize_filename
+from utils.name_allocator import get_name_allocator
 
 
 class TagEditorDialog(QDialog):
     """Dialog for editing audio file tags"""
     
-    def __init__(self, file_path, metadata, track_number=None, parent=None):
+    def __init__(self, file_path, metadata, track_number=None, parent=None, archive=None):
         super().__init__(parent)
         self.file_path = Path(file_path)
+        self.archive = archive
         self.metadata = metadata.copy()
         self.track_number = track_number
         self.tag_manager = TagManager()
@@ -248,20 +250,16 @@ class TagEditorDialog(QDialog):
             if not success:
                 QMessageBox.warning(self, "Error", "Failed to write tags to file")
                 return
+            
+            original_path = self.file_path
                 
             # Rename file if checkbox is checked
             if self.rename_checkbox.isChecked():
                 new_filename = self.filename_preview.text()
-                new_path = self.file_path.parent / new_filename
                 
-                # Avoid overwriting existing files
-                counter = 1
-                while new_path.exists() and new_path != self.file_path:
-                    stem = Path(new_filename).stem
-                    ext = Path(new_filename).suffix
-                    new_filename = f"{stem} ({counter}){ext}"
-                    new_path = self.file_path.parent / new_filename
-                    counter += 1
+                # Avoid overwriting existing files (or a name another rename is about to use)
+                names = get_name_allocator(self.file_path.parent)
+                new_path = names.reserve(new_filename, current=self.file_path)
                 
                 # Rename
                 if new_path != self.file_path:
@@ -274,6 +272,16 @@ class TagEditorDialog(QDialog):
                             "Rename Error",
                             f"Tags saved but file rename failed: {str(e)}"
                         )
+                    finally:
+                        names.release(new_path)
+                        names.release(self.file_path)
+            
+            # Keep the download archive pointing at the retagged/renamed file
+            if self.archive is not None:
+                try:
+                    self.archive.update_file(original_path, self.final_path)
+                except Exception as e:
+                    print(f"Could not update download archive: {e}")
             
             self.accept()
             
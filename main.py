@@ -5,12 +5,18 @@ Main entry point and application initialization
 
 import sys
 import os
+import importlib
+import threading
 from pathlib import Path
 from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QObject, QEvent, QTimer
 from gui.main_window import MainWindow
 
 
+# Heavy modules the window doesn't need to paint (yt-dlp, mutagen via the engine, the dialogs)
+WARM_UP_MODULES = ('core.engine', 'gui.playlist_selector', 'gui.tag_editor')
+
+
 def setup_application():
     """Initialize application settings and paths"""
     # Enable high DPI scaling
@@ -31,12 +37,49 @@ def setup_application():
     return app
 
 
+def warm_up(modules=WARM_UP_MODULES):
+    """Import the heavy modules on a background thread so the first download doesn't wait for them"""
+    def load():
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                print(f"Warm-up import of {name} failed: {e}")
+    
+    thread = threading.Thread(target=load, name="import-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+class WarmUpAfterFirstPaint(QObject):
+    """Starts the import warm-up once the window has painted, so it doesn't compete with startup"""
+
+    def __init__(self, window, modules=WARM_UP_MODULES):
+        super().__init__(window)
+        self.modules = modules
+        self.thread = None
+        window.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        """Wait for the first paint, then start the warm-up once the event has been handled"""
+        if event.type() == QEvent.Type.Paint:
+            obj.removeEventFilter(self)
+            QTimer.singleShot(0, self.start)
+        return False
+
+    def start(self):
+        """Start the background imports"""
+        if self.thread is None:
+            self.thread = warm_up(self.modules)
+
+
 def main():
     """Main application entry point"""
     app = setup_application()
     
     # Create and show main window
     window = MainWindow()
+    WarmUpAfterFirstPaint(window)
     window.show()
     
     # Start event loop
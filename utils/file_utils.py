@@ -3,36 +3,100 @@ Utility Module - File Utilities
 File name sanitization and validation
 """
 
-import re
+import functools
+import os
+import sys
 import unicodedata
+from pathlib import Path
 
+from utils.name_allocator import get_name_allocator
 
+
+# Characters Windows doesn't allow in file names
+INVALID_CHARS = '<>:"/\\|?*'
+
+# Serbian Latin letters and their ASCII spelling
+SERBIAN_TO_ASCII = {
+    'č': 'c', 'ć': 'c', 'š': 's', 'ž': 'z', 'đ': 'dj',
+    'Č': 'C', 'Ć': 'C', 'Š': 'S', 'Ž': 'Z', 'Đ': 'Dj',
+}
+
+# Code point ranges removed as emoji (the wide 24C2-1F251 range also takes CJK, Hangul etc.)
+EMOJI_RANGES = (
+    (0x1F600, 0x1F64F),  # emoticons
+    (0x1F300, 0x1F5FF),  # symbols & pictographs
+    (0x1F680, 0x1F6FF),  # transport & map symbols
+    (0x1F1E0, 0x1F1FF),  # flags (iOS)
+    (0x2702, 0x27B0),
+    (0x24C2, 0x1F251),
+    (0x1F900, 0x1F9FF),  # supplemental symbols
+    (0x1FA00, 0x1FA6F),  # chess symbols
+)
+
+# Sanitized names kept in memory (track names, tag editor previews, collision checks)
+SANITIZE_CACHE_SIZE = 4096
+
+MAX_FILENAME_LENGTH = 200
+
+
+def _is_removed(char):
+    """Emoji and control/format/unassigned characters, except common whitespace"""
+    codepoint = ord(char)
+    if any(low <= codepoint <= high for low, high in EMOJI_RANGES):
+        return True
+    return unicodedata.category(char)[0] == 'C' and char not in '\n\r\t'
+
+
+class _TranslationTable(dict):
+    """
+    str.translate() table that classifies each code point the first time it is seen
+    and remembers the answer, so the table only holds characters actually used
+    (up to max_size; rarer ones are classified again every time)
+    """
+
+    def __init__(self, classify, max_size=65536):
+        super().__init__()
+        self.classify = classify
+        self.max_size = max_size
+
+    def __missing__(self, codepoint):
+        value = self.classify(chr(codepoint))
+        if len(self) < self.max_size:
+            self[codepoint] = value
+        return value
+
+
+def _filename_char(char):
+    """What a character becomes in a file name: its ASCII spelling, None (dropped) or ' ' for whitespace"""
+    if char in SERBIAN_TO_ASCII:
+        return SERBIAN_TO_ASCII[char]
+    if char in INVALID_CHARS or _is_removed(char):
+        return None
+    if char.isspace():
+        return ' '
+    return char
+
+
+_FILENAME_TABLE = _TranslationTable(_filename_char)
+_SERBIAN_TABLE = str.maketrans(SERBIAN_TO_ASCII)
+_EMOJI_TABLE = _TranslationTable(lambda char: None if _is_removed(char) else char)
+
+
+@functools.lru_cache(maxsize=SANITIZE_CACHE_SIZE)
 def sanitize_filename(filename):
     """
     Sanitize filename by removing invalid characters and emojis
     Normalize Serbian Latin to ASCII
     """
-    # Normalize Serbian characters
-    filename = normalize_serbian(filename)
-    
-    # Remove emojis and other non-standard unicode
-    filename = remove_emojis(filename)
-    
-    # Remove or replace invalid Windows filename characters
-    invalid_chars = '<>:"/\\|?*'
-    for char in invalid_chars:
-        filename = filename.replace(char, '')
+    # Serbian letters, emojis, control and invalid characters, whitespace: one translate pass
+    filename = filename.translate(_FILENAME_TABLE)
     
-    # Replace multiple spaces with single space
-    filename = re.sub(r'\s+', ' ', filename)
-    
-    # Remove leading/trailing spaces and dots
-    filename = filename.strip(' .')
+    # Collapse runs of spaces, remove leading/trailing spaces and dots
+    filename = ' '.join(filename.split()).strip(' .')
     
     # Limit length (Windows has 255 char limit for filenames)
-    max_length = 200
-    if len(filename) > max_length:
-        filename = filename[:max_length].strip()
+    if len(filename) > MAX_FILENAME_LENGTH:
+        filename = filename[:MAX_FILENAME_LENGTH].strip()
     
     # If filename is empty after sanitization, use a default
     if not filename:
@@ -41,20 +105,25 @@ def sanitize_filename(filename):
     return filename
 
 
+def sanitize_many(filenames):
+    """
+    Sanitize a batch of filenames (repeated names are sanitized once)
+    
+    Args:
+        filenames: Iterable of raw names
+        
+    Returns:
+        list: Sanitized names, in the same order
+    """
+    return [sanitize_filename(filename) for filename in filenames]
+
+
 def normalize_serbian(text):
     """
     Normalize Serbian characters to ASCII
     č -> c, ć -> c, š -> s, ž -> z, đ -> dj
     """
-    replacements = {
-        'č': 'c', 'ć': 'c', 'š': 's', 'ž': 'z', 'đ': 'dj',
-        'Č': 'C', 'Ć': 'C', 'Š': 'S', 'Ž': 'Z', 'Đ': 'Dj',
-    }
-    
-    for serbian, latin in replacements.items():
-        text = text.replace(serbian, latin)
-    
-    return text
+    return text.translate(_SERBIAN_TABLE)
 
 
 def remove_emojis(text):
@@ -65,33 +134,9 @@ def remove_emojis(text):
         text: Input text string
         
     Returns:
-        str: Text with emojis removed
-    """
-    # Remove emoji characters
-    emoji_pattern = re.compile(
-        "["
-        u"\U0001F600-\U0001F64F"  # emoticons
-        u"\U0001F300-\U0001F5FF"  # symbols & pictographs
-        u"\U0001F680-\U0001F6FF"  # transport & map symbols
-        u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
-        u"\U00002702-\U000027B0"
-        u"\U000024C2-\U0001F251"
-        u"\U0001F900-\U0001F9FF"  # supplemental symbols
-        u"\U0001FA00-\U0001FA6F"  # chess symbols
-        "]+",
-        flags=re.UNICODE
-    )
-    
-    text = emoji_pattern.sub('', text)
-    
-    # Remove other problematic unicode categories
-    text = ''.join(
-        char for char in text
-        if unicodedata.category(char)[0] != 'C'  # Control characters
-        or char in '\n\r\t'  # Keep common whitespace
-    )
-    
-    return text
+        str: Text with emojis (and control characters other than \\n, \\r, \\t) removed
+    """
+    return text.translate(_EMOJI_TABLE)
 
 
 def validate_filename(filename):
@@ -108,8 +153,7 @@ def validate_filename(filename):
         return False
     
     # Check for invalid characters
-    invalid_chars = '<>:"/\\|?*'
-    if any(char in filename for char in invalid_chars):
+    if any(char in filename for char in INVALID_CHARS):
         return False
     
     # Check for reserved names
@@ -139,27 +183,14 @@ def generate_unique_filename(directory, filename):
         filename: Desired filename
         
     Returns:
-        Path: Unique file path
+        Path: Unique file path, "name (n).ext" if the name is taken. The name is not
+        held for the caller; use get_name_allocator(directory).reserve() and release()
+        when other threads may pick a name in the same directory before the file exists
     """
-    from pathlib import Path
-    
-    directory = Path(directory)
-    file_path = directory / filename
-    
-    if not file_path.exists():
-        return file_path
-    
-    # File exists, add counter
-    stem = file_path.stem
-    suffix = file_path.suffix
-    counter = 1
-    
-    while True:
-        new_filename = f"{stem} ({counter}){suffix}"
-        new_path = directory / new_filename
-        if not new_path.exists():
-            return new_path
-        counter += 1
+    names = get_name_allocator(directory)
+    path = names.reserve(filename)
+    names.release(path)
+    return path
 
 
 def get_safe_filename(artist, title, extension='.mp3'):
@@ -184,4 +215,20 @@ def get_safe_filename(artist, title, extension='.mp3'):
         filename = "untitled"
     
     filename = sanitize_filename(filename)
-    return f"{filename}{extension}"
\ No newline at end of file
+    return f"{filename}{extension}"
+
+
+def get_app_data_dir():
+    """
+    Get (and create) the per-user directory for application state
+    
+    Returns:
+        Path: %APPDATA%\\Yt2Mp3 on Windows, ~/.yt2mp3 elsewhere
+    """
+    if sys.platform == 'win32' and os.environ.get('APPDATA'):
+        data_dir = Path(os.environ['APPDATA']) / "Yt2Mp3"
+    else:
+        data_dir = Path.home() / ".yt2mp3"
+    
+    data_dir.mkdir(parents=True, exist_ok=True)
+    return data_dir
@@ -0,0 +1,145 @@
+"""
+Utility Module - Name Allocator
+Collision-free file names in a directory, picked from an in-memory index of its listing
+instead of probing "name (1)", "name (2)", ... on disk
+"""
+
+import os
+import re
+import sys
+import threading
+from pathlib import Path
+
+
+# "name (3)" -> ("name", "3")
+NUMBERED_STEM = re.compile(r'^(.*) \((\d+)\)$')
+
+# File systems that treat "Song.mp3" and "song.mp3" as the same name
+CASE_INSENSITIVE = sys.platform in ('win32', 'darwin')
+
+
+def _key(name):
+    """Form of a name used for comparisons"""
+    return name.casefold() if CASE_INSENSITIVE else name
+
+
+class NameAllocator:
+    """
+    Hands out free names in one directory, safely across threads.
+    The listing is read once; after that the index follows the names this allocator hands
+    out and gets back, and is read again only when a picked name turns out to exist on disk
+    (someone else created it) or on refresh(). Names handed out are reserved in memory
+    until released, and the next "name (n).ext" comes from a per-name counter, so picking
+    a name costs one stat whatever n is. Files deleted by others are seen after refresh().
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(os.path.abspath(directory))
+        self.scans = 0
+        self._names = set()  # keys of the names on disk at the last scan
+        self._reserved = set()  # keys handed out and not released yet
+        self._next = {}  # (stem key, extension key) -> lowest n that may still be free
+        self._lock = threading.Lock()
+
+    def reserve(self, filename, current=None):
+        """
+        Reserve a free name for filename: filename itself or "stem (n).ext".
+        current is the path of a file being renamed; its own name counts as free.
+        Returns the full path; release() it once the file exists or wasn't created.
+        """
+        stem, ext = os.path.splitext(filename)
+        current_key = None
+        if current is not None:
+            current = Path(os.path.abspath(current))
+            if current.parent == self.directory:
+                current_key = _key(current.name)
+
+        with self._lock:
+            if not self.scans:
+                self._scan()
+            while True:
+                name = self._candidate(filename, stem, ext, current_key)
+                key = _key(name)
+                path = self.directory / name
+                # The index only knows this allocator's own names; one stat confirms the pick
+                if key == current_key or not os.path.lexists(path):
+                    break
+                # Created behind our back: others may have been too
+                self._scan()
+                self._names.add(key)
+            if key != current_key:
+                self._reserved.add(key)
+            return path
+
+    def release(self, path):
+        """
+        Give a name back once the file exists under it (it stays taken), or when it was
+        never created, moved away or deleted (it becomes free again)
+        """
+        name = Path(path).name
+        key = _key(name)
+        with self._lock:
+            self._reserved.discard(key)
+            if os.path.lexists(self.directory / name):
+                self._names.add(key)
+            else:
+                self._names.discard(key)
+                self._lower_counter(name)
+
+    def refresh(self):
+        """Re-read the listing, e.g. after files were added or deleted by something else"""
+        with self._lock:
+            self._scan()
+
+    def _scan(self):
+        """Read the listing; names that disappeared lower their counters"""
+        try:
+            with os.scandir(self.directory) as entries:
+                names = {_key(entry.name) for entry in entries}
+        except FileNotFoundError:
+            names = set()
+        removed = self._names - names
+        self._names = names
+        self.scans += 1
+        for key in removed:
+            self._lower_counter(key)
+
+    def _taken(self, key, current_key):
+        """Whether a name is on disk or reserved (the renamed file's own name never is)"""
+        return key != current_key and (key in self._names or key in self._reserved)
+
+    def _candidate(self, filename, stem, ext, current_key):
+        """filename if it is free, otherwise the first free "stem (n).ext" from the counter"""
+        if not self._taken(_key(filename), current_key):
+            return filename
+        counter = (_key(stem), _key(ext))
+        n = self._next.get(counter, 1)
+        while self._taken(_key(f"{stem} ({n}){ext}"), current_key):
+            n += 1
+        self._next[counter] = n + 1
+        return f"{stem} ({n}){ext}"
+
+    def _lower_counter(self, name):
+        """A numbered name became free again: let its counter hand it out"""
+        stem, ext = os.path.splitext(name)
+        match = NUMBERED_STEM.match(stem)
+        if match:
+            counter = (_key(match.group(1)), _key(ext))
+            n = int(match.group(2))
+            if counter in self._next and n < self._next[counter]:
+                self._next[counter] = n
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+def get_name_allocator(directory):
+    """Allocator shared by everything that names files in directory"""
+    directory = os.path.abspath(directory)
+    key = os.path.normcase(directory)
+    with _allocators_lock:
+        allocator = _allocators.get(key)
+        if allocator is None:
+            allocator = _allocators[key] = NameAllocator(directory)
+        return allocator
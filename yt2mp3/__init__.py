@@ -0,0 +1,4 @@
+"""
+Yt2Mp3 Package
+Command line entry point (python -m yt2mp3)
+"""
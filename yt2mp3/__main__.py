@@ -0,0 +1,11 @@
+"""
+Yt2Mp3 - Command line entry point
+"""
+
+import sys
+
+from yt2mp3.cli import main
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,418 @@
+"""
+Yt2Mp3 - Command Line Interface
+Headless batch downloads and the download daemon, on the same engine as the GUI (no PySide6 needed)
+
+    python -m yt2mp3 batch urls.txt --format mp3 --jobs 6 --out /srv/music
+    python -m yt2mp3 serve --port 8765 --workers 2 --out /srv/music
+    python -m yt2mp3 enqueue PLAYLIST_URL --queue /mnt/shared/queue.sqlite3
+    python -m yt2mp3 work --queue /mnt/shared/queue.sqlite3 --out /mnt/shared/music
+
+Stage timings and counters: --metrics-json FILE writes a summary when the command ends,
+--metrics-port PORT (batch, work) or --metrics (serve) exposes Prometheus /metrics.
+Profiling: --profile N writes cProfile/tracemalloc output for one job in N (see core.profiling).
+"""
+
+import argparse
+import contextlib
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from core.cover_art import CoverCache
+from core.daemon import DownloadDaemon, create_server
+from core.download_archive import DownloadArchive
+from core.engine import DownloadEngine
+from core.events import Completed, Exists, Skipped, Error
+from core.metrics import enable_metrics, get_metrics, serve_metrics
+from core.profiling import ProfileSampler, get_profiler, set_profiler
+from core.work_queue import LeaseQueue, LeaseWorker, open_work_queue
+from utils.file_utils import get_app_data_dir
+
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+def read_urls(path):
+    """URLs from a text file (or '-' for stdin), one per line; blank lines and # comments are ignored"""
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(path).read_text(encoding='utf-8').splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+
+
+class BatchReporter:
+    """Turns engine events into console output: readable lines or one JSON object per line"""
+
+    # Events shown in text mode; JSON mode writes every event
+    TEXT_EVENTS = (Completed, Exists, Skipped, Error)
+
+    def __init__(self, json_output=False, stream=None):
+        self.json_output = json_output
+        self.stream = stream or sys.stdout
+        self.counts = {'downloaded': 0, 'exists': 0, 'archived': 0, 'failed': 0}
+        self._lock = threading.Lock()
+
+    def attach(self, engine, url):
+        """Report the events of a download engine, tagged with its URL"""
+        event_types = () if self.json_output else self.TEXT_EVENTS
+        engine.subscribe(lambda event: self.report(url, event), *event_types)
+
+    def report(self, url, event):
+        """Count and write one engine event"""
+        if isinstance(event, Completed):
+            self._count('downloaded')
+            text = f"Downloaded: {event.file_path}"
+        elif isinstance(event, Exists):
+            self._count('exists')
+            text = f"Already exists: {event.file_path}"
+        elif isinstance(event, Skipped):
+            self._count('archived')
+            text = f"Already downloaded: {event.title} ({event.file_path})"
+        elif isinstance(event, Error):
+            self._count('failed')
+            text = f"Error ({url}): {event.message}"
+        else:
+            text = None
+        self.write(dict(event.to_dict(), url=url), text, error=isinstance(event, Error))
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def write(self, fields, text=None, error=False):
+        """Write a JSON object, or its text form in text mode (nothing if there is none)"""
+        if self.json_output:
+            line = json.dumps(fields, default=str)
+            stream = self.stream
+        elif text is not None:
+            line = text
+            stream = sys.stderr if error else self.stream
+        else:
+            return
+        with self._lock:
+            print(line, file=stream, flush=True)
+
+    def summary(self, exit_code):
+        """Final counts"""
+        with self._lock:
+            counts = dict(self.counts)
+        text = (f"Done: {counts['downloaded']} downloaded, {counts['exists'] + counts['archived']} already present, "
+                f"{counts['failed']} failed")
+        self.write(dict(counts, event='summary', exit_code=exit_code), text)
+
+
+def start_metrics(args):
+    """Enable metrics if any metrics option was given; returns the registry or None"""
+    port = getattr(args, 'metrics_port', None)
+    if not (getattr(args, 'metrics', False) or args.metrics_json or port):
+        return None
+    metrics = enable_metrics()
+    if port:
+        serve_metrics(metrics, args.metrics_host, port)
+        print(f"Metrics at http://{args.metrics_host}:{port}/metrics", file=sys.stderr)
+    return metrics
+
+
+def configure_profiling(args):
+    """Profile jobs as asked by --profile/--profile-match (overriding the YT2MP3_PROFILE* variables)"""
+    if args.profile is not None and args.profile <= 0:
+        set_profiler(None)
+        return
+    if not (args.profile or args.profile_match):
+        return
+    environ = get_profiler()
+    output_dir = args.profile_dir or (environ.output_dir if environ else get_app_data_dir() / "profiles")
+    keep = environ.keep if environ else 20
+    set_profiler(ProfileSampler(output_dir, args.profile or 1, args.profile_match, keep))
+    print(f"Profiling one job in {args.profile or 1} into {output_dir}", file=sys.stderr)
+
+
+def write_metrics_summary(metrics, args, **extra):
+    """Write the --metrics-json summary of this run"""
+    if metrics is None or not args.metrics_json:
+        return
+    try:
+        metrics.write_summary(args.metrics_json, command=args.command, **extra)
+    except OSError as e:
+        print(f"Cannot write metrics summary {args.metrics_json}: {e}", file=sys.stderr)
+
+
+def run_batch(args):
+    """Download every URL in the batch file; returns the exit code"""
+    try:
+        urls = read_urls(args.file)
+    except OSError as e:
+        print(f"Cannot read {args.file}: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not urls:
+        print(f"No URLs in {args.file}", file=sys.stderr)
+        return EXIT_USAGE
+
+    try:
+        metrics = start_metrics(args)
+    except OSError as e:
+        print(f"Cannot serve metrics on port {args.metrics_port}: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    configure_profiling(args)
+
+    out_dir = Path(args.out).expanduser()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    archive = None if args.no_archive else DownloadArchive(get_app_data_dir() / "archive.sqlite3")
+    cover_cache = CoverCache(get_app_data_dir() / "covers", edge=args.cover_size)
+
+    # --jobs bounds the total: URLs run side by side, each with a share of the parallel fetches
+    url_workers = max(1, min(args.jobs, len(urls)))
+    per_url_parallel = max(1, args.jobs // url_workers)
+
+    stdout = sys.stdout
+    reporter = BatchReporter(args.json, stdout)
+    engines = []
+    engines_lock = threading.Lock()
+
+    def download(url):
+        engine = DownloadEngine(url, args.format, out_dir, args.type, max_parallel=per_url_parallel,
+                                archive=archive, progress_rate=args.progress_rate, cover_cache=cover_cache)
+        reporter.attach(engine, url)
+        with engines_lock:
+            engines.append(engine)
+        reporter.write({'event': 'url_started', 'url': url}, f"Downloading {url}")
+        engine.run()
+
+    exit_code = EXIT_OK
+    # Stray prints from yt-dlp/mutagen helpers must not end up in the JSON stream
+    with contextlib.redirect_stdout(sys.stderr):
+        pool = ThreadPoolExecutor(max_workers=url_workers, thread_name_prefix="batch")
+        try:
+            for future in [pool.submit(download, url) for url in urls]:
+                future.result()
+        except KeyboardInterrupt:
+            exit_code = EXIT_INTERRUPTED
+            with engines_lock:
+                for engine in engines:
+                    engine.cancel()
+            pool.shutdown(wait=True, cancel_futures=True)
+        else:
+            pool.shutdown(wait=True)
+        finally:
+            if archive is not None:
+                archive.close()
+
+    if exit_code == EXIT_OK and reporter.counts['failed']:
+        exit_code = EXIT_FAILED
+    reporter.summary(exit_code)
+    write_metrics_summary(metrics, args, urls=len(urls), results=reporter.counts, exit_code=exit_code)
+    return exit_code
+
+
+def run_serve(args):
+    """Run the download daemon until interrupted"""
+    metrics = start_metrics(args)
+    configure_profiling(args)
+    out_dir = Path(args.out).expanduser()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    archive = DownloadArchive(get_app_data_dir() / "archive.sqlite3")
+    work_queue = LeaseQueue(args.work_queue or get_app_data_dir() / "work_queue.sqlite3")
+    daemon = DownloadDaemon(out_dir, get_app_data_dir() / "daemon.sqlite3", workers=args.workers,
+                            max_parallel=args.jobs, archive=archive,
+                            cover_cache=CoverCache(get_app_data_dir() / "covers", edge=args.cover_size),
+                            work_queue=work_queue)
+    try:
+        server = create_server(daemon, args.host, args.port)
+    except OSError as e:
+        print(f"Cannot listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    daemon.start()
+    print(f"Download daemon listening on http://{args.host}:{args.port} (saving to {out_dir})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.stop()
+        archive.close()
+        write_metrics_summary(metrics, args, jobs=daemon.queue.counts())
+    return EXIT_OK
+
+
+def run_enqueue(args):
+    """List playlists here and put their entries on a shared work queue"""
+    work_queue = open_work_queue(args.queue)
+    exit_code = EXIT_OK
+    try:
+        for url in args.urls:
+            lister = DownloadEngine(url, args.format, ".", args.type)
+            try:
+                entries = lister.list_entries()
+            except Exception as e:
+                print(f"Error ({url}): {e}", file=sys.stderr)
+                exit_code = EXIT_FAILED
+                continue
+            batch_id = work_queue.enqueue(url, args.format, entries)
+            print(f"Queued {len(entries)} track(s) from {url} as batch {batch_id}")
+    finally:
+        work_queue.close()
+    return exit_code
+
+
+def run_work(args):
+    """Claim and download work items until interrupted (or until the queue is empty)"""
+    try:
+        metrics = start_metrics(args)
+    except OSError as e:
+        print(f"Cannot serve metrics on port {args.metrics_port}: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    configure_profiling(args)
+
+    out_dir = Path(args.out).expanduser()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    work_queue = open_work_queue(args.queue, lease_seconds=args.lease)
+    archive = DownloadArchive(get_app_data_dir() / "archive.sqlite3")
+    cover_cache = CoverCache(get_app_data_dir() / "covers", edge=args.cover_size)
+
+    def report(event):
+        if isinstance(event, Completed):
+            print(f"Downloaded: {event.file_path}", flush=True)
+
+    workers = [
+        LeaseWorker(work_queue, out_dir, f"{args.worker_id}-{n}" if args.worker_id else None, archive,
+                    cover_cache, on_event=report)
+        for n in range(args.workers)
+    ]
+    crashed = []
+
+    def work(worker):
+        try:
+            worker.run(args.exit_when_empty)
+        except Exception as e:
+            crashed.append(worker.worker_id)
+            get_metrics().error('worker', e)
+            print(f"Worker {worker.worker_id} stopped: {e}", file=sys.stderr)
+
+    threads = [threading.Thread(target=work, args=(worker,), name=f"lease-worker-{n}", daemon=True)
+               for n, worker in enumerate(workers)]
+    for thread in threads:
+        thread.start()
+
+    exit_code = EXIT_OK
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        exit_code = EXIT_INTERRUPTED
+        for worker in workers:
+            worker.stop()
+        for thread in threads:
+            thread.join()
+    finally:
+        work_queue.close()
+        archive.close()
+
+    processed = sum(worker.processed for worker in workers)
+    failed = sum(worker.failed for worker in workers)
+    print(f"Done: {processed} downloaded, {failed} failed", file=sys.stderr)
+    if crashed:
+        print(f"{len(crashed)} worker(s) stopped on an error: {', '.join(crashed)}", file=sys.stderr)
+    if exit_code == EXIT_OK and (failed or crashed):
+        exit_code = EXIT_FAILED
+    write_metrics_summary(metrics, args, processed=processed, failed=failed, exit_code=exit_code)
+    return exit_code
+
+
+def add_metrics_arguments(parser, endpoint=True):
+    """Options that turn on stage timings and counters"""
+    parser.add_argument('--metrics-json', metavar='FILE', help="write a JSON metrics summary when done")
+    if endpoint:
+        parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                            help="serve Prometheus metrics on http://HOST:PORT/metrics")
+        parser.add_argument('--metrics-host', default='127.0.0.1',
+                            help="address of the metrics endpoint (default: 127.0.0.1)")
+
+
+def add_profile_arguments(parser):
+    """Options that profile individual jobs"""
+    parser.add_argument('--profile', type=int, metavar='N',
+                        help="profile one job in N with cProfile and tracemalloc (1: every job, 0: off)")
+    parser.add_argument('--profile-match', metavar='TEXT',
+                        help="only profile jobs whose URL or video ID contains TEXT")
+    parser.add_argument('--profile-dir', metavar='DIR',
+                        help="where profiles are written (default: profiles in the app data folder)")
+
+
+def build_parser():
+    """Argument parser for the yt2mp3 command"""
+    parser = argparse.ArgumentParser(prog="yt2mp3", description="YouTube to MP3/M4A downloader")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch = commands.add_parser('batch', help="download every URL listed in a file")
+    batch.add_argument('file', help="text file with one video or playlist URL per line ('-' for stdin)")
+    batch.add_argument('--format', choices=['mp3', 'm4a'], default='mp3', help="audio format (default: mp3)")
+    batch.add_argument('--jobs', type=int, default=1, help="tracks downloaded in parallel (default: 1)")
+    batch.add_argument('--out', default=str(Path.home() / "Music"), help="output folder (default: ~/Music)")
+    batch.add_argument('--type', choices=['auto', 'single', 'playlist'], default='auto',
+                       help="treat URLs as single videos or playlists (default: auto)")
+    batch.add_argument('--json', action='store_true', help="write progress as JSON lines on stdout")
+    batch.add_argument('--progress-rate', type=float, default=2.0,
+                       help="max progress events per second per track in JSON mode (default: 2)")
+    batch.add_argument('--cover-size', type=int, default=600, help="cover art edge in pixels (default: 600)")
+    batch.add_argument('--no-archive', action='store_true',
+                       help="download again even if a video is in the download archive")
+    add_metrics_arguments(batch)
+    add_profile_arguments(batch)
+
+    serve = commands.add_parser('serve', help="run the download daemon (shared queue with an HTTP/JSON API)")
+    serve.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    serve.add_argument('--port', type=int, default=8765, help="port to listen on (default: 8765)")
+    serve.add_argument('--workers', type=int, default=2, help="jobs downloaded at the same time (default: 2)")
+    serve.add_argument('--jobs', type=int, default=2, help="parallel track downloads per job (default: 2)")
+    serve.add_argument('--out', default=str(Path.home() / "Music"), help="output folder (default: ~/Music)")
+    serve.add_argument('--cover-size', type=int, default=600, help="cover art edge in pixels (default: 600)")
+    serve.add_argument('--work-queue', help="work queue database shared with 'work' nodes "
+                                            "(default: work_queue.sqlite3 in the app data folder)")
+    serve.add_argument('--metrics', action='store_true', help="serve Prometheus metrics at /metrics")
+    add_metrics_arguments(serve, endpoint=False)
+    add_profile_arguments(serve)
+
+    enqueue = commands.add_parser('enqueue', help="put playlist entries on a shared work queue")
+    enqueue.add_argument('urls', nargs='+', help="video or playlist URLs")
+    enqueue.add_argument('--queue', required=True, help="work queue database path or daemon URL")
+    enqueue.add_argument('--format', choices=['mp3', 'm4a'], default='mp3', help="audio format (default: mp3)")
+    enqueue.add_argument('--type', choices=['auto', 'single', 'playlist'], default='auto',
+                         help="treat URLs as single videos or playlists (default: auto)")
+
+    work = commands.add_parser('work', help="download tracks claimed from a shared work queue")
+    work.add_argument('--queue', required=True, help="work queue database path or daemon URL")
+    work.add_argument('--out', required=True, help="shared library folder")
+    work.add_argument('--workers', type=int, default=1, help="tracks processed at the same time (default: 1)")
+    work.add_argument('--worker-id', help="name of this node in leases (default: host name)")
+    work.add_argument('--lease', type=float, default=120.0, help="lease length in seconds (default: 120)")
+    work.add_argument('--exit-when-empty', action='store_true', help="stop once there is nothing left to claim")
+    work.add_argument('--cover-size', type=int, default=600, help="cover art edge in pixels (default: 600)")
+    add_metrics_arguments(work)
+    add_profile_arguments(work)
+    return parser
+
+
+def main(argv=None):
+    """Command line entry point; returns the exit code"""
+    args = build_parser().parse_args(argv)
+    if args.command == 'batch':
+        if args.jobs < 1:
+            print("--jobs must be at least 1", file=sys.stderr)
+            return EXIT_USAGE
+        return run_batch(args)
+    if args.command == 'serve':
+        return run_serve(args)
+    if args.command == 'enqueue':
+        return run_enqueue(args)
+    if args.command == 'work':
+        return run_work(args)
+    return EXIT_USAGE